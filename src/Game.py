@@ -1,14 +1,34 @@
 # Game.py
+import os
+import queue
+import threading
 import pygame
-import socket
-from src.Board import Board
-from src.constants import tile_size, board_size, margin
+from src.board import Board
+from src.constants import tile_size, board_size, margin, letters
 from src.utils import get_tile_from_click, display
 from src.click_logic import get_move
 from src.moving_logic import evaluate_move
+from src.journal import Journal, JournalError, recover
+from src.network import Connection
+from src.legality import LegalMoveSet, IllegalMoveError
+from src.squares import opponent
+from src.protocol import MOVE, RESIGN, DRAW_OFFER, DRAW_ACCEPT, CLOCK, parse_clock
+
+RESULTS = {"w": "1-0", "b": "0-1", "draw": "1/2-1/2"}  # self.victory -> result recorded in the journal
+ACTIVE_FPS = 60
+IDLE_FPS = 10  # Frame rate while nothing changes, so idle clients barely use the CPU
+HIGHLIGHT_COLOR = (246, 246, 105)
 
 class Game:
-    def __init__(self, is_server, host='127.0.0.1', port=12345):
+    def __init__(self, is_server, host='127.0.0.1', port=12345, engine=None, book=None, journal=None):
+        """
+        args:
+        is_server: The server plays white and waits for the client to connect
+        engine: Optional EnginePlayer that plays the local side instead of mouse clicks
+        book: Optional OpeningBook for move hints (H key)
+        journal: Optional journal file path; every move is recorded there, and an unfinished game found in it
+                 is resumed, so a crashed or closed window can pick the game up again
+        """
         pygame.init()
         self.screen = pygame.display.set_mode((tile_size * board_size + 2 * margin, tile_size * board_size + 2 * margin))
         self.clock = pygame.time.Clock()
@@ -18,60 +38,208 @@ class Game:
         self.host = host
         self.port = port
         self.turn_white = True  # White starts the game
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        
-        if is_server:
-            self.socket.bind((self.host, self.port))
-            self.socket.listen(1)
-            print("Waiting for a connection...")
-            self.conn, _ = self.socket.accept()
-            print("Client connected.")
-        else:
-            self.socket.connect((self.host, self.port))
-            self.conn = self.socket
-            print("Connected to server.")
+        self.engine = engine
+        self.book = book
+        self.position_history = []  # Zobrist keys of earlier positions, for the engine's repetition checks
+        self.engine_results = queue.Queue()  # (key of the searched position, move) from the search thread
+        self.engine_thinking = False
+        self.journal_path = journal
+        self.journal = None
+        if journal:
+            self.open_journal()
+        # Accepting / connecting happens in the background; the window keeps rendering meanwhile
+        self.connection = Connection(is_server, host, port)
+        self.connection.start()
 
-    def send_move(self, move, retries=3, timeout=1):
-        for attempt in range(retries):
-            try:
-                self.conn.sendall(move.encode())
-                self.conn.settimeout(timeout)
-                ack = self.conn.recv(1024).decode()
-                if ack == 'ACK':
-                    print("Move confirmed by opponent.")
-                    return True
-            except socket.timeout:
-                print(f"Timeout, retrying ({attempt + 1}/{retries})...")
-        print("Move not confirmed. Connection issue.")
-        return False
+    def send_move(self, move):
+        """
+        Queues a move for the opponent; it never blocks the game loop.
+        """
+        self.connection.send(move)
+        return True
+
+    def is_local_turn(self):
+        return (self.turn_white and self.is_server) or (not self.turn_white and not self.is_server)
 
     def socket_logic(self, position):
-        if (self.turn_white and self.is_server) or (not self.turn_white and not self.is_server):
+        if self.is_local_turn():
             # Current player's turn
+            if self.engine:
+                return  # The engine moves from engine_logic
             self.handle_click(position) 
             if self.move:
                 if self.send_move(self.move):
                     print(f"Sent move: {self.move}")
                     self.turn_white = not self.turn_white
                     self.move = None
+        # Clicks during the opponent's turn are ignored; their move arrives through network_logic
+
+    def network_logic(self):
+        """
+        Handles the messages that arrived since the last frame, without waiting for any.
+        """
+        for message in self.connection.poll():
+            if message.kind == MOVE:
+                print(f"Received opponent's move: {message.payload}")
+                if self.apply_move(message.payload, self.is_server):  # Update board with opponent's move
+                    self.turn_white = not self.turn_white
+                    self.needs_render = True
+            elif message.kind == RESIGN:
+                print("Opponent resigned.")
+                self.victory = self.local_color()
+            elif message.kind == DRAW_OFFER:
+                print("Opponent offers a draw (press D to accept).")
+                self.draw_offered = True
+            elif message.kind == DRAW_ACCEPT:
+                print("Draw agreed.")
+                self.victory = "draw"
+            elif message.kind == CLOCK:
+                self.opponent_clock = parse_clock(message.payload)
+
+    def local_color(self):
+        return 'w' if self.is_server else 'b'
+
+    def resign(self):
+        self.connection.send_message(RESIGN)
+        self.victory = opponent(self.local_color())
+
+    def offer_draw(self):
+        """
+        Accepts the opponent's pending draw offer, or offers one.
+        """
+        if self.draw_offered:
+            self.connection.send_message(DRAW_ACCEPT)
+            self.victory = "draw"
         else:
-            # Opponent's turn
-            print("Waiting for opponent's move...")
-            opponent_move = self.receive_move()
-            print(f"Received opponent's move: {opponent_move}")
-            self.apply_move(opponent_move, self.is_server)  # Update board with opponent's move
-            self.turn_white = not self.turn_white
+            self.connection.send_message(DRAW_OFFER)
 
-    def apply_move(self, move, is_server):
-        color = "w" if is_server else "b"
-        move_success, message = evaluate_move(self.board, move, color)
+    def show_hints(self):
+        """
+        Prints the most played book moves of the current position.
+        """
+        if self.book is None:
+            print("No opening book loaded.")
+            return
+        hints = self.book.hints(self.board)
+        print(f"Book: {', '.join(hints)}" if hints else "Book: position not in the book.")
+
+    def engine_logic(self):
+        """
+        Lets the engine play the local side. On its turn the search is started on a background thread; each
+        frame then checks, without waiting, whether its move is ready and plays and sends it.
+        """
+        if not self.engine or self.victory or not self.is_local_turn():
+            return
+        if not self.engine_thinking:
+            # The search makes and unmakes moves, so it gets its own copy of the board to keep rendering safe
+            board = type(self.board).from_fen(self.board.to_fen())
+            self.engine_thinking = True
+            threading.Thread(target=self.engine_search, args=(board, list(self.position_history)),
+                             name="engine-search", daemon=True).start()
+            return
+        try:
+            key, move = self.engine_results.get_nowait()
+        except queue.Empty:
+            return
+        self.engine_thinking = False
+        if key != self.board.zobrist:
+            return  # The game was reset while the engine was thinking
+        if move is None:
+            return  # Checkmate or stalemate, nothing to play
+        self.position_history.append(self.board.zobrist)
+        move_success, message = self.play_move(move, self.engine.color)
+        self.needs_render = True
         if move_success:
             self.check_victory_conditions(move)
+            if self.send_move(move):
+                self.turn_white = not self.turn_white
+
+    def engine_search(self, board, history):
+        """
+        Runs on the search thread: picks the engine's move and hands it to engine_logic.
+        """
+        self.engine_results.put((board.zobrist, self.engine.choose_move(board, history)))
+
+    def open_journal(self):
+        """
+        Resumes the unfinished game recorded in the journal file, if any, and records to it from now on.
+        A finished game's journal is replaced by a new one.
+        """
+        path = self.journal_path
+        if os.path.exists(path):
+            try:
+                recovered = recover(path, Board)
+            except JournalError as error:
+                print(f"Cannot resume the game from {path}, starting a new one: {error}")
+                recovered = None
+            if recovered is not None and recovered.result is None:
+                self.board = recovered.board
+                self.turn_white = self.board.turn == 'w'
+                print(f"Resumed the game from {path} after {recovered.ply} plies")
+            else:
+                os.remove(path)
+        self.journal = Journal(path)
+        self.journal.start(self.board)
+
+    def restart_journal(self):
+        """
+        Starts the journal over for a new game (after R resets the board).
+        """
+        if self.journal is not None:
+            self.journal.close()
+            os.remove(self.journal_path)
+            self.open_journal()
+
+    def journal_logic(self):
+        """
+        Records the result once the game is decided and syncs moves that have been waiting.
+        """
+        if self.journal is None:
+            return
+        if self.victory and self.journal.result is None:
+            self.journal.finish(RESULTS[self.victory])
+        self.journal.sync_if_due()
+
+    def play_move(self, move, color, played=None):
+        """
+        Plays a move in algebraic notation with evaluate_move and records it in the journal.
+        :param played: The Move the notation resolves to, if the caller already looked it up.
+        :return: (move_success, message) as evaluate_move returns them.
+        """
+        if self.journal is not None and played is None:
+            # Every move played has to be journaled, so one the journal cannot record is refused
+            try:
+                played = LegalMoveSet(self.board).lookup(move)
+            except IllegalMoveError as error:
+                return False, str(error)
+        move_success, message = evaluate_move(self.board, move, color)
+        if move_success and self.journal is not None:
+            self.journal.record(played, self.board)
+        return move_success, message
 
-    def receive_move(self):
-        move = self.conn.recv(1024).decode()
-        self.conn.sendall("ACK".encode())  # Send confirmation
-        return move
+    def apply_move(self, move, is_server):
+        """
+        Plays a move received from the opponent after checking it against the position's legal moves,
+        so a faulty or dishonest peer cannot push the boards out of sync.
+
+        Returns:
+            bool: True if the move was legal and played.
+        """
+        # The opponent plays the color this side does not
+        color = "b" if is_server else "w"
+        try:
+            if self.board.turn != color:
+                raise IllegalMoveError(move, "Not the opponent's turn")
+            legal = LegalMoveSet(self.board)
+            played = legal.lookup(move)
+        except IllegalMoveError as error:
+            print(f"Rejected opponent's move {error}")
+            return False
+        self.position_history.append(self.board.zobrist)
+        move_success, message = self.play_move(legal.san[played], color, played)
+        if move_success:
+            self.check_victory_conditions(move)
+        return move_success
 
     def restore_values(self):
         """
@@ -83,13 +251,22 @@ class Game:
         self.turn = 0
         self.selected_tile = None
         self.victory = None
+        self.move = None
+        self.draw_offered = False
+        self.opponent_clock = None  # (white seconds, black seconds) as last reported by the opponent
+        self.needs_render = True  # Something may have changed since the last frame
+        self.full_redraw = True  # Repaint the whole window instead of the changed squares
+        self.drawn_squares = [None] * (board_size * board_size)  # What each square showed in the last frame
 
     def handle_events(self):
         """
         Processes all incoming events like quitting and clicking.
         """
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+            self.needs_render = True
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.full_redraw = True
+            elif event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
                 self.socket_logic(event.pos)
@@ -97,7 +274,16 @@ class Game:
                 match event.key:
                     case pygame.K_r:
                         self.restore_values()
-        if self.victory:
+                        self.restart_journal()
+                    case pygame.K_d:
+                        self.offer_draw()
+                    case pygame.K_q:
+                        self.resign()
+                    case pygame.K_h:
+                        self.show_hints()
+        if self.victory == "draw":
+            print("The game is drawn")
+        elif self.victory:
             print(f"Color {self.victory} has won")
 
     def handle_click(self, position):
@@ -132,7 +318,7 @@ class Game:
         if self.selected_tile:
             piece = self.board[self.selected_tile]
             move = get_move(self.board, self.selected_tile, target_tile, piece, piece.color)
-            move_success, message = evaluate_move(self.board, move, piece.color)
+            move_success, message = self.play_move(move, piece.color)
             if move_success:
                 self.move = move
                 self.check_victory_conditions(move)
@@ -150,16 +336,48 @@ class Game:
         """
         # Placeholder logic; implement checkmate/stalemate detection here
         if "#" in move:
-            self.victory = self.get_turn_color()
+            # The move has been played, so the side that made it is the one no longer to move
+            self.victory = opponent(self.board.turn)
 
     def render(self):
         """
-        Renders the game screen and board.
+        Renders the squares that changed since the last frame and updates only their rectangles.
+        The whole window is repainted on the first frame, after a reset or when it was exposed.
+
+        Returns:
+            bool: False if the frame was skipped because nothing happened since the last one.
         """
-        self.screen.fill("grey")
-        display(self.screen)
-        self.board.draw(self.screen)
-        pygame.display.flip()
+        if not self.needs_render:
+            return False
+        self.needs_render = False
+
+        full_redraw = self.full_redraw
+        if full_redraw:
+            self.screen.fill("grey")
+            display(self.screen)
+            self.drawn_squares = [None] * (board_size * board_size)
+            self.full_redraw = False
+
+        dirty = []
+        for row in range(board_size):
+            for col in range(board_size):
+                piece = self.board.board[row][col]
+                selected = self.selected_tile == (letters[col], row + 1)
+                state = ((piece.color, piece.type) if piece is not None else None, selected)
+                index = row * board_size + col
+                if self.drawn_squares[index] == state:
+                    continue
+                self.drawn_squares[index] = state
+                rect = self.board.draw_square(self.screen, row, col)
+                if selected:
+                    pygame.draw.rect(self.screen, HIGHLIGHT_COLOR, rect, 4)
+                dirty.append(rect)
+
+        if full_redraw:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+        return True
 
     def mainloop(self):
         """
@@ -167,9 +385,37 @@ class Game:
         """
         while self.running:
             self.handle_events()
-            self.render()
-            self.clock.tick(60)
+            self.network_logic()
+            self.engine_logic()
+            self.journal_logic()
+            drawn = self.render()
+            self.clock.tick(ACTIVE_FPS if drawn else IDLE_FPS)
+        self.connection.close()
+        if self.journal is not None:
+            self.journal.close()
 
 if __name__ == "__main__":
-    game = Game()
+    import argparse
+    from src.engine import EnginePlayer, OpeningBook
+    from src.tablebase import Tablebase
+
+    parser = argparse.ArgumentParser(description="Networked chess game.")
+    parser.add_argument("--server", action="store_true", help="Host the game and play white.")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--engine", type=float, metavar="SECONDS",
+                        help="Let the engine play this side with the given time per move.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes the engine may search with.")
+    parser.add_argument("--book", help="Opening book for the engine and for hints (H key).")
+    parser.add_argument("--tablebases", metavar="DIR", help="Endgame tablebases the engine plays from.")
+    parser.add_argument("--journal", metavar="FILE", help="Record the game to FILE and resume it from there.")
+    args = parser.parse_args()
+
+    book = OpeningBook(args.book) if args.book else None
+    tablebase = Tablebase(args.tablebases) if args.tablebases else None
+    engine = None
+    if args.engine:
+        engine = EnginePlayer('w' if args.server else 'b', time_limit=args.engine, workers=args.workers, book=book,
+                              tablebase=tablebase)
+    game = Game(args.server, args.host, args.port, engine, book, args.journal)
     game.mainloop()
@@ -2,7 +2,7 @@ from src.constants import letters, numbers, path_of_piece, piece_size
 
 class Piece:
     def __init__(self, color, _type) -> None:
-        self._image = None # Path to the image
+        self._image = None # Path to the image, resolved on first use
         self._pos = (None, None) # (letter, number)
         self._color = color
         self._type = _type
@@ -10,6 +10,8 @@ class Piece:
 
     @property
     def image(self):
+        if self._image is None:
+            self._image = self.get_image()
         return self._image
     
     @image.setter
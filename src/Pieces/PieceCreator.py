@@ -1,15 +1,21 @@
-from src.Pieces.Pieces import *
-
 class PieceCreator:
     def __init__(self) -> None:
-        self.pieces = {
-            "pawn": Pawn,
-            "king": King,
-            "queen": Queen,
-            "rook": Rook,
-            "bishop": Bishop,
-            "knight": Knight,
-        }
+        self._pieces = None
+
+    @property
+    def pieces(self):
+        # Imported on first use: constants creates the PieceCreator while the piece modules may still be importing
+        if self._pieces is None:
+            from src.Pieces.Pieces import Pawn, King, Queen, Rook, Bishop, Knight
+            self._pieces = {
+                "pawn": Pawn,
+                "king": King,
+                "queen": Queen,
+                "rook": Rook,
+                "bishop": Bishop,
+                "knight": Knight,
+            }
+        return self._pieces
 
-    def create_piece(self, piece_type: str, color: str) -> Piece:
-        return self.pieces[piece_type](color)
\ No newline at end of file
+    def create_piece(self, piece_type: str, color: str):
+        return self.pieces[piece_type](color)
@@ -3,7 +3,6 @@ from src.Pieces.Piece import Piece
 class Queen(Piece):
     def __init__(self, color) -> None:
         super().__init__(color, 'queen')
-        self.image = self.get_image()
 
     def is_move_valid(self, target_position, board, take):
         current_letter, current_number, target_letter, target_number, current_col, target_col, row_diff, col_diff = self.get_coordinated(target_position)
@@ -0,0 +1,59 @@
+"""
+Image cache for the board rendering.
+
+Every PNG under Visuals/ is decoded once, converted to the display's pixel format and scaled to the tile size.
+Squares are drawn from pre-composited surfaces (background with the piece already on it) keyed by
+(square color, piece, theme), so a frame costs one blit per square and no disk access.
+pygame is imported on first use, keeping the rules code headless.
+"""
+from src.constants import tile_size, theme, path_of_bg, path_of_piece, piece_size
+
+
+class AssetCache:
+    def __init__(self, size=tile_size) -> None:
+        self.size = size
+        self._images = {}  # Path -> surface scaled to the tile size
+        self._tiles = {}  # (square color, (piece color, piece type) or None, theme) -> composited tile
+
+    def image(self, path):
+        """
+        Returns the image at path, loaded, converted and scaled only the first time.
+        """
+        surface = self._images.get(path)
+        if surface is None:
+            import pygame
+            surface = pygame.image.load(path)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()  # Needs a display mode; blits are much faster afterwards
+            if surface.get_size() != (self.size, self.size):
+                surface = pygame.transform.smoothscale(surface, (self.size, self.size))
+            self._images[path] = surface
+        return surface
+
+    def tile(self, square_color, piece=None, board_theme=theme):
+        """
+        Returns the surface of one square, background plus piece.
+        :param square_color: 'dark' or 'light'.
+        :param piece: The Piece on the square, or None.
+        """
+        piece_key = (piece.color, piece.type) if piece is not None else None
+        key = (square_color, piece_key, board_theme)
+        surface = self._tiles.get(key)
+        if surface is None:
+            surface = self.image(path_of_bg.format(theme=board_theme, color=square_color))
+            if piece is not None:
+                surface = surface.copy()  # Keep the cached background clean
+                surface.blit(self.image(path_of_piece.format(color=piece.color, piece=piece.type, size=piece_size)),
+                             (0, 0))
+            self._tiles[key] = surface
+        return surface
+
+    def clear(self):
+        """
+        Drops every cached surface, e.g. after the display mode changed.
+        """
+        self._images.clear()
+        self._tiles.clear()
+
+
+assets = AssetCache()
@@ -0,0 +1,155 @@
+from src.constants import board_size
+from src.squares import iter_bits
+
+# Ray directions as (file step, rank step). Positive directions increase the square index.
+ORTHOGONAL_DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+DIAGONAL_DIRECTIONS = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_OFFSETS = ORTHOGONAL_DIRECTIONS + DIAGONAL_DIRECTIONS
+
+
+def _offset_square(index, file_step, rank_step):
+    """
+    Returns the index of the square reached from `index` by the given step, or None if it leaves the board.
+    """
+    file, rank = index % board_size + file_step, index // board_size + rank_step
+    if 0 <= file < board_size and 0 <= rank < board_size:
+        return rank * board_size + file
+    return None
+
+
+def _leaper_table(offsets):
+    """
+    Builds a per-square attack mask for a piece that jumps by fixed offsets.
+    """
+    table = []
+    for index in range(board_size * board_size):
+        mask = 0
+        for file_step, rank_step in offsets:
+            target = _offset_square(index, file_step, rank_step)
+            if target is not None:
+                mask |= 1 << target
+        table.append(mask)
+    return table
+
+
+def _ray_squares(index, file_step, rank_step):
+    """
+    Lists the squares from `index` (exclusive) to the edge of the board in one direction.
+    """
+    squares = []
+    target = _offset_square(index, file_step, rank_step)
+    while target is not None:
+        squares.append(target)
+        target = _offset_square(target, file_step, rank_step)
+    return squares
+
+
+KNIGHT_ATTACKS = _leaper_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _leaper_table(KING_OFFSETS)
+# PAWN_ATTACKS[color][square] holds the squares a pawn of that color standing on `square` attacks
+PAWN_ATTACKS = {
+    "w": _leaper_table([(-1, 1), (1, 1)]),
+    "b": _leaper_table([(-1, -1), (1, -1)]),
+}
+
+# RAY_SQUARES[direction][square] is the ordered list of squares along the ray, RAYS the same as a mask
+RAY_SQUARES = {
+    direction: [_ray_squares(index, *direction) for index in range(board_size * board_size)]
+    for direction in KING_OFFSETS
+}
+RAYS = {
+    direction: [sum(1 << target for target in squares) for squares in RAY_SQUARES[direction]]
+    for direction in KING_OFFSETS
+}
+
+
+def _is_positive(direction):
+    file_step, rank_step = direction
+    return rank_step > 0 or (rank_step == 0 and file_step > 0)
+
+
+POSITIVE_DIRECTIONS = {direction: _is_positive(direction) for direction in KING_OFFSETS}
+
+
+def nearest_square(direction, mask):
+    """
+    Returns the index of the square in `mask` closest to the origin of a ray in `direction`.
+    """
+    if POSITIVE_DIRECTIONS[direction]:
+        return (mask & -mask).bit_length() - 1
+    return mask.bit_length() - 1
+
+
+def ray_attacks(index, direction, occupied):
+    """
+    Classical ray scan: the squares attacked along one direction, stopping at (and including) the first blocker.
+    """
+    ray = RAYS[direction][index]
+    blockers = ray & occupied
+    if not blockers:
+        return ray
+    return ray ^ RAYS[direction][nearest_square(direction, blockers)]
+
+
+def _between_table():
+    table = [[0] * (board_size * board_size) for _ in range(board_size * board_size)]
+    for index in range(board_size * board_size):
+        for direction in KING_OFFSETS:
+            path = 0
+            for target in RAY_SQUARES[direction][index]:
+                table[index][target] = path
+                path |= 1 << target
+    return table
+
+
+# BETWEEN[a][b] holds the squares strictly between two squares on a shared line (0 if not aligned)
+BETWEEN = _between_table()
+
+
+def rook_attacks(index, occupied):
+    return (ray_attacks(index, (0, 1), occupied) | ray_attacks(index, (1, 0), occupied)
+            | ray_attacks(index, (0, -1), occupied) | ray_attacks(index, (-1, 0), occupied))
+
+
+def bishop_attacks(index, occupied):
+    return (ray_attacks(index, (1, 1), occupied) | ray_attacks(index, (-1, 1), occupied)
+            | ray_attacks(index, (1, -1), occupied) | ray_attacks(index, (-1, -1), occupied))
+
+
+def queen_attacks(index, occupied):
+    return rook_attacks(index, occupied) | bishop_attacks(index, occupied)
+
+
+def attackers_from_mailbox(piece_at, index, color, ignore=None):
+    """
+    Computes the mask of `color` pieces attacking a square using only per-square lookups.
+
+    :param piece_at: Callable returning the piece on a square index, or None.
+    :param index: Index of the attacked square.
+    :param color: Color of the attacking side ('w' or 'b').
+    :param ignore: Optional square index treated as empty (e.g. the king that is about to move).
+    :return: Mask of the squares holding attackers.
+    """
+    attackers = 0
+    defending_color = "b" if color == "w" else "w"
+
+    for kind, table in (("knight", KNIGHT_ATTACKS), ("king", KING_ATTACKS), ("pawn", PAWN_ATTACKS[defending_color])):
+        for source in iter_bits(table[index]):
+            piece = piece_at(source)
+            if piece is not None and piece.color == color and piece.type == kind:
+                attackers |= 1 << source
+
+    for directions, sliders in ((ORTHOGONAL_DIRECTIONS, ("rook", "queen")), (DIAGONAL_DIRECTIONS, ("bishop", "queen"))):
+        for direction in directions:
+            for source in RAY_SQUARES[direction][index]:
+                if source == ignore:
+                    continue
+                piece = piece_at(source)
+                if piece is None:
+                    continue
+                if piece.color == color and piece.type in sliders:
+                    attackers |= 1 << source
+                break
+
+    return attackers
@@ -0,0 +1,111 @@
+from src.board import Board
+from src.constants import board_size
+from src.squares import SQUARES, SQUARE_INDEX, COLORS, PIECE_TYPES, iter_bits, opponent
+from src.zobrist import PIECE_KEYS
+from src.attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks
+
+
+class SquareRows:
+    """
+    Read-only rows of a square list: rows[row][col] is the piece on that square, each row a tuple.
+    """
+    __slots__ = ("_squares",)
+
+    def __init__(self, squares) -> None:
+        self._squares = squares
+
+    def __len__(self):
+        return board_size
+
+    def __getitem__(self, row):
+        row = range(board_size)[row]  # Negative indices and IndexError, like a list
+        return tuple(self._squares[row * board_size:(row + 1) * board_size])
+
+
+class BitboardBoard(Board):
+    """
+    Board that keeps the position as twelve 64-bit piece masks plus per-color and total occupancy.
+
+    It exposes the same API as Board (indexing by ('e', 4), items(), execute_castle, last_pawn_move),
+    so moving_logic and click_logic run on it unchanged, but piece lookups only visit occupied squares.
+    """
+
+    def _reset_storage(self):
+        self._squares = [None] * (board_size * board_size)
+        self.bitboards = {(color, piece_type): 0 for color in COLORS for piece_type in PIECE_TYPES}
+        self.occupancy = {color: 0 for color in COLORS}
+        self.occupied = 0
+
+    @property
+    def board(self):
+        # Read-only row/column view for code written against the list-of-lists layout (e.g. draw). The rows
+        # are tuples, so a write through board.board[row][col] fails instead of missing the masks; use
+        # board[('e', 4)] = piece to change a square.
+        return SquareRows(self._squares)
+
+    def pieces_of(self, color, piece_type=None):
+        """
+        Yields the pieces of a given color, optionally restricted to one type, by walking the set bits
+        of the matching mask instead of all 64 squares.
+        """
+        mask = self.occupancy[color] if piece_type is None else self.bitboards[(color, piece_type)]
+        squares = self._squares
+        for index in iter_bits(mask):
+            yield squares[index]
+
+    def attackers_of(self, square, color, ignore=None):
+        """
+        Finds the pieces of a given color that attack a square with set-wise mask operations.
+        Returns a mask of attacker squares, see Board.attackers_of.
+        """
+        index = SQUARE_INDEX[square]
+        occupied = self.occupied
+        if ignore is not None:
+            occupied &= ~(1 << SQUARE_INDEX[ignore])
+        bitboards = self.bitboards
+        queens = bitboards[(color, "queen")]
+
+        return ((KNIGHT_ATTACKS[index] & bitboards[(color, "knight")])
+                | (KING_ATTACKS[index] & bitboards[(color, "king")])
+                | (PAWN_ATTACKS[opponent(color)][index] & bitboards[(color, "pawn")])
+                | (rook_attacks(index, occupied) & (bitboards[(color, "rook")] | queens))
+                | (bishop_attacks(index, occupied) & (bitboards[(color, "bishop")] | queens)))
+
+    def piece_at(self, index):
+        return self._squares[index]
+
+    def _place(self, index, piece):
+        bit = 1 << index
+        self._squares[index] = piece
+        self.bitboards[(piece.color, piece.type)] |= bit
+        self.occupancy[piece.color] |= bit
+        self.occupied |= bit
+        self._hash ^= PIECE_KEYS[(piece.color, piece.type)][index]
+
+    def __getitem__(self, item):
+        return self._squares[SQUARE_INDEX[item]]
+
+    def __setitem__(self, key, value):
+        index = SQUARE_INDEX[key]
+        bit = 1 << index
+
+        # Clear whatever was on the square before
+        previous = self._squares[index]
+        if previous is not None:
+            self.bitboards[(previous.color, previous.type)] &= ~bit
+            self.occupancy[previous.color] &= ~bit
+            self._hash ^= PIECE_KEYS[(previous.color, previous.type)][index]
+
+        if value is not None:
+            self.bitboards[(value.color, value.type)] |= bit
+            self.occupancy[value.color] |= bit
+            self._hash ^= PIECE_KEYS[(value.color, value.type)][index]
+
+        self._squares[index] = value
+        self.occupied = self.occupancy["w"] | self.occupancy["b"]
+
+    def items(self):
+        """
+        Returns an iterator of positions and their contents in chess notation.
+        """
+        return zip(SQUARES, self._squares)
@@ -1,18 +1,91 @@
-from typing import Any
-from src.constants import numbers, letters, tile_size, board_size, theme, font, margin, piece_creator
+from src.constants import numbers, letters, tile_size, board_size, theme, margin, piece_creator, pieces, inverse_pieces
 from src.Pieces.King import King
 from src.Pieces.Rook import Rook
-import pygame
+from src.squares import SQUARES, SQUARE_INDEX, COLORS, PIECE_TYPES, opponent
+from src.attacks import attackers_from_mailbox
+from src.movegen import generate_moves, KING_CASTLE, DOUBLE_PUSH, EN_PASSANT
+from src.assets import assets
+from src.zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, castling_key, en_passant_key
+
+# FEN piece letter -> piece class, used to build positions without going through create_piece
+PIECE_CLASSES = {symbol: piece_creator.pieces[name] for symbol, name in pieces.items()}
+
+# Castling right -> (king square index, rook square index)
+CASTLING_SQUARES = {"K": (4, 7), "Q": (4, 0), "k": (60, 63), "q": (60, 56)}
+
 
 class Board:
     def __init__(self) -> None:
-        self._board = [[None for i in range(len(numbers))] for j in range(len(letters))]
-        self.last_pawn_move = None # Track the last pawn move for en passant
+        self._clear()
         self.initialize_board()
 
+    def _clear(self):
+        """
+        Resets the board to an empty position with white to move.
+        """
+        self._hash = 0 # Zobrist key of pieces and side to move (see zobrist)
+        self._last_pawn_move = None
+        self._turn = 'w'
+        self._reset_storage()
+        self.last_pawn_move = None # Track the last pawn move for en passant
+        self.turn = 'w' # Side to move
+        self.halfmove_clock = 0 # Plies since the last capture or pawn move (fifty-move rule)
+        self.fullmove_number = 1
+        self._undo_stack = [] # One record per move played with make_move
+
+    def _reset_storage(self):
+        """
+        Allocates the empty square storage. Subclasses override this to use a different layout.
+        """
+        self._board = [[None for i in range(len(numbers))] for j in range(len(letters))]
+        # Piece masks, kept in step with the squares by _place and __setitem__ (see masks)
+        self.bitboards = {(color, piece_type): 0 for color in COLORS for piece_type in PIECE_TYPES}
+        self.occupancy = {color: 0 for color in COLORS}
+
     @property
     def board(self):
         return self._board
+
+    @property
+    def last_pawn_move(self):
+        return self._last_pawn_move
+
+    @last_pawn_move.setter
+    def last_pawn_move(self, square):
+        # Not hashed here: whether the en passant file counts depends on the pawns beside it (see zobrist)
+        self._last_pawn_move = square
+
+    @property
+    def turn(self):
+        return self._turn
+
+    @turn.setter
+    def turn(self, color):
+        if color != self._turn:
+            self._hash ^= BLACK_TO_MOVE_KEY
+        self._turn = color
+
+    @property
+    def zobrist(self):
+        """
+        64-bit Zobrist key of the position, including side to move, castling rights and en passant file.
+        Pieces and side to move are hashed incrementally; castling rights are read from has_moved, and the
+        en passant file is only included when a pawn of the side to move could capture (zobrist.en_passant_key).
+        """
+        return self._hash ^ castling_key(self.castling_rights()) ^ en_passant_key(self)
+
+    def castling_rights(self):
+        """
+        Returns the castling rights in FEN order (e.g. 'KQkq', '-' is returned as ''), derived from has_moved.
+        """
+        rights = ""
+        for symbol, color, row, rook_col in (("K", "w", 0, 7), ("Q", "w", 0, 0), ("k", "b", 7, 7), ("q", "b", 7, 0)):
+            king = self.piece_at(row * board_size + 4)
+            rook = self.piece_at(row * board_size + rook_col)
+            if (king is not None and king.type == "king" and king.color == color and not king.has_moved
+                    and rook is not None and rook.type == "rook" and rook.color == color and not rook.has_moved):
+                rights += symbol
+        return rights
     
     def initialize_board(self):
         piece_order = ["rook", "knight", "bishop", "queen", "king", "bishop", "knight", "rook"]
@@ -28,45 +101,187 @@ class Board:
                 piece.pos = (letters[col], main_rank)
                 self[(letters[col], main_rank)] = piece
 
-    def find_pieces(self, color, piece_type, target_square, disambiguation="", take = None):
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Builds a board from a FEN string in a single pass over the text.
+        Castling rights are stored as has_moved on the king and rooks, and the en passant square as
+        last_pawn_move (the square of the pawn that just advanced two squares).
+        :param fen: e.g. 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'. The clocks are optional.
+        :return: A new board of this class.
+        """
+        fields = fen.split()
+        if len(fields) not in (4, 6):
+            raise ValueError(f"Invalid FEN, expected 4 or 6 fields: {fen!r}")
+        placement, turn, castling, en_passant = fields[:4]
+
+        board = cls.__new__(cls)
+        board._clear()
+
+        rank, file = 7, 0
+        for symbol in placement:
+            if symbol == "/":
+                if file != board_size:
+                    raise ValueError(f"Invalid FEN, rank {rank + 1} does not have 8 squares: {fen!r}")
+                rank -= 1
+                file = 0
+            elif symbol in "12345678":
+                file += ord(symbol) - 48
+            else:
+                piece_class = PIECE_CLASSES.get(symbol.lower())
+                if piece_class is None or file >= board_size or rank < 0:
+                    raise ValueError(f"Invalid FEN placement: {fen!r}")
+                piece = piece_class("w" if symbol < "a" else "b")
+                index = rank * board_size + file
+                piece._pos = SQUARES[index]  # Already validated by the parser
+                # Kings and rooks keep castling rights only if the castling field grants them below
+                piece.has_moved = piece.type in ("king", "rook")
+                board._place(index, piece)
+                file += 1
+        if rank != 0 or file != board_size:
+            raise ValueError(f"Invalid FEN, expected 8 ranks: {fen!r}")
+
+        if turn not in ("w", "b"):
+            raise ValueError(f"Invalid FEN side to move: {turn!r}")
+        board.turn = turn
+
+        if castling != "-":
+            for right in castling:
+                king_index, rook_index = CASTLING_SQUARES.get(right, (None, None))
+                king = board.piece_at(king_index) if king_index is not None else None
+                rook = board.piece_at(rook_index) if rook_index is not None else None
+                if king is None or king.type != "king" or rook is None or rook.type != "rook":
+                    raise ValueError(f"Invalid FEN castling right {right!r}: {fen!r}")
+                king.has_moved = rook.has_moved = False
+
+        if en_passant != "-":
+            square = SQUARE_INDEX.get((en_passant[0], int(en_passant[1]) if en_passant[1:].isdigit() else 0))
+            if square is None:
+                raise ValueError(f"Invalid FEN en passant square: {en_passant!r}")
+            # FEN names the square the pawn skipped, the board tracks the pawn itself
+            board.last_pawn_move = SQUARES[square - board_size if turn == "w" else square + board_size]
+
+        if len(fields) == 6:
+            board.halfmove_clock = int(fields[4])
+            board.fullmove_number = int(fields[5])
+        return board
+
+    def to_fen(self):
+        """
+        Describes the position as a FEN string, including castling rights, en passant square and clocks.
+        """
+        ranks = []
+        for rank in range(board_size - 1, -1, -1):
+            text = ""
+            empty = 0
+            for file in range(board_size):
+                piece = self.piece_at(rank * board_size + file)
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                symbol = inverse_pieces[piece.type]
+                text += symbol.upper() if piece.color == "w" else symbol
+            ranks.append(text + (str(empty) if empty else ""))
+
+        en_passant = "-"
+        if self.last_pawn_move is not None:
+            file, rank = self.last_pawn_move
+            en_passant = f"{file}{rank - 1 if self.turn == 'b' else rank + 1}"
+        return (f"{'/'.join(ranks)} {self.turn} {self.castling_rights() or '-'} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def _place(self, index, piece):
+        """
+        Puts a piece on an empty square index, keeping the Zobrist key in step.
+        """
+        self._board[index // board_size][index % board_size] = piece
+        self.bitboards[(piece.color, piece.type)] |= 1 << index
+        self.occupancy[piece.color] |= 1 << index
+        self._hash ^= PIECE_KEYS[(piece.color, piece.type)][index]
+
+    def find_pieces(self, color, piece_type, target_square, disambiguation="", take = None, promotion=None):
         """
         Finds all pieces of a given type and color that could legally move to a target square.
+        Pinned pieces and moves that leave the king in check are excluded, so only real ambiguities remain.
         :param color: The color of the piece ('white' or 'black').
         :param piece_type: The type of the piece ('pawn', 'knight', 'bishop', 'rook', 'queen', or 'king').
         :param target_square: The square the piece is moving to (e.g., 'd4').
         :param disambiguation: Optional disambiguation string to specify file or rank of the piece.
+        :param promotion: The piece type a pawn promotes to, or None. A pawn reaching the last rank needs one and
+                          every other move must have none.
         :return: A list of piece objects that could move to the target square.
         """
         possible_pieces = []
+        target_index = SQUARE_INDEX[target_square]
+
+        for move in self.generate_legal(color, piece_type):
+            # Castling is only expressed as O-O / O-O-O, and the capture marker has to match the move
+            if move.to_index != target_index or move.is_castle or move.is_capture != bool(take):
+                continue
+            if move.promotion != promotion:
+                continue
+            piece = self.piece_at(move.from_index)
+            # If disambiguation is provided, check if it matches
+            if disambiguation:
+                # Separate file and rank components if both are provided (e.g., "e2")
+                dis_file = disambiguation[0] if disambiguation[0] in letters else ""
+                dis_rank = disambiguation[1] if len(disambiguation) == 2 else disambiguation if disambiguation.isdigit() else ""
+
+                # Check if disambiguation file matches the piece's current file
+                if dis_file and piece.pos[0] != dis_file:
+                    continue
+
+                # Check if disambiguation rank matches the piece's current rank
+                if dis_rank and str(piece.pos[1]) != dis_rank:
+                    continue
+
+            possible_pieces.append(piece)
+
+        return possible_pieces
+
+    def generate_pseudo_legal(self, color=None, piece_type=None):
+        """
+        Generates the pseudo-legal moves (they may leave the own king in check), including castling,
+        en passant and promotions.
+        :param color: The side to move ('w' or 'b'). Defaults to the side whose turn it is.
+        :param piece_type: Optional piece type to restrict generation to.
+        :return: A list of movegen.Move objects.
+        """
+        return generate_moves(self, color or self.turn, legal=False, piece_type=piece_type)
+
+    def generate_legal(self, color=None, piece_type=None):
+        """
+        Generates the legal moves, using pin and check masks rather than trying each move on the board.
+        :param color: The side to move ('w' or 'b'). Defaults to the side whose turn it is.
+        :param piece_type: Optional piece type to restrict generation to.
+        :return: A list of movegen.Move objects.
+        """
+        return generate_moves(self, color or self.turn, legal=True, piece_type=piece_type)
 
-        # Loop through all squares on the board to find pieces matching the color and type
+    def masks(self):
+        """
+        Returns the piece masks of the position, maintained as pieces are placed and removed.
+        They are the board's own dictionaries: read them, do not modify them.
+        :return: (bitboards, occupancy), keyed by (color, piece type) and by color respectively.
+        """
+        return self.bitboards, self.occupancy
+
+    def pieces_of(self, color, piece_type=None):
+        """
+        Yields the pieces of a given color, optionally restricted to one type.
+        :param color: The color of the pieces ('w' or 'b').
+        :param piece_type: Optional piece type ('pawn', 'knight', ...). All types if omitted.
+        """
         for row in range(board_size):
             for col in range(board_size):
                 piece = self.board[row][col]
-                # Skip empty squares or pieces of the wrong color/type
-                if piece is None or piece.color != color or piece.type != piece_type:
+                if piece is None or piece.color != color:
                     continue
-                # Check if the piece can legally move to the target square
-                valid = piece.is_move_valid(target_square, self, take)
-                if valid[0]:
-                    # If disambiguation is provided, check if it matches
-                    if disambiguation:
-                        # Separate file and rank components if both are provided (e.g., "e2")
-                        dis_file = disambiguation[0] if disambiguation[0] in letters else ""
-                        dis_rank = disambiguation[1] if len(disambiguation) == 2 else disambiguation if disambiguation.isdigit() else ""
-
-                        # Check if disambiguation file matches the piece's current file
-                        if dis_file and piece.pos[0] != dis_file:
-                            continue
-
-                        # Check if disambiguation rank matches the piece's current rank
-                        if dis_rank and str(piece.pos[1]) != dis_rank:
-                            continue
-                    
-                    # Add the piece to the list of possible pieces
-                    possible_pieces.append(piece)
-
-        return possible_pieces
+                if piece_type is None or piece.type == piece_type:
+                    yield piece
     
     def execute_castle(self, color, kingside):
         # Set starting positions based on color
@@ -77,13 +292,93 @@ class Board:
         rook_end = ('f', row) if kingside else ('d', row)
         
         # Move the king to its castled position
-        self[king_end] = self[king_start]
+        king = self[king_start]
+        self[king_end] = king
         self[king_start] = None  # Clear the king's starting position
+        king.pos = king_end
+        king.has_moved = True
 
         # Move the rook to its castled position
-        self[rook_end] = self[rook_start]
+        rook = self[rook_start]
+        self[rook_end] = rook
         self[rook_start] = None  # Clear the rook's starting position
+        rook.pos = rook_end
+        rook.has_moved = True
+
+
+    def make_move(self, move):
+        """
+        Plays a generated move (see generate_legal) and pushes an undo record so unmake_move can restore
+        the exact previous state: captured pieces, castling rights (has_moved), en passant, promotion,
+        side to move and clocks.
+        :param move: A movegen.Move that is legal in the current position.
+        """
+        piece = self.piece_at(move.from_index)
+        color = piece.color
+        record = (move, piece, piece.has_moved, self.last_pawn_move, self.halfmove_clock)
 
+        if move.is_castle:
+            self.execute_castle(color, move.flag == KING_CASTLE)
+            self.halfmove_clock += 1
+            self.last_pawn_move = None
+        else:
+            captured_square = self.last_pawn_move if move.flag == EN_PASSANT else move.to_square
+            captured = self[captured_square]
+            record += (captured_square, captured)
+            self[captured_square] = None
+            self[move.from_square] = None
+            if move.promotion:
+                piece = piece_creator.create_piece(move.promotion, color)
+            piece.pos = move.to_square
+            piece.has_moved = True
+            self[move.to_square] = piece
+
+            if captured is not None or piece.type == "pawn" or move.promotion:
+                self.halfmove_clock = 0
+            else:
+                self.halfmove_clock += 1
+            self.last_pawn_move = move.to_square if move.flag == DOUBLE_PUSH else None
+
+        if color == 'b':
+            self.fullmove_number += 1
+        self.turn = opponent(color)
+        self._undo_stack.append(record)
+
+    def unmake_move(self):
+        """
+        Takes back the last move played with make_move.
+        :return: The move that was taken back.
+        """
+        record = self._undo_stack.pop()
+        move, piece, had_moved, last_pawn_move, halfmove_clock = record[:5]
+        color = piece.color
+
+        if move.is_castle:
+            row = move.from_square[1]
+            rook_start = ('h', row) if move.flag == KING_CASTLE else ('a', row)
+            rook_end = ('f', row) if move.flag == KING_CASTLE else ('d', row)
+            rook = self[rook_end]
+            self[move.to_square] = None
+            self[rook_end] = None
+            self[move.from_square] = piece
+            self[rook_start] = rook
+            rook.pos = rook_start
+            # Castling is only possible while neither piece has moved
+            rook.has_moved = False
+        else:
+            captured_square, captured = record[5:]
+            self[move.to_square] = None
+            self[captured_square] = captured
+            self[move.from_square] = piece
+
+        piece.pos = move.from_square
+        piece.has_moved = had_moved
+        self.last_pawn_move = last_pawn_move
+        self.halfmove_clock = halfmove_clock
+        if color == 'b':
+            self.fullmove_number -= 1
+        self.turn = color
+        return move
 
     def is_castling_valid(self, color, kingside):
         row = 1 if color == "w" else 8
@@ -110,9 +405,10 @@ class Board:
                 return False
 
         # Check that no square the king moves through (including starting and ending) is under attack
-        for col in range(king_col, king_col + 2 * step, step):
+        enemy = opponent(color)
+        for col in range(king_col, king_col + 3 * step, step):
             position = (chr(col + ord('a')), row)  # Convert to chess notation
-            if self.is_square_under_attack(position, color):
+            if self.is_square_under_attack(position, enemy):
                 return False
 
         # If all conditions are satisfied, castling is valid
@@ -120,56 +416,71 @@ class Board:
     
     def is_square_under_attack(self, square, attack_color):
         """
-        Checks if a square is under attack by the opponent.
-        :param square: Tuple (row, col) of the square to check.
-        :param color: The color of the player making the check (used to identify opponent).
+        Checks if a square is under attack by the given side.
+        :param square: The square to check in chess notation (e.g., ('e', 4)).
+        :param attack_color: The color of the attacking side ('w' or 'b').
         :return: True if the square is under attack, False otherwise.
         """
+        return self.attackers_of(square, attack_color) != 0
+
+    def attackers_of(self, square, color, ignore=None):
+        """
+        Finds the pieces of a given color that attack a square, using the precomputed attack tables.
+        :param square: The attacked square in chess notation (e.g., ('e', 4)).
+        :param color: The color of the attacking pieces ('w' or 'b').
+        :param ignore: Optional square treated as empty, e.g. a king that is about to step off the line.
+        :return: A mask of attacker squares (bit i set for squares.SQUARES[i]).
+        """
+        ignore = SQUARE_INDEX[ignore] if ignore is not None else None
+        return attackers_from_mailbox(self.piece_at, SQUARE_INDEX[square], color, ignore)
+
+    def piece_at(self, index):
+        """
+        Returns the piece on a square index (0 = a1, 63 = h8), or None.
+        """
+        return self._board[index // board_size][index % board_size]
+
+    def probe_tablebase(self, tablebase):
+        """
+        Looks the position up in an endgame tablebase (see src.tablebase).
+        :return: TablebaseResult (win/draw/loss and moves to mate), or None if the position is not covered.
+        """
+        return tablebase.probe(self)
 
-        # Check if any opponent piece can move to the square
-        defending_color = "b" if attack_color == "w" else "w"
-        # Check if any opponent piece can legally move to the square
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece is not None and piece.color == attack_color:
-                    # Check both capturing and non-capturing moves
-                    is_valid_capture = piece.is_move_valid(square, self, take=True)[0]
-                    if is_valid_capture or piece.is_move_valid(square, self, take=False)[0]:
-                        return True
-        return False
-    
     def draw(self, screen):
-    # Assuming tile_size is imported from another module, ensure it is referenced here
         for row in range(board_size):
             for col in range(board_size):
-                # Determine the color of the tile based on position (alternating pattern)
-                color = "dark" if (row + col) % 2 == 0 else "light"
-                path_of_bg = rf"Visuals\square_{theme}_{color}_png_shadow_128px.png"
-                
-                # Load the background tile image afresh for each tile to avoid carryover
-                tile_image = pygame.image.load(path_of_bg)
-
-                # Check if there’s a piece on this square
-                piece = self.board[row][col]
-                if piece is not None:
-                    # print(f"Drawing {piece.type} at ({row}, {col}) - Expected position: {piece.pos}")
-                    piece_path = piece.image  # This should point to the correct image path for the piece
-                    piece_image = pygame.image.load(piece_path)
-                    piece_image = pygame.transform.scale(piece_image, (tile_size, tile_size))
-                    tile_image.blit(piece_image, (0, 0))  # Overlay the piece image onto the tile
-
-                # Calculate the position on the screen
-                x_pos = col * tile_size + margin
-                y_pos = (7 - row) * tile_size + margin  # Adjust for bottom-to-top display
-                screen.blit(tile_image, (x_pos, y_pos))
+                self.draw_square(screen, row, col)
+
+    def draw_square(self, screen, row, col):
+        """
+        Blits one square (background and piece) from the asset cache.
+        :return: The screen rectangle that was drawn.
+        """
+        # Determine the color of the tile based on position (alternating pattern)
+        color = "dark" if (row + col) % 2 == 0 else "light"
+        x_pos = col * tile_size + margin
+        y_pos = (7 - row) * tile_size + margin  # Adjust for bottom-to-top display
+        return screen.blit(assets.tile(color, self.board[row][col], theme), (x_pos, y_pos))
 
     def __getitem__(self, item):
         return self.board[item[1]-1][ord(item[0]) - ord('a')]
     
     def __setitem__(self, key, value):
-        # print("changes", key, value)
-        self.board[key[1]-1][ord(key[0]) - ord('a')] = value
+        row, col = key[1]-1, ord(key[0]) - ord('a')
+        index = row * board_size + col
+        # Keep the piece masks and the Zobrist key in step with the squares
+        bit = 1 << index
+        previous = self.board[row][col]
+        if previous is not None:
+            self.bitboards[(previous.color, previous.type)] &= ~bit
+            self.occupancy[previous.color] &= ~bit
+            self._hash ^= PIECE_KEYS[(previous.color, previous.type)][index]
+        if value is not None:
+            self.bitboards[(value.color, value.type)] |= bit
+            self.occupancy[value.color] |= bit
+            self._hash ^= PIECE_KEYS[(value.color, value.type)][index]
+        self.board[row][col] = value
 
     def items(self):
         """
@@ -1,7 +1,8 @@
-from src.constants import inverse_pieces
+from src.constants import inverse_pieces, pieces
 import threading
 from src.utils import get_en_passant_pos
 from src.moving_logic import evaluate_move
+from src.squares import SQUARE_INDEX, mask_to_squares, opponent
 
 def is_capture(board, final_tile, current_piece_color, piece_type):
     """
@@ -145,14 +146,18 @@ def is_promotion_needed(final_tile, color, piece_type):
 
     return None
 
-def is_check_needed(board, initial_tile, final_tile, piece, color):
+def is_check_needed(board, initial_tile, final_tile, piece, color, promotion=None):
     """
     Determines if a move results in a check or checkmate on the opponent's king.
     """
     opponent_color = "b" if color == "w" else "w"
 
-    # Temporarily execute the move
-    original_piece = execute_temporary_move(board, initial_tile, final_tile, piece)
+    move = find_generated_move(board, initial_tile, final_tile, color, promotion)
+    if move is None:
+        return ""  # Illegal moves are rejected later by evaluate_move
+
+    # Play the move, inspect the resulting position and take it back
+    board.make_move(move)
 
     # Locate the opponent's king
     king_position = find_king_position(board, opponent_color)
@@ -161,34 +166,26 @@ def is_check_needed(board, initial_tile, final_tile, piece, color):
     is_check = board.is_square_under_attack(king_position, color) if king_position else False
 
     # Determine if it's checkmate
-    print(can_escape_check(board, opponent_color, king_position))
     is_checkmate = is_check and not can_escape_check(board, opponent_color, king_position)
 
-    # Undo the temporary move
-    undo_temporary_move(board, initial_tile, final_tile, piece, original_piece)
+    board.unmake_move()
 
     # Return check status
     return "#" if is_checkmate else "+" if is_check else ""
 
 
-def execute_temporary_move(board, initial_tile, final_tile, piece):
-    """
-    Executes a temporary move on the board and returns the piece displaced by the move.
-    """
-    original_piece = board[final_tile]
-    board[final_tile] = piece
-    board[initial_tile] = None
-    piece.pos = final_tile  # Update piece position
-    return original_piece
-
-
-def undo_temporary_move(board, initial_tile, final_tile, piece, original_piece):
+def find_generated_move(board, initial_tile, final_tile, color, promotion=None):
     """
-    Reverts a temporary move on the board.
+    Returns the legal Move from initial_tile to final_tile, or None if there is none.
+    For promotions the requested piece symbol (e.g. 'Q') selects the move; a queen is assumed if omitted.
     """
-    board[initial_tile] = piece
-    board[final_tile] = original_piece
-    piece.pos = initial_tile  # Restore piece position
+    source, target = SQUARE_INDEX[initial_tile], SQUARE_INDEX[final_tile]
+    promotion_type = pieces[promotion.lower()] if promotion else "queen"
+    for move in board.generate_legal(color):
+        if move.from_index == source and move.to_index == target:
+            if move.promotion is None or move.promotion == promotion_type:
+                return move
+    return None
 
 
 def find_king_position(board, color):
@@ -206,8 +203,7 @@ def find_king_position(board, color):
 def can_escape_check(board, color, king_position):
     """
     Checks if there is any legal move that can remove the check on the king.
-    First checks if the king can escape, then if an attacking piece can be captured,
-    and finally if the check can be blocked by other pieces.
+    King moves, captures of the attacker and blocks are all covered by the legal move generator.
 
     Parameters:
         board (Board): The current board instance.
@@ -217,133 +213,14 @@ def can_escape_check(board, color, king_position):
     Returns:
         bool: True if any move can escape check, False if none can.
     """
-    # Step 1: Check if the king can escape by moving to a safe adjacent square
-    if can_king_escape(board, color, king_position):
-        return True
-
-    # Step 2: Check if an attacking piece can be captured
-    attackers = get_attackers(board, color, king_position)
-    if can_capture_attacker(board, color, attackers):
-        return True
-
-    # Step 3: Check if any piece can block the check
-    if can_block_check(board, color, king_position, attackers):
-        return True
-
-    # No move could evade the check
-    return False
-
-
-def can_king_escape(board, color, king_position):
-    """
-    Checks if the king can escape check by moving to any adjacent square.
-    """
-    king_moves = get_legal_moves(board, king_position)  # Get all legal moves for the king
-    for move in king_moves:
-        if not board.is_square_under_attack(move, color):
-            return True
-    return False
+    return len(board.generate_legal(color)) > 0
 
 
 def get_attackers(board, color, king_position):
     """
     Returns a list of positions of all pieces currently attacking the king.
     """
-    opponent_color = "b" if color == "w" else "w"
-    attackers = []
-    for row in range(8):
-        for col in range(8):
-            pos = (chr(col + ord('a')), row + 1)
-            piece = board[pos]
-            if piece and piece.color == opponent_color:
-                if piece.is_move_valid(king_position, board, take=True)[0]:
-                    attackers.append(pos)
-    return attackers
-
-
-def can_capture_attacker(board, color, attackers):
-    """
-    Checks if any piece can capture an attacker to remove the check.
-    """
-    for attacker_pos in attackers:
-        for row in range(8):
-            for col in range(8):
-                piece_pos = (chr(col + ord('a')), row + 1)
-                piece = board[piece_pos]
-                if piece and piece.color == color and piece.type != "king":
-                    if piece.is_move_valid(attacker_pos, board, take=True)[0]:
-                        print(piece)
-                        # Simulate the capture and check if it removes the check
-                        original_piece = execute_temporary_move(board, piece_pos, attacker_pos, piece)
-                        king_position = find_king_position(board, color)
-                        king_safe = not board.is_square_under_attack(king_position, color)
-                        undo_temporary_move(board, piece_pos, attacker_pos, piece, original_piece)
-
-                        if king_safe:
-                            return True
-    return False
-
-
-def can_block_check(board, color, king_position, attackers):
-    """
-    Checks if any piece can block the check by moving between the king and the attacker.
-    Only applicable if there is a single sliding attacker (rook, bishop, or queen).
-    """
-    if len(attackers) != 1:
-        return False  # Only one attacker can be blocked; otherwise, it's double check
-
-    attacker_pos = attackers[0]
-    attacker_piece = board[attacker_pos]
-
-    # Check if the attacker is a sliding piece that can be blocked
-    if attacker_piece.type not in ["rook", "bishop", "queen"]:
-        return False  # Non-sliding pieces can't be blocked
-
-    # Generate all squares between the attacker and the king
-    blocking_squares = get_squares_between(king_position, attacker_pos)
-
-    # Check if any piece of the same color can move to a blocking square
-    for square in blocking_squares:
-        for row in range(8):
-            for col in range(8):
-                piece_pos = (chr(col + ord('a')), row + 1)
-                piece = board[piece_pos]
-                if piece and piece.color == color:
-                    if piece.is_move_valid(square, board, take=False)[0]:
-                        # Simulate the block and check if it removes the check
-                        original_piece = execute_temporary_move(board, piece_pos, square, piece)
-                        king_safe = not board.is_square_under_attack(king_position, color)
-                        undo_temporary_move(board, piece_pos, square, piece, original_piece)
-
-                        if king_safe:
-                            return True
-    return False
-
-
-def get_squares_between(start, end):
-    """
-    Returns all squares between two positions (start and end) in a straight line or diagonal.
-    Only used for sliding pieces (rook, bishop, queen).
-    """
-    squares_between = []
-
-    file_diff = ord(end[0]) - ord(start[0])
-    rank_diff = end[1] - start[1]
-
-    # Determine the direction of movement
-    file_step = (file_diff // abs(file_diff)) if file_diff != 0 else 0
-    rank_step = (rank_diff // abs(rank_diff)) if rank_diff != 0 else 0
-
-    # Start at the first square after the starting square and move towards the end square
-    current_file = ord(start[0]) + file_step
-    current_rank = start[1] + rank_step
-
-    while (current_file, current_rank) != (ord(end[0]), end[1]):
-        squares_between.append((chr(current_file), current_rank))
-        current_file += file_step
-        current_rank += rank_step
-
-    return squares_between
+    return mask_to_squares(board.attackers_of(king_position, opponent(color)))
 
 
 def get_legal_moves(board, position):
@@ -362,38 +239,11 @@ def get_legal_moves(board, position):
         return []  # No piece at the given position
 
     legal_moves = []
-    original_pos = piece.pos
-
-    # Loop over all possible target squares on an 8x8 board
-    for target_row in range(1, 9):
-        for target_col in range(8):
-            target_square = (chr(target_col + ord('a')), target_row)
-
-            # Skip if the target is the same as the current position
-            if position == target_square:
-                continue
-
-            # Check if the move is valid for this piece type
-            is_valid_move, move_type = piece.is_move_valid(target_square, board, take=(board[target_square] is not None))
-            if is_valid_move:
-                # Simulate the move and check if it leaves the king in check
-                original_target_piece = board[target_square]
-                board[target_square] = piece
-                board[original_pos] = None
-                piece.pos = target_square
-
-                # Check if this move would leave the king safe
-                king_position = find_king_position(board, piece.color)
-                king_safe = not board.is_square_under_attack(king_position, piece.color)
-
-                # Undo the move
-                board[original_pos] = piece
-                board[target_square] = original_target_piece
-                piece.pos = original_pos
-
-                # If the king is safe, add the move to the list of legal moves
-                if king_safe:
-                    legal_moves.append(target_square)
+    source = SQUARE_INDEX[position]
+    for move in board.generate_legal(piece.color, piece.type):
+        # Promotions produce one move per promoted piece on the same target square
+        if move.from_index == source and move.to_square not in legal_moves:
+            legal_moves.append(move.to_square)
 
     return legal_moves
 
@@ -420,11 +270,7 @@ def find_candidates(board, initial_tile, final_tile, piece, capture):
     Finds all pieces of the same type and color that could move to the final tile.
     """
     color = board[initial_tile].color
-    return [
-        pos for pos, other_piece in board.items()
-        if other_piece and other_piece.type == piece and other_piece.color == color
-        and other_piece.is_move_valid(final_tile, board, capture)
-    ]
+    return [other_piece.pos for other_piece in board.find_pieces(color, piece, final_tile, take=capture)]
 
 
 def needs_disambiguation(candidates):
@@ -490,9 +336,9 @@ def prepare_move_data(board, initial_tile, final_tile, piece, color):
     Prepares data for the move, including promotion, capture, and check status.
     """
     piece_type = piece.type
-    promotion = get_promotion() if is_promotion_needed(final_tile, color, piece_type) else None
+    promotion = get_promotion(final_tile, color, piece_type) if is_promotion_needed(final_tile, color, piece_type) else None
     capture = is_capture(board, final_tile, color, piece_type)
-    check = is_check_needed(board, initial_tile, final_tile, piece, color)
+    check = is_check_needed(board, initial_tile, final_tile, piece, color, promotion)
     
     return {
         "promotion": promotion,
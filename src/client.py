@@ -1,5 +1,6 @@
 import socket
 import time
+from src.protocol import Session, MOVE, MESSAGE_NAMES, receive_messages
 
 # Configuration
 HOST = '127.0.0.1'  # Server's IP address
@@ -10,24 +11,22 @@ client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 client_socket.connect((HOST, PORT))
 print("Connected to server.")
 
-def send_move(move, retries=3, timeout=1):
-    for attempt in range(retries):
-        try:
-            client_socket.sendall(move.encode())
-            client_socket.settimeout(timeout)
-            ack = client_socket.recv(1024).decode()
-            if ack == 'ACK':
-                print("Move confirmed by opponent.")
-                return True
-        except socket.timeout:
-            print(f"Timeout, retrying ({attempt + 1}/{retries})...")
-    print("Move not confirmed. Connection issue.")
-    return False
+session = Session()
+inbox = []  # Moves received but not read yet: several can arrive in one segment
+
+def send_move(move):
+    # Pipelined: the acknowledgement is processed whenever data is next read
+    client_socket.sendall(session.move(move))
+    return True
 
 def receive_move():
-    move = client_socket.recv(1024).decode()
-    client_socket.sendall("ACK".encode())  # Send confirmation
-    return move
+    while not inbox:
+        for message in receive_messages(client_socket, session):
+            if message.kind == MOVE:
+                inbox.append(message.payload)
+            else:
+                print(f"Received {MESSAGE_NAMES[message.kind]} {message.payload}".rstrip())
+    return inbox.pop(0)
 
 try:
     while True:
@@ -0,0 +1,101 @@
+"""
+16-bit move codecs.
+
+A move is stored as Move.encode() packs it: from square (bits 0-5), to square (bits 6-11) and a 4-bit flag
+(quiet, double push, castle, capture, en passant, promotion piece). Converting from SAN needs the position
+the move is played in, since 'Nbd7' only names a piece by its type and file; converting from UCI needs it
+just to fill in the flag. Going back to UCI only needs the code itself.
+"""
+from array import array
+
+from src.legality import LegalMoveSet, IllegalMoveError
+from src.movegen import (Move, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EN_PASSANT, PROMOTION,
+                         PROMOTION_SYMBOLS, PROMOTION_TYPES)
+from src.notation import move_to_san
+from src.squares import SQUARE_INDEX
+
+PROMOTION_FLAGS = {symbol: PROMOTION | PROMOTION_TYPES.index(piece_type)
+                   for piece_type, symbol in PROMOTION_SYMBOLS.items()}
+
+
+def move_from_uci(board, uci):
+    """
+    Builds the Move a UCI string (e.g. 'e2e4', 'e7e8q') stands for, reading the flag off the board.
+    The move is not checked for legality; use LegalMoveSet for that.
+    :raises ValueError: If the string is not UCI or there is no piece on the from square.
+    """
+    try:
+        source = SQUARE_INDEX[(uci[0], int(uci[1]))]
+        target = SQUARE_INDEX[(uci[2], int(uci[3]))]
+    except (IndexError, KeyError, ValueError):
+        raise ValueError(f"Invalid UCI move: {uci!r}") from None
+    piece = board.piece_at(source)
+    if piece is None:
+        raise ValueError(f"{uci}: no piece on {uci[:2]}")
+
+    flag = CAPTURE if board.piece_at(target) is not None else 0
+    if piece.type == "pawn":
+        if len(uci) == 5:
+            if uci[4] not in PROMOTION_FLAGS:
+                raise ValueError(f"Invalid promotion piece in {uci!r}")
+            flag |= PROMOTION_FLAGS[uci[4]]
+        elif abs(target - source) == 16:
+            flag = DOUBLE_PUSH
+        elif not flag and (target - source) % 8:
+            flag = EN_PASSANT  # A diagonal step onto an empty square
+    elif piece.type == "king" and abs(target - source) == 2:
+        flag = KING_CASTLE if target > source else QUEEN_CASTLE
+    return Move(source, target, flag)
+
+
+def encode_uci(board, uci):
+    return move_from_uci(board, uci).encode()
+
+
+def decode_uci(code):
+    return Move.decode(code).uci()
+
+
+def encode_san(board, san):
+    """
+    :raises IllegalMoveError: If the move is not legal in the position.
+    """
+    return LegalMoveSet(board).lookup(san).encode()
+
+
+def decode_san(board, code):
+    """
+    :return: The SAN of an encoded move, with '+' or '#' when it gives check or mate. The board is left unchanged.
+    """
+    return move_to_san(board, Move.decode(code))
+
+
+def encode_game(moves, board):
+    """
+    Plays a game's SAN (or UCI) moves on a board and encodes them.
+    :return: array('H') of move codes.
+    :raises IllegalMoveError: At the first move that is not legal.
+    """
+    codes = array("H")
+    for notation in moves:
+        move = LegalMoveSet(board).lookup(notation)
+        board.make_move(move)
+        codes.append(move.encode())
+    return codes
+
+
+def decode_game(codes, board):
+    """
+    Replays encoded moves on a board.
+    :return: The moves in SAN, without check marks.
+    :raises IllegalMoveError: At the first move that is not legal.
+    """
+    moves = []
+    for code in codes:
+        move = Move.decode(code)
+        san = LegalMoveSet(board).san.get(move)
+        if san is None:
+            raise IllegalMoveError(move.uci())
+        moves.append(san)
+        board.make_move(move)
+    return moves
@@ -1,5 +1,4 @@
-import pygame
-
+import os
 
 board_size = 8
 tile_size = 128
@@ -10,13 +9,27 @@ theme = 'gray'
 letters = [chr(i) for i in range(97, 97 + board_size)]
 numbers = [i for i in range(1, board_size+1)]
 
-path_of_piece = r"Visuals\{color}_{piece}_png_shadow_{size}px.png"
+visuals_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Visuals")
+
+path_of_piece = os.path.join(visuals_dir, "{color}_{piece}_png_shadow_{size}px.png")
 piece_size = '128'
 
-path_of_bg = r"Visuals\square_{theme}_{color}_png_shadow_128px.png"
+path_of_bg = os.path.join(visuals_dir, "square_{theme}_{color}_png_shadow_128px.png")
+
+_font = None
+
 
-pygame.font.init()
-font = pygame.font.SysFont(None, 36)
+def get_font():
+    """
+    Returns the font of the board labels. pygame is imported and its font module initialised on first use,
+    so the rules code can be imported without pygame.
+    """
+    global _font
+    if _font is None:
+        import pygame
+        pygame.font.init()
+        _font = pygame.font.SysFont(None, 36)
+    return _font
 
 pieces = {
     'q': 'queen',
@@ -0,0 +1,9 @@
+from src.engine.search import Search, SearchResult, MATE_SCORE
+from src.engine.player import EnginePlayer
+from src.engine.evaluation import evaluate
+from src.engine.transposition import TranspositionTable
+from src.engine.parallel import ParallelSearch
+from src.engine.book import OpeningBook, BookMove
+
+__all__ = ['Search', 'SearchResult', 'MATE_SCORE', 'EnginePlayer', 'evaluate', 'TranspositionTable', 'ParallelSearch',
+           'OpeningBook', 'BookMove']
@@ -0,0 +1,307 @@
+"""
+Opening book.
+
+A book maps the Zobrist key of a position to the moves played from it in a set of games, with how often each
+was played and how those games ended. The key only includes the en passant file when a capture is possible, so
+the statistics of transposed move orders are counted together. Building one replays the first `max_ply` plies
+of every game and drops moves seen fewer than `min_count` times. The file is an open-addressing hash table over
+the position keys plus the move columns, all little-endian:
+
+    preamble   magic, version, slot count (a power of two), move count, max ply, min count
+    slots      uint64[slots] key, uint32[slots] first move, uint16[slots] number of moves (0 = empty slot)
+    moves      uint16 code, then uint32 count, white wins, draws and black wins, one column each
+
+Probing memory-maps the file and looks the key up in the slot table (linear probing from key & mask), so a hit
+costs a handful of array reads whatever the size of the book.
+
+Usage:
+    python -m src.engine.book games.pgn book.bin --max-ply 20 --min-count 3
+    python -m src.engine.book games.chdb book.bin          # from a game database (see src.gamedb)
+"""
+import argparse
+import mmap
+import random
+import struct
+import sys
+import time
+from array import array
+
+from src.bitboard import BitboardBoard
+from src.gamedb import GameDatabase
+from src.legality import LegalMoveSet, IllegalMoveError
+from src.movegen import Move
+from src.notation import move_to_san
+from src.pgn import iter_game_spans, parse_game
+
+MAGIC = b"CHOB"
+VERSION = 2  # 2: en passant file hashed only when a capture is possible; version 1 books must be rebuilt
+PREAMBLE = struct.Struct("<4sHHQQII")  # Magic, version, reserved, slots, moves, max ply, min count
+RESULT_COLUMNS = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+
+def _padding(offset):
+    return -offset % 8
+
+
+class BookMove:
+    """
+    One book move with the statistics of the games it was played in.
+    """
+    __slots__ = ("move", "count", "white", "draws", "black")
+
+    def __init__(self, move, count, white, draws, black) -> None:
+        self.move = move
+        self.count = count
+        self.white = white  # Games won by white
+        self.draws = draws
+        self.black = black  # Games won by black
+
+    def score(self, color):
+        """
+        Share of the points the given side scored after this move (unfinished games count as nothing).
+        """
+        wins = self.white if color == "w" else self.black
+        return (wins + self.draws / 2) / self.count
+
+    def __repr__(self):
+        return f"BookMove({self.move.uci()}, {self.count}, +{self.white} ={self.draws} -{self.black})"
+
+
+def iter_pgn_games(path):
+    """
+    Yields (start board, list of SAN moves, result) for every game of a PGN file.
+    """
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        for start, end in iter_game_spans(buffer):
+            headers, moves, result = parse_game(buffer[start:end].decode("utf-8", "replace"))
+            try:
+                board = BitboardBoard.from_fen(headers["FEN"]) if "FEN" in headers else BitboardBoard()
+            except ValueError:
+                continue
+            yield board, moves, result or headers.get("Result")
+
+
+def iter_database_games(path):
+    """
+    Yields (start board, list of move codes, result) for every game of a game database.
+    """
+    with GameDatabase(path) as database:
+        for index in range(len(database)):
+            yield database.start_board(index), database.codes(index).tolist(), database.result(index)
+
+
+def collect(games, max_ply=20):
+    """
+    Counts the moves played in the first `max_ply` plies of games.
+    :param games: Iterable of (start board, moves as SAN strings or move codes, result).
+    :return: (dict of position key -> dict of move code -> [count, white wins, draws, black wins], games read)
+    """
+    positions = {}
+    count = 0
+    for board, moves, result in games:
+        count += 1
+        column = RESULT_COLUMNS.get(result)
+        for ply, move in enumerate(moves):
+            if ply >= max_ply:
+                break
+            if isinstance(move, str):
+                try:
+                    move = LegalMoveSet(board).lookup(move)
+                except IllegalMoveError:
+                    break  # Keep the part of the game that replayed
+            else:
+                move = Move.decode(move)
+            stats = positions.setdefault(board.zobrist, {}).setdefault(move.encode(), [0, 0, 0, 0])
+            stats[0] += 1
+            if column is not None:
+                stats[column + 1] += 1
+            board.make_move(move)
+    return positions, count
+
+
+def write_book(path, positions, max_ply, min_count=1):
+    """
+    Writes counted positions as a book file, leaving out moves played fewer than `min_count` times.
+    :return: (positions written, moves written)
+    """
+    kept = {}
+    for key, moves in positions.items():
+        moves = sorted(((code, stats) for code, stats in moves.items() if stats[0] >= min_count),
+                       key=lambda item: -item[1][0])
+        if moves:
+            kept[key] = moves
+
+    slots = 1
+    while slots < 2 * len(kept):
+        slots *= 2  # At most half full, so probes stay short
+    mask = slots - 1
+    keys = array("Q", bytes(8 * slots))
+    firsts = array("I", bytes(4 * slots))
+    sizes = array("H", bytes(2 * slots))
+    codes, counts, white, draws, black = array("H"), array("I"), array("I"), array("I"), array("I")
+    for key, moves in kept.items():
+        slot = key & mask
+        while sizes[slot]:
+            slot = (slot + 1) & mask
+        keys[slot] = key
+        firsts[slot] = len(codes)
+        sizes[slot] = len(moves)
+        for code, stats in moves:
+            codes.append(code)
+            for column, value in zip((counts, white, draws, black), stats):
+                column.append(value)
+
+    with open(path, "wb") as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, 0, slots, len(codes), max_ply, min_count))
+        for column in (keys, firsts, sizes, codes, counts, white, draws, black):
+            file.write(column.tobytes())
+            file.write(bytes(_padding(file.tell())))
+    return len(kept), len(codes)
+
+
+def build_book(source, path, max_ply=20, min_count=1):
+    """
+    Builds a book from a PGN file (by extension) or a game database.
+    :return: (games read, positions written, moves written)
+    """
+    games = iter_pgn_games(source) if source.lower().endswith(".pgn") else iter_database_games(source)
+    positions, count = collect(games, max_ply)
+    return (count,) + write_book(path, positions, max_ply, min_count)
+
+
+class OpeningBook:
+    """
+    Read-only, memory-mapped book.
+    """
+    def __init__(self, path) -> None:
+        if sys.byteorder != "little":
+            raise RuntimeError("Opening books can only be used on little-endian machines")
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, _, slots, moves, self.max_ply, self.min_count = PREAMBLE.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self._view = view
+        self._mask = slots - 1
+        self._columns = []
+        offset = PREAMBLE.size
+        for typecode, size, length in (("Q", 8, slots), ("I", 4, slots), ("H", 2, slots), ("H", 2, moves),
+                                       ("I", 4, moves), ("I", 4, moves), ("I", 4, moves), ("I", 4, moves)):
+            self._columns.append(view[offset:offset + size * length].cast(typecode))
+            offset += size * length
+            offset += _padding(offset)
+        (self._keys, self._firsts, self._sizes, self._codes,
+         self._counts, self._white, self._draws, self._black) = self._columns
+
+    def __len__(self):
+        """
+        Number of positions in the book.
+        """
+        return sum(1 for size in self._sizes if size)
+
+    def _find(self, key):
+        slot = key & self._mask
+        while self._sizes[slot]:
+            if self._keys[slot] == key:
+                return self._firsts[slot], self._sizes[slot]
+            slot = (slot + 1) & self._mask
+        return 0, 0
+
+    def probe(self, board):
+        """
+        :return: The book moves of the position, most played first (empty if it is not in the book).
+        """
+        first, size = self._find(board.zobrist)
+        return [BookMove(Move.decode(self._codes[index]), self._counts[index], self._white[index],
+                         self._draws[index], self._black[index]) for index in range(first, first + size)]
+
+    def choose(self, board, rng=random, min_count=1):
+        """
+        Picks a book move at random, weighted by how often it was played.
+        :return: A Move, or None if the position is not in the book.
+        """
+        first, size = self._find(board.zobrist)
+        # A 64-bit key collision is unlikely but cheap to rule out: only moves legal in this position are played
+        legal = set(board.generate_legal())
+        candidates = [index for index in range(first, first + size)
+                      if self._counts[index] >= min_count and Move.decode(self._codes[index]) in legal]
+        if not candidates:
+            return None
+        index = rng.choices(candidates, weights=[self._counts[index] for index in candidates])[0]
+        return Move.decode(self._codes[index])
+
+    def hints(self, board, limit=5):
+        """
+        Describes the most played book moves of a position, e.g. ['e4 (1203 games, 54%)', ...].
+        """
+        color = board.turn
+        legal = set(board.generate_legal())
+        book_moves = [book_move for book_move in self.probe(board) if book_move.move in legal]
+        return [f"{move_to_san(board, book_move.move)} ({book_move.count} games, {book_move.score(color):.0%})"
+                for book_move in book_moves[:limit]]
+
+    def close(self):
+        for column in self._columns:
+            column.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def benchmark(book, probes=10000, report=print):
+    """
+    Times probing positions along random book lines, and a miss.
+    """
+    rng = random.Random(0)
+    boards = []
+    board = BitboardBoard()
+    while len(boards) < 100:
+        move = book.choose(board, rng)
+        if move is None:
+            board = BitboardBoard()
+            continue
+        boards.append(board)
+        board = BitboardBoard.from_fen(board.to_fen())
+        board.make_move(move)
+    keys = [board.zobrist for board in boards]
+
+    start = time.perf_counter()
+    for index in range(probes):
+        book._find(keys[index % len(keys)])
+    hit_time = (time.perf_counter() - start) / probes
+    start = time.perf_counter()
+    for index in range(probes):
+        book.probe(boards[index % len(boards)])
+    probe_time = (time.perf_counter() - start) / probes
+    report(f"{len(book)} positions: key lookup {hit_time * 1e6:.2f} us, probe with move list {probe_time * 1e6:.2f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN or a game database.")
+    parser.add_argument("source", help="PGN file (.pgn) or game database.")
+    parser.add_argument("book", help="Book file to write.")
+    parser.add_argument("--max-ply", type=int, default=20, help="Plies of each game to include.")
+    parser.add_argument("--min-count", type=int, default=1, help="Leave out moves played fewer times.")
+    parser.add_argument("--benchmark", action="store_true", help="Time book probes.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    games, positions, moves = build_book(args.source, args.book, args.max_ply, args.min_count)
+    print(f"{games} games: {positions} positions, {moves} moves in {time.perf_counter() - start:.2f}s")
+    if args.benchmark:
+        with OpeningBook(args.book) as book:
+            benchmark(book)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
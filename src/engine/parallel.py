@@ -0,0 +1,167 @@
+"""
+Root-splitting parallel search.
+
+The legal root moves are dealt out to a pool of worker processes; each worker runs the normal
+iterative-deepening Search over its share with its own transposition table, and the results are
+merged at the deepest iteration every worker completed. Processes sidestep the GIL, which threads
+cannot for this pure-Python, CPU-bound search.
+
+Scaling benchmark:
+    python -m src.engine.parallel --workers 1 2 4 8 16 --depth 3
+"""
+import argparse
+import multiprocessing
+import time
+
+from src.bitboard import BitboardBoard
+from src.engine.search import Search, SearchResult, MATE_SCORE, MAX_PLY
+from src.movegen import Move
+
+TIME_MARGIN = 0.1  # Seconds of the budget kept back for dealing the moves out and merging the results
+
+# Positions used by the scaling benchmark: opening, middlegame and a tactical middlegame
+BENCHMARK_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+
+def _search_worker(board, move_codes, history, time_limit, max_depth, hash_mb):
+    """
+    Runs in a pool process: searches a share of the root moves.
+    :return: (completed iterations as (depth, score, move code) tuples, nodes searched)
+    """
+    search = Search(time_limit=time_limit, max_depth=max_depth, hash_mb=hash_mb)
+    legal = {move.encode(): move for move in board.generate_legal()}
+    search.search(board, history, root_moves=[legal[code] for code in move_codes])
+    iterations = [(result.depth, result.score, result.move.encode()) for result in search.iterations]
+    return iterations, search.nodes
+
+
+class ParallelSearch:
+    """
+    Drop-in replacement for Search that fans the root moves out over `workers` processes.
+    The pool is started on first use and kept for later moves; call close() when done.
+    """
+    def __init__(self, time_limit=1.0, max_depth=MAX_PLY, workers=None, hash_mb=16) -> None:
+        """
+        :param time_limit: Seconds available for one move.
+        :param max_depth: Deepest iteration to run if time allows.
+        :param workers: Number of processes (defaults to the number of CPUs).
+        :param hash_mb: Transposition table size of each worker.
+        """
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.workers = workers or multiprocessing.cpu_count()
+        self.hash_mb = hash_mb
+        self.nodes = 0
+        self._pool = None
+        self._ordering = Search(hash_mb=0)
+
+    def search(self, board, history=()):
+        """
+        Searches the side to move's best move, see Search.search.
+        """
+        start = time.perf_counter()
+        root_moves = board.generate_legal()
+        if len(root_moves) <= 1 or self.workers == 1:
+            search = Search(self.time_limit, self.max_depth, hash_mb=self.hash_mb)
+            result = search.search(board, history)
+            self.nodes = search.nodes
+            return result
+
+        # Deal the ordered moves round-robin so every worker gets a mix of strong and weak candidates
+        ordered = self._ordering._order_moves(board, root_moves, 0, None)
+        shares = [ordered[index::self.workers] for index in range(self.workers)]
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        # The workers get what is left of the budget minus a margin, so the whole move stays within time_limit
+        margin = min(TIME_MARGIN, self.time_limit / 4)
+        time_limit = max(self.time_limit - margin - (time.perf_counter() - start), 0.0)
+        tasks = [(board, [move.encode() for move in share], list(history), time_limit, self.max_depth,
+                  self.hash_mb) for share in shares if share]
+        outcomes = self._pool.starmap(_search_worker, tasks)
+
+        self.nodes = sum(nodes for _, nodes in outcomes)
+        result = self._merge([iterations for iterations, _ in outcomes], ordered[0])
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _merge(worker_iterations, fallback=None):
+        """
+        Picks the best move at the deepest iteration all workers completed. A worker that stopped early
+        because it proved a mate keeps its last result for the deeper iterations.
+        :param fallback: The first root move in move ordering. If a worker completed no iteration, its moves
+                         have no score to compare, so this move is played, as a sequential search would.
+        """
+        def finished_by_mate(iterations):
+            return iterations and abs(iterations[-1][1]) >= MATE_SCORE - MAX_PLY
+
+        if fallback is not None and not all(worker_iterations):
+            return SearchResult(fallback, 0, 0, 0, 0.0)
+
+        running = [iterations[-1][0] for iterations in worker_iterations
+                   if iterations and not finished_by_mate(iterations)]
+        completed = [iterations[-1][0] for iterations in worker_iterations if iterations]
+        depth = min(running) if running else max(completed, default=0)
+
+        best = None
+        for iterations in worker_iterations:
+            reached = [item for item in iterations if item[0] <= depth]
+            if not reached:
+                continue
+            _, score, code = reached[-1]
+            if best is None or score > best[0]:
+                best = (score, code)
+        if best is None:
+            return SearchResult(None, 0, 0, 0, 0.0)
+        return SearchResult(Move.decode(best[1]), best[0], depth, 0, 0.0)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def benchmark(worker_counts=(1, 2, 4, 8, 16), depth=3, fens=BENCHMARK_FENS, report=print):
+    """
+    Times fixed-depth searches of the benchmark positions for each worker count.
+    :return: A dict of worker count -> (seconds, nodes, speedup over the first worker count).
+    """
+    results = {}
+    baseline = None
+    for workers in worker_counts:
+        search = ParallelSearch(time_limit=float("inf"), max_depth=depth, workers=workers)
+        try:
+            # Warm the pool up so process start-up is not part of the measurement
+            search.search(BitboardBoard.from_fen(fens[0]))
+            elapsed = 0.0
+            nodes = 0
+            for fen in fens:
+                result = search.search(BitboardBoard.from_fen(fen))
+                elapsed += result.elapsed
+                nodes += result.nodes
+        finally:
+            search.close()
+        baseline = baseline or elapsed
+        results[workers] = (elapsed, nodes, baseline / elapsed)
+        report(f"workers {workers:>2}: {elapsed:8.2f}s  {nodes:>9} nodes  {nodes / elapsed:8.0f} nps  "
+               f"speedup {baseline / elapsed:5.2f}x")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure parallel search scaling.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--depth", type=int, default=3, help="Fixed search depth per position.")
+    args = parser.parse_args(argv)
+    benchmark(args.workers, args.depth)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
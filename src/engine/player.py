@@ -0,0 +1,69 @@
+from src.engine.search import Search
+from src.engine.parallel import ParallelSearch
+from src.notation import move_to_san
+
+
+class EnginePlayer:
+    """
+    Computer opponent for one side of a Game. It searches the current board and answers in algebraic
+    notation, so its moves go through evaluate_move and over the network exactly like a human's.
+    """
+    def __init__(self, color, time_limit=1.0, max_depth=64, verbose=True, hash_mb=16, workers=1, book=None,
+                 tablebase=None) -> None:
+        """
+        :param color: The side the engine plays ('w' or 'b').
+        :param time_limit: Seconds the engine may think per move.
+        :param max_depth: Deepest iteration to search.
+        :param verbose: Print depth, nodes and nodes/second after each move.
+        :param hash_mb: Transposition table size, allocated once for the whole game.
+        :param workers: Number of processes to split the search over (1 searches in this process).
+        :param book: Optional OpeningBook; while the position is in it, its moves are played without searching.
+        :param tablebase: Optional Tablebase; endgames it covers are played perfectly without searching.
+        """
+        self.color = color
+        if workers > 1:
+            self.search = ParallelSearch(time_limit=time_limit, max_depth=max_depth, workers=workers, hash_mb=hash_mb)
+        else:
+            self.search = Search(time_limit=time_limit, max_depth=max_depth, hash_mb=hash_mb)
+        self.verbose = verbose
+        self.book = book
+        self.tablebase = tablebase
+        self.last_result = None
+
+    def choose_move(self, board, history=()):
+        """
+        Picks a move for the side to move.
+        :param board: The current position. It is left unchanged.
+        :param history: Zobrist keys of earlier positions in the game, for repetition detection.
+        :return: The move in algebraic notation, or None if there is no legal move.
+        """
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                self.last_result = None
+                san = move_to_san(board, move)
+                if self.verbose:
+                    print(f"Engine: book move {san}")
+                return san
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(board)
+            if move is not None:
+                self.last_result = None
+                san = move_to_san(board, move)
+                if self.verbose:
+                    print(f"Engine: tablebase move {san} ({board.probe_tablebase(self.tablebase)})")
+                return san
+        result = self.search.search(board, history)
+        self.last_result = result
+        if self.verbose:
+            print(f"Engine: {result}")
+        if result.move is None:
+            return None
+        return move_to_san(board, result.move)
+
+    def close(self):
+        """
+        Stops the worker processes of a parallel search.
+        """
+        if isinstance(self.search, ParallelSearch):
+            self.search.close()
@@ -0,0 +1,277 @@
+import time
+
+from src.engine.evaluation import evaluate, PIECE_VALUES
+from src.engine.transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from src.squares import SQUARES, opponent
+
+MATE_SCORE = 100000
+INFINITY = 1000000
+MAX_PLY = 128
+
+# Ordering priorities: previous best move, captures by MVV-LVA, killer moves, then history
+BEST_MOVE_PRIORITY = 10_000_000
+CAPTURE_PRIORITY = 1_000_000
+KILLER_PRIORITY = 900_000
+
+# MVV-LVA ranks the victim first and the cheapest attacker second
+VICTIM_RANK = {"pawn": 1, "knight": 2, "bishop": 3, "rook": 4, "queen": 5, "king": 6}
+
+TIME_CHECK_INTERVAL = 128
+
+
+def _score_to_table(score, ply):
+    """
+    Mate scores are stored relative to the node rather than the root, so they stay valid
+    when the position is reached at a different ply.
+    """
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget for the move is spent.
+    """
+
+
+class SearchResult:
+    """
+    Outcome of a search: the best move found, its score and how much work it took.
+    """
+    def __init__(self, move, score, depth, nodes, elapsed) -> None:
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.hash_hit_rate = None
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        move = self.move.uci() if self.move else "none"
+        text = (f"depth {self.depth} score {self.score} move {move} "
+                f"nodes {self.nodes} time {self.elapsed:.2f}s nps {self.nps:.0f}")
+        if self.hash_hit_rate is not None:
+            text += f" hash hits {self.hash_hit_rate:.0%}"
+        return text
+
+
+class Search:
+    """
+    Negamax alpha-beta search with iterative deepening, quiescence search and
+    MVV-LVA / killer / history move ordering under a strict per-move time budget.
+    """
+    def __init__(self, time_limit=1.0, max_depth=MAX_PLY, report=None, hash_mb=16) -> None:
+        """
+        :param time_limit: Seconds available for one move.
+        :param max_depth: Deepest iteration to run if time allows.
+        :param report: Optional callable receiving a SearchResult after each completed iteration.
+        :param hash_mb: Size of the transposition table in megabytes, kept across searches.
+        """
+        self.table = TranspositionTable(hash_mb)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.report = report
+        self.nodes = 0
+        self.deadline = None
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {}
+        self._path = []
+        self.iterations = []  # SearchResult of every completed iteration of the last search
+
+    def search(self, board, history=(), root_moves=None):
+        """
+        Searches the side to move's best move. The board is restored before returning.
+        :param board: The position to search (Board or BitboardBoard).
+        :param history: Zobrist keys of earlier positions in the game, for repetition detection.
+        :param root_moves: Optional subset of the legal moves to consider at the root.
+        :return: SearchResult of the deepest completed iteration.
+        """
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {}
+        self._path = list(history)
+        self.table.new_search()
+        self.table.reset_stats()
+        self.iterations = []
+
+        if root_moves is None:
+            root_moves = board.generate_legal()
+        if not root_moves:
+            return SearchResult(None, -MATE_SCORE if self._in_check(board) else 0, 0, 0, 0.0)
+
+        entry = self.table.probe(board.zobrist)
+        hash_move = entry[3] if entry else None
+        best = SearchResult(self._order_moves(board, root_moves, 0, hash_move)[0], 0, 0, 0, 0.0)
+        stack_depth = len(board._undo_stack)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._search_root(board, root_moves, depth, best.move)
+            except SearchTimeout:
+                # Unwind the moves the interrupted iteration left on the board
+                while len(board._undo_stack) > stack_depth:
+                    board.unmake_move()
+                break
+            best = SearchResult(move, score, depth, self.nodes, time.perf_counter() - start)
+            self.iterations.append(best)
+            if self.report:
+                self.report(best)
+            if abs(score) >= MATE_SCORE - MAX_PLY:
+                break  # A forced mate was found; deeper iterations cannot improve it
+
+        best.nodes = self.nodes
+        best.elapsed = time.perf_counter() - start
+        best.hash_hit_rate = self.table.hit_rate
+        return best
+
+    def _search_root(self, board, moves, depth, previous_best):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        self._path.append(board.zobrist)
+        try:
+            for move in self._order_moves(board, moves, 0, previous_best):
+                board.make_move(move)
+                score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+                board.unmake_move()
+                if score > alpha or best_move is None:
+                    alpha, best_move = score, move
+        finally:
+            self._path.pop()
+        self.table.store(board.zobrist, depth, EXACT, alpha, best_move)
+        return alpha, best_move
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self._count_node()
+
+        key = board.zobrist
+        if board.halfmove_clock >= 100 or key in self._path:
+            return 0  # Fifty-move rule or repetition
+
+        if depth <= 0:
+            return self._quiescence(board, alpha, beta, ply)
+
+        # A stored result that searched at least as deep can answer the node or tighten the window
+        entry = self.table.probe(key)
+        hash_move = None
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            if entry_depth >= depth:
+                score = _score_from_table(score, ply)
+                if bound == EXACT:
+                    return score
+                if bound == LOWER_BOUND and score >= beta:
+                    return score
+                if bound == UPPER_BOUND and score <= alpha:
+                    return score
+
+        moves = board.generate_legal()
+        if not moves:
+            return -MATE_SCORE + ply if self._in_check(board) else 0
+
+        original_alpha = alpha
+        best_move = None
+        self._path.append(key)
+        try:
+            for move in self._order_moves(board, moves, ply, hash_move):
+                board.make_move(move)
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                board.unmake_move()
+                if score >= beta:
+                    if not move.is_capture:
+                        self._store_killer(move, ply)
+                        history_key = (board.turn, move.from_index, move.to_index)
+                        self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+                    self.table.store(key, depth, LOWER_BOUND, _score_to_table(beta, ply), move)
+                    return beta
+                if score > alpha:
+                    alpha = score
+                    best_move = move
+        finally:
+            self._path.pop()
+
+        bound = EXACT if alpha > original_alpha else UPPER_BOUND
+        self.table.store(key, depth, bound, _score_to_table(alpha, ply), best_move)
+        return alpha
+
+    def _quiescence(self, board, alpha, beta, ply):
+        """
+        Resolves captures and promotions until the position is quiet, so the static evaluation
+        is not taken in the middle of an exchange.
+        """
+        moves = board.generate_legal()
+        if not moves:
+            return -MATE_SCORE + ply if self._in_check(board) else 0
+
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return beta
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        tactical = [move for move in moves if move.is_capture or move.promotion]
+        for move in self._order_moves(board, tactical, ply, None):
+            self._count_node()
+            board.make_move(move)
+            score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order_moves(self, board, moves, ply, best_move):
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        turn = board.turn
+
+        def priority(move):
+            if move == best_move:
+                return BEST_MOVE_PRIORITY
+            if move.is_capture or move.promotion:
+                attacker = board.piece_at(move.from_index)
+                victim = board.piece_at(move.to_index)
+                victim_rank = VICTIM_RANK[victim.type] if victim is not None else VICTIM_RANK["pawn"]
+                promotion_bonus = PIECE_VALUES[move.promotion] if move.promotion else 0
+                return CAPTURE_PRIORITY + victim_rank * 10 - VICTIM_RANK[attacker.type] + promotion_bonus
+            if move == killers[0]:
+                return KILLER_PRIORITY
+            if move == killers[1]:
+                return KILLER_PRIORITY - 1
+            return self.history.get((turn, move.from_index, move.to_index), 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _store_killer(self, move, ply):
+        if ply >= MAX_PLY:
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    @staticmethod
+    def _in_check(board):
+        color = board.turn
+        king = board.masks()[0][(color, "king")]
+        return bool(king) and board.attackers_of(SQUARES[king.bit_length() - 1], opponent(color)) != 0
@@ -0,0 +1,103 @@
+from array import array
+
+from src.movegen import Move
+
+# Bound types stored with each score
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high: the true score is at least this
+UPPER_BOUND = 2  # The search failed low: the true score is at most this
+
+ENTRY_BYTES = 16  # One 64-bit key plus one 64-bit packed record
+BUCKET_SIZE = 2  # Slot 0 keeps the deepest result, slot 1 always takes the newest
+SCORE_OFFSET = 1 << 31
+MAX_AGE = 63
+
+
+def _pack(move_code, depth, bound, age, score):
+    return move_code | depth << 16 | bound << 24 | age << 26 | (score + SCORE_OFFSET) << 32
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by Zobrist key.
+
+    Entries live in two preallocated array('Q') columns (keys and packed records), so the memory
+    footprint is set once from the configured size and never grows. Each bucket has a depth-preferred
+    slot and an always-replace slot.
+    """
+    def __init__(self, size_mb=16) -> None:
+        """
+        :param size_mb: Memory budget in megabytes.
+        """
+        buckets = max(1, size_mb * 1024 * 1024 // (ENTRY_BYTES * BUCKET_SIZE))
+        self.bucket_count = buckets
+        self.keys = array('Q', bytes(8 * buckets * BUCKET_SIZE))
+        self.records = array('Q', bytes(8 * buckets * BUCKET_SIZE))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    @property
+    def size_bytes(self):
+        return (len(self.keys) + len(self.records)) * 8
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def new_search(self):
+        """
+        Ages the table so entries from earlier searches lose priority when slots are contended.
+        """
+        self.age = (self.age + 1) & MAX_AGE
+
+    def clear(self):
+        for index in range(len(self.keys)):
+            self.keys[index] = 0
+            self.records[index] = 0
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = self.hits = self.stores = self.replacements = 0
+
+    def probe(self, key):
+        """
+        Looks up a position.
+        :return: (depth, bound, score, best move or None), or None on a miss.
+        """
+        self.probes += 1
+        slot = key % self.bucket_count * BUCKET_SIZE
+        for index in (slot, slot + 1):
+            if self.keys[index] == key:
+                record = self.records[index]
+                self.hits += 1
+                move_code = record & 0xFFFF
+                return (record >> 16 & 0xFF, record >> 24 & 3, (record >> 32) - SCORE_OFFSET,
+                        Move.decode(move_code) if move_code else None)
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Saves a search result, keeping the deepest result of the bucket in the first slot.
+        """
+        self.stores += 1
+        slot = key % self.bucket_count * BUCKET_SIZE
+        record = _pack(move.encode() if move is not None else 0, min(depth, 255), bound, self.age, score)
+
+        keys, records = self.keys, self.records
+        deep_record = records[slot]
+        deep_depth = deep_record >> 16 & 0xFF
+        deep_age = deep_record >> 26 & MAX_AGE
+        if keys[slot] == key or depth >= deep_depth or deep_age != self.age:
+            if keys[slot] != key and keys[slot]:
+                # Demote the previous deep entry instead of dropping it
+                keys[slot + 1], records[slot + 1] = keys[slot], deep_record
+                self.replacements += 1
+            keys[slot], records[slot] = key, record
+        else:
+            if keys[slot + 1]:
+                self.replacements += 1
+            keys[slot + 1], records[slot + 1] = key, record
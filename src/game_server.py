@@ -0,0 +1,395 @@
+"""
+Multi-game server.
+
+One asyncio process accepts any number of clients. A client sends JOIN to play and is paired with the next
+one in arrival order, or SUBSCRIBE with a game id to watch that game. Every match
+keeps its authoritative board in memory together with the position's legal-move set, built once per ply: a
+move (SAN or UCI) is looked up in that set before it is relayed to the opponent in canonical SAN, and an
+illegal or out-of-turn move is answered with an ERROR message instead. Clients speak the
+framed protocol of src.protocol; a match starts with a START message telling each side its color.
+
+Spectators get a SNAPSHOT (FEN and moves so far) when they subscribe, then a DELTA per move and a RESULT at
+the end. Those frames are unnumbered, so each is encoded once per match and the same bytes are written to
+every subscriber; a subscriber that falls too far behind is disconnected rather than slowing the others.
+
+With --journal-dir, every match also appends its moves to <dir>/<game id>.journal (see src.journal), and game
+ids continue after the highest one in the directory. Started again with --resume, the server rebuilds every
+unfinished journaled match; its players take their seats back by sending JOIN with "<game id> <color>" and get
+START and a SNAPSHOT of the position. Journals are fsync'ed from a timer in the server loop.
+
+Usage:
+    python -m src.game_server --host 0.0.0.0 --port 12345
+    python -m src.game_server --journal-dir games --resume
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from src.bitboard import BitboardBoard
+from src.journal import Journal, recover
+from src.legality import Position, IllegalMoveError
+from src.protocol import (Session, ProtocolError, encode_frame, parse_clock, MOVE, RESIGN, DRAW_OFFER, DRAW_ACCEPT,
+                          CLOCK, START, ERROR, JOIN, SUBSCRIBE, SNAPSHOT, DELTA, RESULT)
+from src.squares import SQUARES, opponent
+
+RELAYED = (RESIGN, DRAW_OFFER, DRAW_ACCEPT, CLOCK)
+MAX_SPECTATOR_BUFFER = 256 * 1024  # Bytes a spectator may have pending before it is dropped
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_SYNC_INTERVAL = 0.05  # Seconds between fsyncs of the journals with pending moves
+
+
+class Player:
+    def __init__(self, writer) -> None:
+        self.writer = writer
+        self.session = Session()
+        self.match = None
+        self.color = None
+        self.watching = None  # Match this connection spectates
+
+    def send(self, kind, payload=""):
+        # Buffered write; the connection handler drains after each batch it processes
+        try:
+            frame = self.session.message(kind, payload)
+        except ProtocolError:
+            # The peer stopped acknowledging: closing ends its handler, which disconnects it
+            self.writer.close()
+            return
+        self.writer.write(frame)
+
+
+class Match:
+    def __init__(self, game_id, white, black, board_class=BitboardBoard, journal=None, recovered=None) -> None:
+        """
+        :param white: The white Player, or None for a seat left free until its player rejoins.
+        :param recovered: Optional journal.RecoveredGame (with its moves) to continue instead of a new game.
+        """
+        self.game_id = game_id
+        self.board = recovered.board if recovered is not None else board_class()
+        self.position = Position(self.board)
+        self.journal = journal
+        if journal is not None:
+            journal.start(self.board)
+        self.players = {"w": None, "b": None}
+        self.moves = list(recovered.moves) if recovered is not None else []
+        self.finished = False
+        self.clock = None  # Last clock payload a player sent, forwarded with the deltas
+        self.spectators = set()  # Writers of the subscribed spectators
+        for color, player in (("w", white), ("b", black)):
+            if player is not None:
+                self.seat(player, color)
+
+    def seat(self, player, color):
+        self.players[color] = player
+        player.match = self
+        player.color = color
+
+    def start(self):
+        for color, player in self.players.items():
+            if player is not None:
+                player.send(START, f"{color} {self.game_id}")
+
+    def send(self, color, kind, payload=""):
+        """
+        Sends a message to one side, unless its seat is free.
+        """
+        player = self.players[color]
+        if player is not None:
+            player.send(kind, payload)
+
+    def play(self, player, notation):
+        """
+        Validates a move against the match's position and relays it to the opponent.
+        :return: The move in canonical SAN.
+        :raises IllegalMoveError: If the game is over, it is not the player's turn or the move is illegal.
+        """
+        if self.finished:
+            raise IllegalMoveError(notation, "The game is over")
+        if self.board.turn != player.color:
+            raise IllegalMoveError(notation, "Not your turn")
+        move = self.position.legal.lookup(notation) if self.journal else None
+        san = self.position.play(notation)
+        if self.journal:
+            self.journal.record(move, self.board, parse_clock(self.clock) if self.clock else None)
+        self.moves.append(san)
+        self.send(opponent(player.color), MOVE, san)
+        if self.spectators:
+            delta = f"{len(self.moves)} {san}" + (f" {self.clock}" if self.clock else "")
+            self.broadcast(encode_frame(DELTA, 0, delta))
+        return san
+
+    def final_result(self):
+        """
+        The result once the side to move has no legal move: mate if it is in check, otherwise stalemate.
+        """
+        color = self.board.turn
+        king = self.board.masks()[0][(color, "king")]
+        if king and self.board.attackers_of(SQUARES[king.bit_length() - 1], opponent(color)):
+            return "0-1" if color == "w" else "1-0"
+        return "1/2-1/2"
+
+    def snapshot(self):
+        return encode_frame(SNAPSHOT, 0, f"{self.board.to_fen()}\n{' '.join(self.moves)}")
+
+    def broadcast(self, frame):
+        """
+        Writes one encoded frame to every spectator.
+        """
+        for writer in list(self.spectators):
+            if writer.transport.get_write_buffer_size() > MAX_SPECTATOR_BUFFER:
+                self.spectators.discard(writer)  # Too slow to keep up; it can subscribe again
+                writer.close()
+            else:
+                writer.write(frame)
+
+
+class GameServer:
+    def __init__(self, host='0.0.0.0', port=12345, board_class=BitboardBoard, journal_dir=None) -> None:
+        self.host = host
+        self.port = port
+        self.board_class = board_class
+        self.journal_dir = journal_dir
+        self.waiting = None  # Player waiting for an opponent
+        self.matches = {}  # Game id -> running Match
+        self.games_started = 0
+        self.moves_relayed = 0
+        self.rejected = 0
+        self._server = None
+        self._sync_task = None
+        self.closing = False  # Set by close(): running matches stay unfinished so --resume can continue them
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+            # Continue the numbering so a restarted server never appends to an older game's journal
+            self.games_started = max((game_id + 1 for game_id in self._journal_ids()), default=0)
+
+    def _journal_ids(self):
+        for name in os.listdir(self.journal_dir):
+            stem = name[:-len(JOURNAL_SUFFIX)]
+            if name.endswith(JOURNAL_SUFFIX) and stem.isdigit():
+                yield int(stem)
+
+    def _journal_path(self, game_id):
+        return os.path.join(self.journal_dir, f"{game_id}{JOURNAL_SUFFIX}")
+
+    def resume(self):
+        """
+        Rebuilds the unfinished matches journaled in journal_dir, with both seats free until their players
+        rejoin (JOIN "<game id> <color>").
+        :return: Number of matches resumed.
+        """
+        resumed = 0
+        for game_id in sorted(self._journal_ids()):
+            path = self._journal_path(game_id)
+            recovered = recover(path, self.board_class, with_moves=True)
+            if recovered is None or recovered.result is not None or game_id in self.matches:
+                continue
+            journal = Journal(path, sync_interval=JOURNAL_SYNC_INTERVAL)
+            match = self.matches[game_id] = Match(game_id, None, None, self.board_class, journal, recovered)
+            if not len(match.position.legal):
+                self._end(match, match.final_result())  # The last move ended it before the result was recorded
+                continue
+            resumed += 1
+        return resumed
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]  # The real port when 0 was asked for
+        if self.journal_dir:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_journals())
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self.closing = True
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for match in self.matches.values():
+            if match.journal is not None:
+                match.journal.close()
+
+    async def _sync_journals(self):
+        """
+        Syncs the journals with moves waiting, so the last moves of a burst do not wait for the next move.
+        """
+        while True:
+            await asyncio.sleep(JOURNAL_SYNC_INTERVAL)
+            for match in list(self.matches.values()):
+                if match.journal is not None:
+                    match.journal.sync_if_due()
+
+    def _pair(self, player):
+        if self.waiting is None:
+            self.waiting = player
+            return
+        journal = None
+        if self.journal_dir:
+            journal = Journal(self._journal_path(self.games_started), sync_interval=JOURNAL_SYNC_INTERVAL)
+        match = Match(self.games_started, self.waiting, player, self.board_class, journal)
+        self.games_started += 1
+        self.waiting = None
+        self.matches[match.game_id] = match
+        match.start()
+
+    def _rejoin(self, player, payload):
+        """
+        Seats a player in a resumed match: payload "<game id> <color>".
+        """
+        fields = payload.split()
+        match = self.matches.get(int(fields[0])) if len(fields) == 2 and fields[0].isdigit() else None
+        color = fields[1] if len(fields) == 2 else None
+        if match is None or color not in match.players:
+            player.send(ERROR, f"No running game {payload}")
+            return
+        if match.players[color] is not None:
+            player.send(ERROR, f"The {color} seat of game {match.game_id} is taken")
+            return
+        match.seat(player, color)
+        player.send(START, f"{color} {match.game_id}")
+        player.writer.write(match.snapshot())
+
+    def _end(self, match, result):
+        match.finished = True
+        if match.journal is not None:
+            match.journal.finish(result)
+            match.journal.close()
+        match.broadcast(encode_frame(RESULT, 0, result))
+        self.matches.pop(match.game_id, None)
+
+    def _subscribe(self, player, payload):
+        match = self.matches.get(int(payload)) if payload.strip().isdigit() else None
+        if match is None:
+            player.send(ERROR, f"No running game {payload}")
+            return
+        if player.watching is not None:
+            player.watching.spectators.discard(player.writer)
+        player.watching = match
+        player.writer.write(match.snapshot())
+        match.spectators.add(player.writer)
+
+    def _dispatch(self, player, message):
+        if message.kind == SUBSCRIBE:
+            self._subscribe(player, message.payload)
+            return
+        match = player.match
+        if message.kind == JOIN:
+            # A player whose game is over may join another one; it replaces the finished match once seated
+            if match is not None and not match.finished:
+                player.send(ERROR, f"Already playing game {match.game_id}")
+            elif self.waiting is player:
+                player.send(ERROR, "Already waiting for an opponent")
+            elif message.payload.strip():
+                self._rejoin(player, message.payload)
+            else:
+                self._pair(player)
+            return
+        if match is None:
+            player.send(ERROR, "Not in a game")
+            return
+        if match.finished:
+            if message.kind == MOVE:
+                self.rejected += 1
+            player.send(ERROR, "The game is over")
+            return
+        if message.kind == MOVE:
+            try:
+                san = match.play(player, message.payload)
+                self.moves_relayed += 1
+            except IllegalMoveError as error:
+                self.rejected += 1
+                player.send(ERROR, str(error))
+                return
+            if not len(match.position.legal):
+                self._end(match, match.final_result())  # Checkmate or stalemate
+        elif message.kind in RELAYED:
+            match.send(opponent(player.color), message.kind, message.payload)
+            if message.kind == CLOCK:
+                match.clock = message.payload
+            elif message.kind == RESIGN:
+                self._end(match, "0-1" if player.color == "w" else "1-0")
+            elif message.kind == DRAW_ACCEPT:
+                self._end(match, "1/2-1/2")
+
+    async def _handle(self, reader, writer):
+        player = Player(writer)
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                messages, reply = player.session.receive(data)
+                if reply:
+                    writer.write(reply)
+                for message in messages:
+                    self._dispatch(player, message)
+                await writer.drain()
+        except (ConnectionError, ProtocolError):
+            pass
+        finally:
+            await self._disconnect(player)
+
+    async def _disconnect(self, player):
+        if self.waiting is player:
+            self.waiting = None
+        if player.watching is not None:
+            player.watching.spectators.discard(player.writer)
+        match = player.match
+        if match is not None and not match.finished and not self.closing:
+            # Leaving counts as resigning
+            match.send(opponent(player.color), RESIGN, "disconnected")
+            self._end(match, "0-1" if player.color == "w" else "1-0")
+        player.writer.close()
+        try:
+            await player.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def _report(server, interval):
+    last_moves, last_time = 0, time.perf_counter()
+    while True:
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        rate = (server.moves_relayed - last_moves) / (now - last_time)
+        print(f"{len(server.matches)} games running, {server.moves_relayed} moves relayed ({rate:.0f}/s), "
+              f"{server.rejected} rejected")
+        last_moves, last_time = server.moves_relayed, now
+
+
+async def _serve(args):
+    server = GameServer(args.host, args.port, journal_dir=args.journal_dir)
+    if args.resume:
+        print(f"Resumed {server.resume()} unfinished games from {args.journal_dir}")
+    await server.start()
+    print(f"Serving on {args.host}:{server.port}")
+    if args.stats:
+        asyncio.get_running_loop().create_task(_report(server, args.stats))
+    await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many chess games over the framed protocol.")
+    parser.add_argument("--host", default='0.0.0.0')
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--stats", type=float, default=0, metavar="SECONDS", help="Print statistics periodically.")
+    parser.add_argument("--journal-dir", metavar="DIR", help="Journal every game's moves to a file in DIR.")
+    parser.add_argument("--resume", action="store_true", help="Continue the unfinished games journaled in DIR.")
+    args = parser.parse_args(argv)
+    if args.resume and not args.journal_dir:
+        parser.error("--resume needs --journal-dir")
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,311 @@
+"""
+Columnar game database.
+
+Games are stored as 16-bit move codes (see src.codec) instead of PGN text. A file holds one column per field,
+all little-endian and 8-byte aligned:
+
+    preamble   magic, version, game count, move count and the offsets of the sections below
+    moves      uint16[move count]: the moves of every game, back to back
+    index      uint64[games + 1] move start of each game, uint64[games + 1] tag start, uint8[games] result
+    tags       each game's tag pairs as 'key\\0value\\0' pairs, back to back
+
+The file is memory-mapped and the columns are read as typed memoryviews, so opening it costs nothing and
+reading a game touches only its own slice of moves (and its tags, if asked for). Games that start from a
+FEN keep it in their tags.
+
+Usage:
+    python -m src.gamedb games.pgn games.chdb --workers 8
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from src.bitboard import BitboardBoard
+from src.codec import encode_game, decode_game
+from src.legality import IllegalMoveError
+from src.movegen import Move
+from src.pgn import iter_game_spans, parse_game
+from src.validate import find_shards, SHARDS_PER_WORKER
+
+MAGIC = b"CHDB"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHHQQQQQ")  # Magic, version, reserved, games, moves, moves/index/tags offsets
+RESULTS = ["*", "1-0", "0-1", "1/2-1/2"]
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+SHARD_BYTES = 16 * 1024 * 1024  # Upper bound on the PGN a worker converts at once
+
+
+def _check_byte_order():
+    # The columns are read as native arrays, which only matches the file layout on little-endian machines
+    if sys.byteorder != "little":
+        raise RuntimeError("Game databases can only be used on little-endian machines")
+
+
+def _padding(offset):
+    return -offset % 8
+
+
+def encode_tags(headers):
+    return b"".join(f"{key}\0{value}\0".encode() for key, value in headers.items())
+
+
+def decode_tags(data):
+    fields = bytes(data).decode().split("\0")
+    return dict(zip(fields[0:-1:2], fields[1:-1:2]))
+
+
+class GameDatabaseWriter:
+    """
+    Appends games to a new database file. Moves are streamed to disk; tags go to a temporary file and the
+    index is kept in memory (17 bytes per game) until close(). Until then the header is zeroed, so a file left
+    behind by a crash is never taken for a database; used as a context manager, an exception aborts instead.
+    """
+    def __init__(self, path) -> None:
+        _check_byte_order()
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(bytes(PREAMBLE.size))
+        self._tags = tempfile.TemporaryFile()
+        self.move_starts = array("Q", [0])
+        self.tag_starts = array("Q", [0])
+        self.results = bytearray()
+
+    def __len__(self):
+        return len(self.results)
+
+    def add(self, headers, codes, result=None):
+        """
+        :param headers: Tag pairs of the game.
+        :param codes: Move codes (an array('H') or any iterable of ints).
+        :param result: '1-0', '0-1', '1/2-1/2', '*' or None.
+        """
+        if not isinstance(codes, array):
+            codes = array("H", codes)
+        self.add_encoded(encode_tags(headers), codes.tobytes(), RESULT_CODES.get(result, 0))
+
+    def add_encoded(self, tags, codes, result):
+        """
+        Appends a game already in storage form: encoded tags, move code bytes and result code.
+        """
+        self._file.write(codes)
+        self.move_starts.append(self.move_starts[-1] + len(codes) // 2)
+        self._tags.write(tags)
+        self.tag_starts.append(self.tag_starts[-1] + len(tags))
+        self.results.append(result)
+
+    def close(self):
+        file = self._file
+        moves_offset = PREAMBLE.size
+        file.write(bytes(_padding(file.tell())))
+        index_offset = file.tell()
+        file.write(self.move_starts.tobytes())
+        file.write(self.tag_starts.tobytes())
+        file.write(self.results)
+        file.write(bytes(_padding(file.tell())))
+        tags_offset = file.tell()
+        self._tags.seek(0)
+        shutil.copyfileobj(self._tags, file)
+        self._tags.close()
+        file.seek(0)
+        file.write(PREAMBLE.pack(MAGIC, VERSION, 0, len(self.results), self.move_starts[-1],
+                                 moves_offset, index_offset, tags_offset))
+        file.close()
+
+    def abort(self):
+        """
+        Gives up on the database: closes and removes the unfinished file.
+        """
+        self._tags.close()
+        self._file.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class GameDatabase:
+    """
+    Read-only view of a database file.
+    """
+    def __init__(self, path) -> None:
+        _check_byte_order()
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, _, games, moves, moves_offset, index_offset, tags_offset = PREAMBLE.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} game database")
+        self._view = view
+        self._moves = view[moves_offset:moves_offset + 2 * moves].cast("H")
+        starts_size = 8 * (games + 1)
+        self._move_starts = view[index_offset:index_offset + starts_size].cast("Q")
+        self._tag_starts = view[index_offset + starts_size:index_offset + 2 * starts_size].cast("Q")
+        self._results = view[index_offset + 2 * starts_size:index_offset + 2 * starts_size + games]
+        self._tags = view[tags_offset:]
+
+    def __len__(self):
+        return len(self._results)
+
+    def codes(self, index):
+        """
+        The move codes of a game, as a uint16 memoryview into the file (nothing is copied or decoded).
+        """
+        return self._moves[self._move_starts[index]:self._move_starts[index + 1]]
+
+    def moves(self, index):
+        return [Move.decode(code) for code in self.codes(index)]
+
+    def plies(self, index):
+        return self._move_starts[index + 1] - self._move_starts[index]
+
+    def result(self, index):
+        return RESULTS[self._results[index]]
+
+    def headers(self, index):
+        return decode_tags(self._tags[self._tag_starts[index]:self._tag_starts[index + 1]])
+
+    def start_board(self, index, board_class=BitboardBoard):
+        fen = self.headers(index).get("FEN")
+        return board_class.from_fen(fen) if fen else board_class()
+
+    def san(self, index, board_class=BitboardBoard):
+        """
+        Replays a game and returns its moves in SAN.
+        """
+        return decode_game(self.codes(index), self.start_board(index, board_class))
+
+    def close(self):
+        for view in (self._moves, self._move_starts, self._tag_starts, self._results, self._tags, self._view):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def encode_shard(path, start, end):
+    """
+    Parses and encodes the games of one slice of a PGN file. Runs in a pool process.
+    :return: (list of (tag bytes, move code bytes, result code), number of games skipped for an illegal move)
+    """
+    games = []
+    skipped = 0
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        for game_start, game_end in iter_game_spans(buffer, start, end):
+            headers, moves, result = parse_game(buffer[game_start:game_end].decode("utf-8", "replace"))
+            try:
+                board = BitboardBoard.from_fen(headers["FEN"]) if "FEN" in headers else BitboardBoard()
+                codes = encode_game(moves, board)
+            except (IllegalMoveError, ValueError):
+                skipped += 1
+                continue
+            games.append((encode_tags(headers), codes.tobytes(), RESULT_CODES.get(result or headers.get("Result"), 0)))
+    return games, skipped
+
+
+def _encode_task(task):
+    return encode_shard(*task)
+
+
+def convert(pgn_path, db_path, workers=None):
+    """
+    Converts a PGN file into a game database, encoding its shards in parallel and writing them in file order.
+    Games with an illegal move are left out.
+    :return: (games written, games skipped)
+    """
+    workers = workers or multiprocessing.cpu_count()
+    size = os.path.getsize(pgn_path)
+    shards = []
+    if size:
+        with open(pgn_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            shards = find_shards(buffer, max(workers * SHARDS_PER_WORKER, size // SHARD_BYTES))
+    tasks = [(pgn_path, start, end) for start, end in shards]
+
+    skipped = 0
+    with GameDatabaseWriter(db_path) as writer:
+        if workers == 1:
+            outcomes = (encode_shard(*task) for task in tasks)
+        else:
+            pool = multiprocessing.Pool(workers)
+            outcomes = pool.imap(_encode_task, tasks)
+        try:
+            for games, shard_skipped in outcomes:
+                skipped += shard_skipped
+                for game in games:
+                    writer.add_encoded(*game)
+        finally:
+            if workers != 1:
+                pool.close()
+                pool.join()
+        return len(writer), skipped
+
+
+def benchmark(pgn_path, db_path, samples=1000, report=print):
+    """
+    Compares reading every game's moves from the PGN text and from the database, and random access by number.
+    """
+    start = time.perf_counter()
+    plies = 0
+    with open(pgn_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        for game_start, game_end in iter_game_spans(buffer):
+            plies += len(parse_game(buffer[game_start:game_end].decode("utf-8", "replace"))[1])
+    pgn_time = time.perf_counter() - start
+
+    with GameDatabase(db_path) as database:
+        start = time.perf_counter()
+        stored = sum(len(database.codes(index)) for index in range(len(database)))
+        scan_time = time.perf_counter() - start
+
+        rng = random.Random(0)
+        picks = [rng.randrange(len(database)) for _ in range(samples)] if len(database) else []
+        start = time.perf_counter()
+        for index in picks:
+            database.moves(index)
+        random_time = time.perf_counter() - start
+
+    pgn_size, db_size = os.path.getsize(pgn_path), os.path.getsize(db_path)
+    report(f"size: PGN {pgn_size} bytes, database {db_size} bytes ({pgn_size / max(db_size, 1):.1f}x smaller)")
+    report(f"tokenise all PGN movetext: {plies} plies in {pgn_time:.3f}s")
+    report(f"read all move codes:       {stored} plies in {scan_time:.3f}s ({pgn_time / max(scan_time, 1e-9):.0f}x faster)")
+    if picks:
+        report(f"random game lookup: {random_time / len(picks) * 1e6:.1f} us per game (codes decoded to Moves)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a PGN file into a columnar game database.")
+    parser.add_argument("pgn", help="PGN file to convert.")
+    parser.add_argument("database", help="Database file to write.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--benchmark", action="store_true", help="Compare reading the PGN and the database.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    games, skipped = convert(args.pgn, args.database, args.workers)
+    print(f"{games} games written, {skipped} skipped for illegal moves, in {time.perf_counter() - start:.2f}s")
+    if args.benchmark:
+        benchmark(args.pgn, args.database)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
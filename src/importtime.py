@@ -0,0 +1,73 @@
+"""
+Import-time benchmark.
+
+Every module is imported in a fresh interpreter, so nothing is cached between measurements. The report shows
+the median import time and whether pygame was pulled in: the rules engine must stay headless, while the GUI
+is expected to load it.
+
+Usage:
+    python -m src.importtime --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Modules that must import without pygame
+HEADLESS_MODULES = ["src.board", "src.bitboard", "src.Pieces.Pieces", "src.moving_logic", "src.notation",
+                    "src.click_logic", "src.pgn", "src.validate", "src.perft", "src.engine"]
+# Modules shown for comparison
+REFERENCE_MODULES = ["pygame", "src.Game"]
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, "pygame" in sys.modules)
+"""
+
+
+def measure(module, runs=5):
+    """
+    Imports a module in `runs` fresh interpreters.
+    :return: (median seconds, True if pygame was imported)
+    """
+    timings = []
+    loads_pygame = False
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], capture_output=True, text=True,
+                                check=True).stdout.split()
+        timings.append(float(output[-2]))
+        loads_pygame = output[-1] == "True"
+    return statistics.median(timings), loads_pygame
+
+
+def benchmark(modules=HEADLESS_MODULES + REFERENCE_MODULES, runs=5, report=print):
+    """
+    Measures each module and reports any headless module that imports pygame.
+    :return: A dict of module -> (median seconds, loads pygame).
+    """
+    results = {}
+    for module in modules:
+        elapsed, loads_pygame = measure(module, runs)
+        results[module] = (elapsed, loads_pygame)
+        flag = ""
+        if loads_pygame:
+            flag = "  pygame" if module not in HEADLESS_MODULES else "  pygame (should be headless!)"
+        report(f"{module:<20} {elapsed * 1000:8.1f} ms{flag}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the import time of the engine modules.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module.")
+    parser.add_argument("modules", nargs="*", help="Modules to measure (default: the engine and GUI modules).")
+    args = parser.parse_args(argv)
+    results = benchmark(args.modules or HEADLESS_MODULES + REFERENCE_MODULES, args.runs)
+    headless_failures = [module for module in HEADLESS_MODULES if results.get(module, (0, False))[1]]
+    return 1 if headless_failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+"""
+Append-only game journal.
+
+Each game is written to its own file as a sequence of records: a 3-byte header (type, payload length), the
+payload and a CRC-32 of both. Move records hold the 16-bit move code and both clocks in milliseconds
+(17 bytes per move); checkpoint records hold the ply number and the FEN of the position after it; a result
+record closes a finished game. A checkpoint is written for the starting position and then every
+`checkpoint_interval` plies, so recovery loads the last checkpoint and replays at most that many moves instead
+of the whole game.
+
+Every record is flushed to the operating system as soon as it is written, so a crash of the process loses
+nothing. The disk syncs (fsync) are batched: after `sync_every` records, or once records have waited
+`sync_interval` seconds, checked whenever a record is written and by sync_if_due(), which the owner calls
+from a timer or its main loop so the tail of a burst does not wait for the next move. That trades at most one
+batch of moves on power loss for far fewer disk syncs. A record cut short by a crash fails its CRC and is
+dropped, along with anything after it.
+
+Benchmark:
+    python -m src.journal --plies 200
+"""
+import argparse
+import os
+import random
+import struct
+import tempfile
+import time
+import zlib
+
+from src.bitboard import BitboardBoard
+from src.legality import LegalMoveSet
+from src.movegen import Move
+
+RECORD_HEADER = struct.Struct("!BH")  # Record type, payload length
+CRC = struct.Struct("!I")
+MOVE_PAYLOAD = struct.Struct("!HII")  # Move code, white clock (ms), black clock (ms)
+PLY = struct.Struct("!I")
+
+MOVE_RECORD = 1
+CHECKPOINT_RECORD = 2
+RESULT_RECORD = 3
+
+NO_CLOCK = 0xFFFFFFFF  # Stored when the game has no clock
+
+
+class JournalError(Exception):
+    """
+    Raised when a journal cannot be replayed (e.g. it holds a move that is illegal in its position).
+    """
+
+
+def _encode_record(kind, payload):
+    body = RECORD_HEADER.pack(kind, len(payload)) + payload
+    return body + CRC.pack(zlib.crc32(body))
+
+
+def read_records(path):
+    """
+    Reads the intact records of a journal.
+    :return: (list of (type, payload), byte length of the intact prefix)
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    records = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, length = RECORD_HEADER.unpack_from(data, offset)
+        end = offset + RECORD_HEADER.size + length
+        if end + CRC.size > len(data) or CRC.unpack_from(data, end)[0] != zlib.crc32(data[offset:end]):
+            break  # Torn or corrupt tail
+        records.append((kind, data[offset + RECORD_HEADER.size:end]))
+        offset = end + CRC.size
+    return records, offset
+
+
+def _to_millis(seconds):
+    return NO_CLOCK if seconds is None else int(seconds * 1000)
+
+
+def _from_millis(millis):
+    return None if millis == NO_CLOCK else millis / 1000
+
+
+class Journal:
+    def __init__(self, path, checkpoint_interval=20, sync_every=16, sync_interval=0.05) -> None:
+        """
+        Opens a journal for appending, creating it if needed. A torn tail left by a crash is cut off.
+        :param checkpoint_interval: Plies between FEN checkpoints (0 disables them after the first).
+        :param sync_every: Records written before the file is fsync'ed.
+        :param sync_interval: Seconds a record may wait for its fsync (see sync_if_due).
+        """
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.ply = 0
+        self.syncs = 0
+        self.result = None  # Set once the game's result was recorded
+        self._pending = 0
+        self._oldest_pending = 0.0  # When the oldest record not synced yet was written
+
+        size = 0
+        if os.path.exists(path):
+            records, size = read_records(path)
+            self.ply = sum(kind == MOVE_RECORD for kind, _ in records)
+            for kind, payload in records:
+                if kind == RESULT_RECORD:
+                    self.result = payload.decode()
+        self._file = open(path, "ab")
+        if self._file.tell() != size:
+            self._file.truncate(size)
+            self._file.seek(size)
+        self.empty = size == 0
+
+    def start(self, board):
+        """
+        Writes the checkpoint of the starting position; does nothing if the journal already has records.
+        """
+        if self.empty:
+            self._checkpoint(board)
+            self.sync()
+
+    def record(self, move, board, clocks=None):
+        """
+        Appends a move. Call it after the move was made on `board`, which is used for checkpoints.
+        :param move: The Move that was played.
+        :param clocks: Optional (white seconds, black seconds) left after the move.
+        """
+        white, black = clocks if clocks else (None, None)
+        self._write(MOVE_RECORD, MOVE_PAYLOAD.pack(move.encode(), _to_millis(white), _to_millis(black)))
+        self.ply += 1
+        if self.checkpoint_interval and self.ply % self.checkpoint_interval == 0:
+            self._checkpoint(board)
+        self._file.flush()  # In the OS's hands now: only a power loss can still lose it
+        if self._pending >= self.sync_every:
+            self.sync()
+        else:
+            self.sync_if_due()
+
+    def finish(self, result):
+        """
+        Records the result of the game ('1-0', '0-1' or '1/2-1/2'), so it is not resumed, and syncs.
+        """
+        self._write(RESULT_RECORD, result.encode())
+        self.result = result
+        self.sync()
+
+    def sync_if_due(self):
+        """
+        Syncs if a record has been waiting for `sync_interval` seconds. Cheap when nothing is pending, so it can
+        be called every frame or from a periodic timer.
+        """
+        if self._pending and time.perf_counter() - self._oldest_pending >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Makes everything written so far durable.
+        """
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+            self._pending = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+    def _checkpoint(self, board):
+        self._write(CHECKPOINT_RECORD, PLY.pack(self.ply) + board.to_fen().encode())
+
+    def _write(self, kind, payload):
+        self._file.write(_encode_record(kind, payload))
+        if not self._pending:
+            self._oldest_pending = time.perf_counter()
+        self._pending += 1
+        self.empty = False
+
+
+class RecoveredGame:
+    def __init__(self, board, ply, clocks, replayed, moves=None, result=None) -> None:
+        self.board = board
+        self.ply = ply  # Plies played in the game
+        self.clocks = clocks  # (white seconds, black seconds) after the last move, or None
+        self.replayed = replayed  # Moves replayed after the checkpoint recovery started from
+        self.moves = moves  # The whole game in SAN, if recover() was asked for it
+        self.result = result  # The recorded result, or None if the game was still running
+
+
+def recover(path, board_class=BitboardBoard, with_moves=False):
+    """
+    Rebuilds a game from its journal: loads the last checkpoint and replays the moves recorded after it.
+    :param with_moves: Replay from the first checkpoint instead and return every move in SAN, e.g. to show the
+                       game's history again.
+    :return: RecoveredGame, or None if the journal has no checkpoint.
+    :raises JournalError: If a recorded move is not legal in the replayed position.
+    """
+    records, _ = read_records(path)
+    checkpoints = [index for index, (kind, _) in enumerate(records) if kind == CHECKPOINT_RECORD]
+    if not checkpoints:
+        return None
+    checkpoint = checkpoints[0] if with_moves else checkpoints[-1]
+    result = next((payload.decode() for kind, payload in records if kind == RESULT_RECORD), None)
+
+    payload = records[checkpoint][1]
+    ply = PLY.unpack_from(payload)[0]
+    board = board_class.from_fen(payload[PLY.size:].decode())
+    clocks = None
+    moves = [] if with_moves else None
+    replayed = 0
+    for kind, payload in records[checkpoint + 1:]:
+        if kind != MOVE_RECORD:
+            continue
+        code, white, black = MOVE_PAYLOAD.unpack(payload)
+        move = Move.decode(code)
+        if with_moves:
+            san = LegalMoveSet(board).san.get(move)
+            if san is None:
+                raise JournalError(f"Move {move.uci()} at ply {ply + 1} is not legal in {board.to_fen()}")
+            moves.append(san)
+        elif move not in board.generate_legal():
+            raise JournalError(f"Move {move.uci()} at ply {ply + 1} is not legal in {board.to_fen()}")
+        board.make_move(move)
+        ply += 1
+        replayed += 1
+        if white != NO_CLOCK or black != NO_CLOCK:
+            clocks = (_from_millis(white), _from_millis(black))
+    return RecoveredGame(board, ply, clocks, replayed, moves, result)
+
+
+def benchmark(plies=200, intervals=(0, 10, 20, 50), runs=5, report=print):
+    """
+    Journals a random game of `plies` moves and times its recovery for several checkpoint intervals,
+    and the cost of appending with and without fsync batching.
+    """
+    rng = random.Random(1)
+    board = BitboardBoard()
+    moves = []
+    while len(moves) < plies:
+        legal = board.generate_legal()
+        if not legal:
+            board = BitboardBoard()  # The random game ended early; start over
+            moves = []
+            continue
+        move = rng.choice(legal)
+        board.make_move(move)
+        moves.append(move)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for sync_every in (1, 16):
+            path = os.path.join(directory, f"sync{sync_every}.journal")
+            start = time.perf_counter()
+            journal = Journal(path, checkpoint_interval=20, sync_every=sync_every, sync_interval=float("inf"))
+            replay = BitboardBoard()
+            journal.start(replay)
+            for move in moves:
+                replay.make_move(move)
+                journal.record(move, replay, (300.0, 300.0))
+            journal.close()
+            elapsed = time.perf_counter() - start
+            report(f"append, fsync every {sync_every:>2} records: {elapsed / plies * 1e6:8.1f} us/move, "
+                   f"{journal.syncs} fsyncs, {os.path.getsize(path)} bytes")
+
+        # A game one ply short of a checkpoint is the worst case: interval - 1 moves to replay
+        for length in (plies, plies - 1):
+            for interval in intervals:
+                path = os.path.join(directory, f"checkpoint{interval}_{length}.journal")
+                journal = Journal(path, checkpoint_interval=interval, sync_every=64)
+                replay = BitboardBoard()
+                journal.start(replay)
+                for move in moves[:length]:
+                    replay.make_move(move)
+                    journal.record(move, replay)
+                journal.close()
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    recovered = recover(path)
+                    timings.append(time.perf_counter() - start)
+                assert recovered.board.to_fen() == replay.to_fen()
+                label = f"every {interval:>2} plies" if interval else "start only    "
+                report(f"recover {length} plies, checkpoint {label}: {min(timings) * 1000:7.2f} ms "
+                       f"({recovered.replayed} moves replayed)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark journal appends and recovery.")
+    parser.add_argument("--plies", type=int, default=200)
+    parser.add_argument("--intervals", type=int, nargs="+", default=[0, 10, 20, 50])
+    args = parser.parse_args(argv)
+    benchmark(args.plies, args.intervals)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+"""
+Legal-move sets for validating moves received over the network.
+
+The legal moves of a position are generated once and indexed by SAN (with and without '=' before a
+promotion) and UCI, so checking a move is a dictionary lookup whatever the position looks like.
+"""
+from src.notation import legal_moves_by_san
+from src.squares import SQUARES, opponent
+
+
+class IllegalMoveError(ValueError):
+    """
+    Raised when a move is not legal in the position it is played in.
+    """
+    def __init__(self, notation, reason="Illegal move") -> None:
+        super().__init__(f"{notation}: {reason}")
+        self.notation = notation
+        self.reason = reason
+
+
+def normalize(notation):
+    """
+    Strips check and annotation marks and accepts zeros for castling, e.g. '0-0+' -> 'O-O'.
+    """
+    return notation.strip().rstrip("+#!?").replace("0-0", "O-O")
+
+
+class LegalMoveSet:
+    """
+    The legal moves of one position, looked up by SAN or UCI.
+    """
+    def __init__(self, board) -> None:
+        self.moves = {}
+        self.san = {}  # Move -> canonical SAN without check suffix
+        for san, move in legal_moves_by_san(board).items():
+            self.san[move] = san
+            self.moves[san] = move
+            self.moves[move.uci()] = move
+            if move.promotion:
+                self.moves[san.replace("=", "")] = move
+
+    def __len__(self):
+        return len(self.san)
+
+    def __contains__(self, notation):
+        return normalize(notation) in self.moves
+
+    def lookup(self, notation):
+        """
+        Returns the Move a SAN or UCI string stands for.
+        :raises IllegalMoveError: If it is not a legal move here.
+        """
+        move = self.moves.get(normalize(notation))
+        if move is None:
+            raise IllegalMoveError(notation, "Illegal move" if self.san else "No legal moves: the game is over")
+        return move
+
+
+class Position:
+    """
+    A board plus the legal-move set of its current position, rebuilt once per ply.
+    Moves have to go through play() for the cached set to stay in step with the board.
+    """
+    def __init__(self, board) -> None:
+        self.board = board
+        self._legal = None
+
+    @property
+    def legal(self):
+        if self._legal is None:
+            self._legal = LegalMoveSet(self.board)
+        return self._legal
+
+    def play(self, notation):
+        """
+        Validates and plays a move.
+        :return: The canonical SAN of the move, with '+' or '#' when it gives check or mate.
+        :raises IllegalMoveError: If the move is not legal.
+        """
+        move = self.legal.lookup(notation)
+        san = self.legal.san[move]
+        self.board.make_move(move)
+        self._legal = None
+        # The next ply's set is needed for the next move anyway; building it now also tells mate from check
+        color = self.board.turn
+        king = self.board.masks()[0][(color, "king")]
+        if king and self.board.attackers_of(SQUARES[king.bit_length() - 1], opponent(color)):
+            san += "+" if len(self.legal) else "#"
+        return san
@@ -0,0 +1,215 @@
+"""
+Load test for the game server.
+
+Simulated clients connect in pairs over localhost and play a fixed number of knight moves back and forth
+(always legal, so every move goes through the server's validation). The latency of a move is the time from
+one client writing it to its opponent reading the relayed copy; both clients live in this process, so one
+clock measures it. With --spectators, that many read-only clients also watch the first game, measuring
+how long a delta takes to reach them.
+
+Usage:
+    python -m src.loadtest --games 100 1000 10000 --plies 20
+    python -m src.loadtest --games 10 --spectators 100 500
+    python -m src.loadtest --games 1000 --connect 127.0.0.1:12345   # against a running python -m src.game_server
+"""
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+
+from src.game_server import GameServer
+from src.protocol import Session, MOVE, START, ERROR, JOIN, SUBSCRIBE, SNAPSHOT, DELTA, RESULT
+
+# A knight shuffle that is legal forever: white Nf3 Ng1 ..., black Nf6 Ng8 ...
+SCRIPTS = {"w": ["Nf3", "Ng1"], "b": ["Nf6", "Ng8"]}
+
+
+class LoadStats:
+    def __init__(self) -> None:
+        self.sent_at = {}  # (game id, ply) -> time the move was written
+        self.latencies = []
+        self.moves = 0
+        self.errors = 0
+        self.spectator_latencies = []
+        self.deltas = 0
+
+
+async def simulated_client(host, port, plies, stats):
+    """
+    Plays one side of a game: waits for START, then answers every opponent move until `plies` are played.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    session = Session()
+    writer.write(session.message(JOIN))
+    color = game_id = None
+    ply = 0  # Plies played in the game so far
+
+    def play():
+        nonlocal ply
+        script = SCRIPTS[color]
+        writer.write(session.move(script[(ply // 2) % len(script)]))
+        stats.sent_at[(game_id, ply)] = time.perf_counter()
+        ply += 1
+
+    try:
+        while ply < plies:
+            data = await reader.read(4096)
+            if not data:
+                break
+            messages, reply = session.receive(data)
+            if reply:
+                writer.write(reply)
+            for message in messages:
+                if message.kind == START:
+                    color, game_id = message.payload.split()
+                    if color == "w":
+                        play()
+                elif message.kind == MOVE:
+                    sent = stats.sent_at.get((game_id, ply))
+                    if sent is not None:
+                        stats.latencies.append(time.perf_counter() - sent)
+                    stats.moves += 1
+                    ply += 1
+                    if ply < plies:
+                        play()
+                elif message.kind == ERROR:
+                    stats.errors += 1
+            await writer.drain()
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def spectator(host, port, game_id, stats):
+    """
+    Watches one game until its RESULT, or until the server closes the connection.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    session = Session()
+    writer.write(session.message(SUBSCRIBE, game_id))
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            messages, reply = session.receive(data)
+            if reply:
+                writer.write(reply)
+            for message in messages:
+                if message.kind == ERROR:
+                    await asyncio.sleep(0.01)  # The game has not started yet
+                    writer.write(session.message(SUBSCRIBE, game_id))
+                elif message.kind == SNAPSHOT:
+                    continue
+                elif message.kind == DELTA:
+                    ply = int(message.payload.split()[0]) - 1
+                    sent = stats.sent_at.get((game_id, ply))
+                    if sent is not None:
+                        stats.spectator_latencies.append(time.perf_counter() - sent)
+                    stats.deltas += 1
+                elif message.kind == RESULT:
+                    return
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def run(games, plies, connect=None, connect_rate=500, spectators=0):
+    """
+    Runs `games` concurrent games.
+    :param connect: (host, port) of an external server; by default a GameServer is started in this process.
+    :param connect_rate: Connections opened per batch, so the listen backlog is not overrun.
+    :param spectators: Number of clients watching game 0.
+    :return: LoadStats and the elapsed seconds.
+    """
+    server = None
+    if connect is None:
+        server = await GameServer('127.0.0.1', 0).start()
+        host, port = '127.0.0.1', server.port
+    else:
+        host, port = connect
+
+    stats = LoadStats()
+    start = time.perf_counter()
+    tasks = []
+    watchers = [asyncio.create_task(spectator(host, port, "0", stats)) for _ in range(spectators)]
+    await asyncio.sleep(0.1 if spectators else 0)  # Let the spectators connect before the game starts
+    for index in range(2 * games):
+        tasks.append(asyncio.create_task(simulated_client(host, port, plies, stats)))
+        if index % connect_rate == connect_rate - 1:
+            await asyncio.sleep(0)  # Let the server accept before opening more
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stats.errors += sum(isinstance(result, Exception) for result in results)
+    # The players left once their plies were played, which ends game 0 and releases the spectators
+    await asyncio.gather(*watchers, return_exceptions=True)
+    if server is not None:
+        await server.close()
+    return stats, elapsed
+
+
+def raise_file_limit(needed):
+    """
+    Each game needs four sockets when the server runs in this process; asks for a high enough descriptor limit.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, needed))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+    return wanted
+
+
+def percentiles(latencies):
+    """
+    :return: (p50, p99) in milliseconds.
+    """
+    if not latencies:
+        return 0.0, 0.0
+    latencies = sorted(latencies)
+    return statistics.median(latencies) * 1000, latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000
+
+
+def report_line(games, stats, elapsed, spectators=0):
+    p50, p99 = percentiles(stats.latencies)
+    line = (f"{games:>6} games: {stats.moves:>8} moves in {elapsed:7.2f}s  {stats.moves / elapsed:9.0f} moves/s  "
+            f"p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  errors {stats.errors}")
+    if spectators:
+        p50, p99 = percentiles(stats.spectator_latencies)
+        line += f"\n        {spectators} spectators: {stats.deltas} deltas  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the game server with simulated clients.")
+    parser.add_argument("--games", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--plies", type=int, default=20, help="Moves played in each game.")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="Test a running server instead of an in-process one.")
+    parser.add_argument("--spectators", type=int, nargs="+", default=[0], help="Clients watching the first game.")
+    args = parser.parse_args(argv)
+
+    connect = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        connect = (host, int(port))
+
+    for games in args.games:
+        for spectators in args.spectators:
+            needed = (games * 2 + spectators) * (1 if connect else 2) + 64
+            limit = raise_file_limit(needed)
+            if limit < needed:
+                print(f"{games:>6} games: skipped, needs {needed} file descriptors but the limit is {limit}")
+                continue
+            stats, elapsed = asyncio.run(run(games, args.plies, connect, spectators=spectators))
+            print(report_line(games, stats, elapsed, spectators))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+from src.squares import SQUARES, SQUARE_INDEX, SQUARE_NAMES, iter_bits, opponent
+from src.attacks import (KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAYS, BETWEEN, ORTHOGONAL_DIRECTIONS,
+                         DIAGONAL_DIRECTIONS, nearest_square, rook_attacks, bishop_attacks)
+
+# Move flags (4 bits). Bit 2 marks captures and bit 3 promotions; the low two bits of a promotion
+# select the promoted piece from PROMOTION_TYPES.
+QUIET = 0
+DOUBLE_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+PROMOTION = 8
+
+PROMOTION_TYPES = ["knight", "bishop", "rook", "queen"]
+PROMOTION_SYMBOLS = {"knight": "n", "bishop": "b", "rook": "r", "queen": "q"}
+
+FULL_MASK = (1 << 64) - 1
+RANK_1 = 0xFF
+RANK_8 = RANK_1 << 56
+
+
+class Move:
+    """
+    A move between two square indices (0 = a1, 63 = h8) plus a 4-bit flag describing its kind.
+    """
+    __slots__ = ("from_index", "to_index", "flag")
+
+    def __init__(self, from_index, to_index, flag=QUIET) -> None:
+        self.from_index = from_index
+        self.to_index = to_index
+        self.flag = flag
+
+    @property
+    def from_square(self):
+        return SQUARES[self.from_index]
+
+    @property
+    def to_square(self):
+        return SQUARES[self.to_index]
+
+    @property
+    def is_capture(self):
+        return bool(self.flag & CAPTURE)
+
+    @property
+    def is_castle(self):
+        return self.flag == KING_CASTLE or self.flag == QUEEN_CASTLE
+
+    @property
+    def promotion(self):
+        """
+        The promoted piece type ('queen', 'knight', ...) or None.
+        """
+        return PROMOTION_TYPES[self.flag & 3] if self.flag & PROMOTION else None
+
+    def encode(self):
+        """
+        Packs the move into 16 bits: from square (bits 0-5), to square (bits 6-11) and flag (bits 12-15).
+        """
+        return self.from_index | self.to_index << 6 | self.flag << 12
+
+    @classmethod
+    def decode(cls, code):
+        return cls(code & 63, code >> 6 & 63, code >> 12 & 15)
+
+    def uci(self):
+        uci = SQUARE_NAMES[self.from_index] + SQUARE_NAMES[self.to_index]
+        if self.flag & PROMOTION:
+            uci += PROMOTION_SYMBOLS[PROMOTION_TYPES[self.flag & 3]]
+        return uci
+
+    def __eq__(self, other):
+        return (isinstance(other, Move) and self.from_index == other.from_index
+                and self.to_index == other.to_index and self.flag == other.flag)
+
+    def __hash__(self):
+        return hash((self.from_index, self.to_index, self.flag))
+
+    def __repr__(self):
+        return f"Move({self.uci()})"
+
+
+def generate_moves(board, color, legal=True, piece_type=None):
+    """
+    Generates the moves of one side.
+
+    Legal generation filters with a check mask (squares that resolve a single check) and per-piece pin masks
+    (the line between the king and its pinner), so no candidate move has to be played and undone.
+
+    :param board: A Board (or BitboardBoard) instance.
+    :param color: The side to generate moves for ('w' or 'b').
+    :param legal: If False, pseudo-legal moves are produced (the king may be left in check).
+    :param piece_type: Optional piece type to restrict generation to (e.g. 'knight').
+    :return: A list of Move objects.
+    """
+    enemy = opponent(color)
+    bitboards, occupancy = board.masks()
+    own = occupancy[color]
+    their = occupancy[enemy]
+    occupied = own | their
+    king_mask = bitboards[(color, "king")]
+    king = king_mask.bit_length() - 1 if king_mask else None
+
+    check_mask = FULL_MASK
+    pins = {}
+    checkers = 0
+    if legal and king is not None:
+        checkers = board.attackers_of(SQUARES[king], enemy)
+        if checkers & (checkers - 1):
+            check_mask = 0  # Double check: only the king may move
+        elif checkers:
+            checker = checkers.bit_length() - 1
+            check_mask = checkers | BETWEEN[king][checker]
+        pins = _find_pins(bitboards, own, occupied, king, enemy)
+
+    moves = []
+    for kind in ("pawn", "knight", "bishop", "rook", "queen"):
+        if piece_type is not None and piece_type != kind:
+            continue
+        for source in iter_bits(bitboards[(color, kind)]):
+            allowed = check_mask & pins.get(source, FULL_MASK)
+            if not allowed:
+                continue
+            if kind == "pawn":
+                _pawn_moves(board, bitboards, color, source, occupied, their, allowed, legal, king, checkers, moves)
+                continue
+            if kind == "knight":
+                targets = KNIGHT_ATTACKS[source]
+            elif kind == "bishop":
+                targets = bishop_attacks(source, occupied)
+            elif kind == "rook":
+                targets = rook_attacks(source, occupied)
+            else:
+                targets = rook_attacks(source, occupied) | bishop_attacks(source, occupied)
+            targets &= ~own & allowed
+            for target in iter_bits(targets):
+                moves.append(Move(source, target, CAPTURE if their >> target & 1 else QUIET))
+
+    if king is not None and (piece_type is None or piece_type == "king"):
+        for target in iter_bits(KING_ATTACKS[king] & ~own):
+            if legal and board.attackers_of(SQUARES[target], enemy, ignore=SQUARES[king]):
+                continue
+            moves.append(Move(king, target, CAPTURE if their >> target & 1 else QUIET))
+
+        if not checkers:
+            # is_castling_valid also covers the attacked-square rule, so castles are always legal here
+            for kingside, flag, step in ((True, KING_CASTLE, 2), (False, QUEEN_CASTLE, -2)):
+                if board.is_castling_valid(color, kingside):
+                    moves.append(Move(king, king + step, flag))
+
+    return moves
+
+
+def _find_pins(bitboards, own, occupied, king, enemy):
+    """
+    Maps each pinned piece's square to the mask of squares it may still move to (the pin line).
+    """
+    pins = {}
+    queens = bitboards[(enemy, "queen")]
+    for directions, sliders in ((ORTHOGONAL_DIRECTIONS, bitboards[(enemy, "rook")] | queens),
+                                (DIAGONAL_DIRECTIONS, bitboards[(enemy, "bishop")] | queens)):
+        if not sliders:
+            continue
+        for direction in directions:
+            ray = RAYS[direction][king]
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            first = nearest_square(direction, blockers)
+            if not own >> first & 1:
+                continue
+            beyond = RAYS[direction][first] & occupied
+            if not beyond:
+                continue
+            pinner = nearest_square(direction, beyond)
+            if sliders >> pinner & 1:
+                pins[first] = ray ^ RAYS[direction][pinner]
+    return pins
+
+
+def _pawn_moves(board, bitboards, color, source, occupied, their, allowed, legal, king, checkers, moves):
+    forward = 8 if color == "w" else -8
+    start_rank = 1 if color == "w" else 6
+    last_rank = RANK_8 if color == "w" else RANK_1
+
+    one_step = source + forward
+    if 0 <= one_step < 64 and not occupied >> one_step & 1:
+        if allowed >> one_step & 1:
+            _add_pawn_move(moves, source, one_step, QUIET, last_rank)
+        two_step = one_step + forward
+        if source // 8 == start_rank and not occupied >> two_step & 1 and allowed >> two_step & 1:
+            moves.append(Move(source, two_step, DOUBLE_PUSH))
+
+    for target in iter_bits(PAWN_ATTACKS[color][source] & their & allowed):
+        _add_pawn_move(moves, source, target, CAPTURE, last_rank)
+
+    # En passant: last_pawn_move holds the square of the pawn that just advanced two squares
+    if board.last_pawn_move is not None:
+        victim = SQUARE_INDEX[board.last_pawn_move]
+        target = victim + forward
+        enemy = opponent(color)
+        if PAWN_ATTACKS[color][source] >> target & 1 and bitboards[(enemy, "pawn")] >> victim & 1 \
+                and not occupied >> target & 1:
+            if not legal or _en_passant_is_legal(bitboards, enemy, source, target, victim, occupied, king, checkers,
+                                                 allowed):
+                moves.append(Move(source, target, EN_PASSANT))
+
+
+def _add_pawn_move(moves, source, target, flag, last_rank):
+    if last_rank >> target & 1:
+        for promotion in range(len(PROMOTION_TYPES)):
+            moves.append(Move(source, target, flag | PROMOTION | promotion))
+    else:
+        moves.append(Move(source, target, flag))
+
+
+def _en_passant_is_legal(bitboards, enemy, source, target, victim, occupied, king, checkers, allowed):
+    """
+    En passant removes two pieces from a line at once, so it is verified against the resulting occupancy.
+    """
+    if king is None:
+        return True
+    # The capture has to stay on the pin line (if any) or remove the checking pawn
+    if not (allowed >> target & 1 or (checkers == 1 << victim and allowed >> victim & 1)):
+        return False
+    after = occupied & ~(1 << source) & ~(1 << victim) | (1 << target)
+    queens = bitboards[(enemy, "queen")]
+    if rook_attacks(king, after) & (bitboards[(enemy, "rook")] | queens):
+        return False
+    if bishop_attacks(king, after) & (bitboards[(enemy, "bishop")] | queens):
+        return False
+    # Any remaining non-slider checker still gives check
+    return not (checkers & ~(1 << victim) & (bitboards[(enemy, "knight")] | bitboards[(enemy, "pawn")]))
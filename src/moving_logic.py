@@ -1,6 +1,7 @@
-from src.constants import board_size, font, tile_size, letters, numbers, pieces, piece_creator, inverse_pieces
+from src.constants import board_size, tile_size, letters, numbers, pieces, piece_creator, inverse_pieces
 import re
 from src.utils import get_en_passant_pos
+from src.squares import opponent
 
 def evaluate_move(board, notation, color):
     """
@@ -25,9 +26,11 @@ def handle_castling(board, notation, color):
     """
     Handles castling moves.
     """
-    is_kingside = notation == "O-O"
+    is_kingside = notation.rstrip("+#") == "O-O"
     if board.is_castling_valid(color, is_kingside):
         board.execute_castle(color, is_kingside)
+        board.last_pawn_move = None
+        advance_clocks(board, color, reset=False)
         return True, f"{color.capitalize()} castled {'kingside' if is_kingside else 'queenside'}."
     return False, f"Invalid castling move for {color}."
 
@@ -56,9 +59,12 @@ def handle_piece_move(board, color, piece_symbol, disambiguation, take, target_s
     """
     piece_type = "p" if piece_symbol == "" else piece_symbol.lower()
     piece_type = pieces[piece_type]
-    possible_pieces = find_piece_to_move(board, color, piece_type, target_square, disambiguation, take)
+    promotion = pieces[promotion_piece.lower()] if promotion_piece else None
+    possible_pieces = find_piece_to_move(board, color, piece_type, target_square, disambiguation, take, promotion)
 
     if not possible_pieces:
+        if promotion_piece:
+            return False, f"No {color} {piece_type} can move to {target_square} and promote to {promotion}."
         return False, f"No valid {piece_type} found for {color} that can move to {target_square}."
     if len(possible_pieces) > 1:
         return False, "Move is ambiguous; specify which piece to move."
@@ -74,12 +80,12 @@ def handle_piece_move(board, color, piece_symbol, disambiguation, take, target_s
     return False, f"Invalid move for {color} {piece_type} to {target_square}."
 
 
-def find_piece_to_move(board, color, piece_type, target_square, disambiguation, take):
+def find_piece_to_move(board, color, piece_type, target_square, disambiguation, take, promotion=None):
     """
     Finds possible pieces of the specified type and color that can move to the target square.
     """
     return board.find_pieces(color=color, piece_type=piece_type, target_square=target_square,
-                             disambiguation=disambiguation, take=take)
+                             disambiguation=disambiguation, take=take, promotion=promotion)
 
 
 
@@ -87,6 +93,7 @@ def finalize_move(board, piece, target_square, message, promotion_piece, color,
     """
     Finalizes the move on the board, handling en passant, promotion, and board updates.
     """
+    is_capture = board[target_square] is not None or message == "En passant"
     if message == "En passant":
         en_passant_pos = get_en_passant_pos(target_square, color)
         board[en_passant_pos] = None  # Remove captured pawn
@@ -101,4 +108,16 @@ def finalize_move(board, piece, target_square, message, promotion_piece, color,
     piece.pos = target_square
 
     # Update the board with the new piece position
-    board[target_square] = piece
\ No newline at end of file
+    board[target_square] = piece
+    advance_clocks(board, color, reset=is_capture or piece.type == "pawn" or bool(promotion_piece))
+
+
+def advance_clocks(board, color, reset):
+    """
+    Hands the turn to the other side and updates the halfmove clock and fullmove number.
+    :param reset: True after a capture or pawn move, which resets the halfmove clock.
+    """
+    board.halfmove_clock = 0 if reset else board.halfmove_clock + 1
+    if color == "b":
+        board.fullmove_number += 1
+    board.turn = opponent(color)
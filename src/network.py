@@ -0,0 +1,201 @@
+"""
+Background network transport for Game.
+
+Connecting (or accepting), reading and writing run on daemon threads, so the pygame loop never blocks on the
+socket. Messages from the opponent are handed to the game through a queue that the loop polls once per frame.
+Messages are framed and acknowledged as described in protocol.
+
+When the connection drops, the client connects again and the server accepts the opponent again, for up to
+`reconnect_timeout` seconds. The session survives the drop: the frames the opponent had not acknowledged are
+written first on the new connection, and frames it already received are dropped on its side, so no move is
+lost or played twice. Moves queued while disconnected are sent once the connection is back.
+"""
+import queue
+import socket
+import threading
+import time
+
+from src.protocol import Session, MOVE, ProtocolError
+
+
+RECONNECT_DELAY = 0.5  # Seconds between connection attempts after a drop
+
+
+class Connection:
+    def __init__(self, is_server, host='127.0.0.1', port=12345, reconnect_timeout=60.0) -> None:
+        """
+        :param is_server: Listen for the opponent instead of connecting to it.
+        :param reconnect_timeout: Seconds to try to get a dropped connection back before giving up (0: never try).
+        """
+        self.is_server = is_server
+        self.host = host
+        self.port = port
+        self.reconnect_timeout = reconnect_timeout
+        self.reconnects = 0
+        self.incoming = queue.Queue()  # protocol.Message objects received from the opponent
+        self.outgoing = queue.Queue()  # Frames waiting to be written; only the writer thread writes
+        self.connected = threading.Event()
+        self.closed = threading.Event()
+        self.error = None
+        self.session = Session()
+        self._listener = None
+        self._socket = None
+        self._lock = threading.Lock()  # Guards the session, shared by the game loop and the reader
+
+    def start(self):
+        """
+        Starts accepting or connecting in the background and returns immediately.
+        """
+        threading.Thread(target=self._reader, name="connection-reader", daemon=True).start()
+        threading.Thread(target=self._writer, name="connection-writer", daemon=True).start()
+
+    @property
+    def unacknowledged(self):
+        """
+        Number of messages sent that the opponent has not confirmed yet.
+        """
+        return len(self.session.unacked)
+
+    def send(self, move):
+        """
+        Queues a move for the opponent. It is written as soon as the connection is up.
+        """
+        self.send_message(MOVE, move)
+
+    def send_message(self, kind, payload=""):
+        """
+        Queues any protocol message (e.g. protocol.RESIGN or protocol.CLOCK).
+        """
+        try:
+            with self._lock:
+                frame = self.session.message(kind, payload)
+        except ProtocolError as error:
+            # The opponent stopped acknowledging; give up on the connection like on any protocol error
+            self.error = error
+            print(f"Connection error: {error}")
+            self.close()
+            return
+        self.outgoing.put(frame)
+
+    def poll(self):
+        """
+        Returns the messages received since the last call, without waiting.
+        """
+        messages = []
+        while True:
+            try:
+                messages.append(self.incoming.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        self.closed.set()
+        self.outgoing.put(None)  # Wake the writer up
+        for sock in (self._socket, self._listener):
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)  # Wakes up a thread blocked in recv or accept
+                except OSError:
+                    pass
+                sock.close()
+
+    def _open(self):
+        if self.is_server:
+            self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._listener.bind((self.host, self.port))
+            self._listener.listen(1)
+            self.port = self._listener.getsockname()[1]  # The real port when 0 was asked for
+            print("Waiting for a connection...")
+            self._socket, _ = self._listener.accept()
+            print("Client connected.")
+        else:
+            self._socket = socket.create_connection((self.host, self.port))
+            print("Connected to server.")
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connected.set()
+
+    def _reopen(self):
+        """
+        Gets a dropped connection back and replays the unacknowledged frames on it.
+        :return: False if the opponent did not come back within reconnect_timeout.
+        """
+        deadline = time.monotonic() + self.reconnect_timeout
+        print("Connection lost, reconnecting...")
+        while not self.closed.is_set() and time.monotonic() < deadline:
+            try:
+                if self.is_server:
+                    self._listener.settimeout(max(deadline - time.monotonic(), 0.01))
+                    sock, _ = self._listener.accept()
+                else:
+                    sock = socket.create_connection((self.host, self.port), timeout=RECONNECT_DELAY)
+                    sock.settimeout(None)
+            except OSError:
+                if not self.is_server:
+                    time.sleep(RECONNECT_DELAY)
+                continue
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                pending = self.session.reconnect()
+            try:
+                sock.sendall(pending)
+            except OSError:
+                sock.close()
+                continue
+            self._socket = sock
+            self.reconnects += 1
+            self.connected.set()  # Only now may the writer continue, after the replayed frames
+            print("Reconnected.")
+            return True
+        return False
+
+    def _receive(self):
+        """
+        Reads from the current socket until it closes.
+        """
+        while not self.closed.is_set():
+            data = self._socket.recv(4096)
+            if not data:
+                raise ConnectionError("Connection closed by peer")
+            with self._lock:
+                messages, reply = self.session.receive(data)
+            for message in messages:
+                self.incoming.put(message)
+            if reply:
+                self.outgoing.put(reply)  # One cumulative acknowledgement for the whole batch
+
+    def _reader(self):
+        try:
+            self._open()
+            while not self.closed.is_set():
+                try:
+                    self._receive()
+                except OSError as error:
+                    if self.closed.is_set():
+                        break
+                    self.connected.clear()
+                    self._socket.close()
+                    if not self.reconnect_timeout or not self._reopen():
+                        raise error
+        except (OSError, ProtocolError) as error:
+            if not self.closed.is_set():
+                self.error = error
+                print(f"Connection error: {error}")
+        finally:
+            self.closed.set()
+            self.outgoing.put(None)
+
+    def _writer(self):
+        while not self.closed.is_set():
+            frame = self.outgoing.get()
+            if frame is None:
+                break
+            while not self.connected.wait(0.1):
+                if self.closed.is_set():
+                    return
+            try:
+                self._socket.sendall(frame)
+            except OSError:
+                # Numbered frames are still in the session and get replayed once the reader reconnects;
+                # a lost acknowledgement or clock reading is sent again by the next one
+                pass
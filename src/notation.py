@@ -0,0 +1,110 @@
+from src.constants import inverse_pieces
+from src.movegen import KING_CASTLE, QUEEN_CASTLE, CAPTURE, PROMOTION, PROMOTION_TYPES
+from src.squares import SQUARES, SQUARE_NAMES, opponent
+
+
+PIECE_LETTERS = {piece_type: symbol.upper() for piece_type, symbol in inverse_pieces.items()}
+PROMOTION_SUFFIXES = ["=" + PIECE_LETTERS[piece_type] for piece_type in PROMOTION_TYPES]
+
+
+def move_to_san(board, move):
+    """
+    Converts a generated move into standard algebraic notation (e.g. 'Nbd7', 'exd5', 'e8=Q+', 'O-O#'),
+    in the form moving_logic.evaluate_move accepts.
+
+    Parameters:
+        board (Board): The position before the move. It is left unchanged.
+        move (Move): A legal move in that position.
+
+    Returns:
+        str: The move in algebraic notation.
+    """
+    piece = board.piece_at(move.from_index)
+    from_file, from_rank = SQUARES[move.from_index]
+    to_file, to_rank = SQUARES[move.to_index]
+
+    if move.is_castle:
+        san = "O-O" if move.flag == KING_CASTLE else "O-O-O"
+    elif piece.type == "pawn":
+        san = f"{from_file}x{to_file}{to_rank}" if move.is_capture else f"{to_file}{to_rank}"
+        if move.promotion:
+            san += "=" + inverse_pieces[move.promotion].upper()
+    else:
+        san = inverse_pieces[piece.type].upper() + _disambiguation(board, move, piece)
+        san += f"{'x' if move.is_capture else ''}{to_file}{to_rank}"
+
+    return san + _check_suffix(board, move, piece.color)
+
+
+def _disambiguation(board, move, piece):
+    """
+    Returns the minimal file, rank or square needed to tell this move apart from same-type pieces
+    that can legally reach the same square.
+    """
+    rivals = [other.from_index for other in board.generate_legal(piece.color, piece.type)
+              if other.to_index == move.to_index and other.from_index != move.from_index]
+    return _disambiguator(move, rivals)
+
+
+def _disambiguator(move, rivals):
+    if not rivals:
+        return ""
+    from_file, from_rank = SQUARES[move.from_index]
+    if all(SQUARES[index][0] != from_file for index in rivals):
+        return from_file
+    if all(SQUARES[index][1] != from_rank for index in rivals):
+        return str(from_rank)
+    return f"{from_file}{from_rank}"
+
+
+def legal_moves_by_san(board, moves=None):
+    """
+    Maps the algebraic notation of every legal move of the side to move, without the check suffix, to the move.
+    Disambiguation is worked out from the move list itself, so the whole table costs one move generation.
+
+    Parameters:
+        board (Board): The position.
+        moves (list): The legal moves of the position, if they were already generated.
+
+    Returns:
+        dict: SAN -> Move.
+    """
+    if moves is None:
+        moves = board.generate_legal()
+    pieces_by_move = [board.piece_at(move.from_index) for move in moves]
+    sources = {}  # (piece type, target) -> squares of the pieces that can go there
+    for move, piece in zip(moves, pieces_by_move):
+        sources.setdefault((piece.type, move.to_index), set()).add(move.from_index)
+
+    table = {}
+    for move, piece in zip(moves, pieces_by_move):
+        flag = move.flag
+        target = SQUARE_NAMES[move.to_index]
+        if flag == KING_CASTLE:
+            san = "O-O"
+        elif flag == QUEEN_CASTLE:
+            san = "O-O-O"
+        elif piece.type == "pawn":
+            san = SQUARES[move.from_index][0] + "x" + target if flag & CAPTURE else target
+            if flag & PROMOTION:
+                san += PROMOTION_SUFFIXES[flag & 3]
+        else:
+            group = sources[(piece.type, move.to_index)]
+            prefix = PIECE_LETTERS[piece.type]
+            if len(group) > 1:
+                prefix += _disambiguator(move, [index for index in group if index != move.from_index])
+            san = prefix + ("x" + target if flag & CAPTURE else target)
+        table[san] = move
+    return table
+
+
+def _check_suffix(board, move, color):
+    board.make_move(move)
+    try:
+        enemy = opponent(color)
+        king = board.masks()[0][(enemy, "king")]
+        if not king or not board.attackers_of(SQUARES[king.bit_length() - 1], color):
+            return ""
+        return "+" if board.generate_legal(enemy) else "#"
+    finally:
+        board.unmake_move()
@@ -0,0 +1,175 @@
+"""
+Perft: counts the leaf nodes of the legal move tree to a fixed depth.
+
+The counts are compared against published reference values to catch move generation regressions,
+and the timings track move generation throughput.
+
+Usage:
+    python -m src.perft --depth 4
+    python -m src.perft --fen "<fen>" --depth 3 --divide
+    python -m src.perft --suite --max-nodes 1000000
+"""
+import argparse
+import time
+
+from src.bitboard import BitboardBoard
+from src.board import Board
+from src.squares import SQUARES
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Standard perft positions with their expected node counts per depth
+REFERENCE_POSITIONS = [
+    ("start", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+]
+
+
+def perft(board, depth):
+    """
+    Counts the leaf nodes of the legal move tree below the current position.
+    :param board: The position to search; it is restored before returning.
+    :param depth: Number of plies to expand.
+    :return: The number of leaf nodes.
+    """
+    moves = board.generate_legal()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def divide(board, depth):
+    """
+    Runs perft below each root move separately.
+    :return: A dict of UCI move -> leaf node count, useful to locate a move generation bug.
+    """
+    counts = {}
+    for move in board.generate_legal():
+        board.make_move(move)
+        counts[move.uci()] = perft(board, depth - 1)
+        board.unmake_move()
+    return counts
+
+
+def rule_mismatches(board, depth, path=()):
+    """
+    Cross-checks the per-piece rule code (Piece.is_move_valid) against the move generator on every
+    position of the tree: each pseudo-legal move must be accepted, and every accepted move must be generated.
+    :return: A list of (move path, description) tuples, empty when both agree.
+    """
+    mismatches = []
+    generated = {(move.from_index, move.to_index) for move in board.generate_pseudo_legal() if not move.is_castle}
+    for source, piece in enumerate(board.piece_at(index) for index in range(len(SQUARES))):
+        if piece is None or piece.color != board.turn:
+            continue
+        for target, square in enumerate(SQUARES):
+            if target == source:
+                continue
+            take = board[square] is not None or (piece.type == "pawn" and square[0] != piece.pos[0])
+            accepted = piece.is_move_valid(square, board, take)[0]
+            if accepted != ((source, target) in generated):
+                verdict = "accepted but not generated" if accepted else "generated but rejected"
+                mismatches.append((path, f"{piece.type} {SQUARES[source]} -> {square}: {verdict}"))
+
+    if depth > 1:
+        for move in board.generate_legal():
+            board.make_move(move)
+            mismatches += rule_mismatches(board, depth - 1, path + (move.uci(),))
+            board.unmake_move()
+    return mismatches
+
+
+def timed_perft(board, depth):
+    """
+    Runs perft and measures it.
+    :return: (nodes, seconds, nodes per second)
+    """
+    start = time.perf_counter()
+    nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, elapsed, nodes / elapsed if elapsed > 0 else 0.0
+
+
+def run_suite(max_nodes=1_000_000, board_class=BitboardBoard, report=print):
+    """
+    Runs every reference position up to the deepest depth whose expected count is at most `max_nodes`.
+    :return: A list of (name, depth, expected, actual) tuples for the mismatching runs.
+    """
+    failures = []
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected_counts in REFERENCE_POSITIONS:
+        for depth, expected in sorted(expected_counts.items()):
+            if expected > max_nodes:
+                break
+            nodes, elapsed, nps = timed_perft(board_class.from_fen(fen), depth)
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected else f"FAIL (expected {expected})"
+            report(f"{name:<12} depth {depth}: {nodes:>10} nodes  {elapsed:8.3f}s  {nps:10.0f} nps  {status}")
+            if nodes != expected:
+                failures.append((name, depth, expected, nodes))
+    if total_time:
+        report(f"total: {total_nodes} nodes in {total_time:.3f}s ({total_nodes / total_time:.0f} nps)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes (perft).")
+    parser.add_argument("--fen", default=START_FEN, help="Position to search (default: start position).")
+    parser.add_argument("--depth", type=int, default=3, help="Search depth in plies.")
+    parser.add_argument("--divide", action="store_true", help="Print the node count below each root move.")
+    parser.add_argument("--suite", action="store_true", help="Run the bundled reference positions.")
+    parser.add_argument("--max-nodes", type=int, default=1_000_000,
+                        help="With --suite, skip runs expected to exceed this many nodes.")
+    parser.add_argument("--rules", action="store_true",
+                        help="Cross-check Piece.is_move_valid against the move generator instead of counting.")
+    parser.add_argument("--list-board", action="store_true",
+                        help="Use the list-of-lists Board instead of BitboardBoard.")
+    args = parser.parse_args(argv)
+    board_class = Board if args.list_board else BitboardBoard
+
+    if args.suite:
+        failures = run_suite(args.max_nodes, board_class)
+        return 1 if failures else 0
+
+    board = board_class.from_fen(args.fen)
+    if args.rules:
+        mismatches = rule_mismatches(board, args.depth)
+        for path, description in mismatches:
+            print(f"{' '.join(path) or '(root)'}: {description}")
+        print(f"{len(mismatches)} mismatches")
+        return 1 if mismatches else 0
+
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(board, args.depth)
+        for move, count in sorted(counts.items()):
+            print(f"{move}: {count}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, args.depth)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+    print(f"depth {args.depth}: {nodes} nodes in {elapsed:.3f}s ({nps:.0f} nps)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""
+Streaming PGN reader.
+
+The file is memory-mapped and split into games on the fly, so memory use does not depend on the size of
+the archive. Each game's movetext is tokenised and replayed through moving_logic.evaluate_move on a fresh
+board; the first move that does not replay is reported with its ply number.
+"""
+import mmap
+import re
+
+from src.bitboard import BitboardBoard
+from src.moving_logic import evaluate_move
+
+# A blank line followed by a tag pair starts a new game
+GAME_BOUNDARY_RE = re.compile(rb"\r?\n[ \t\r]*\n(?=\[)")
+TAG_RE = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]', re.MULTILINE)
+TOKEN_RE = re.compile(r"""
+    (?P<comment>\{[^}]*\}|;[^\n]*)
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<result>1-0|0-1|1/2-1/2|\*)
+  | (?P<number>\d+\.+)
+  | (?P<nag>\$\d+|[!?]+)
+  | (?P<move>[^\s(){};$!?]+)
+""", re.VERBOSE)
+
+
+class GameResult:
+    """
+    Outcome of replaying one game of a PGN file.
+    """
+    def __init__(self, number, offset, headers, moves, result, plies, error=None, error_ply=None,
+                 final_fen=None) -> None:
+        self.number = number  # Position of the game in the file, starting at 0
+        self.offset = offset  # Byte offset of the game in the file
+        self.headers = headers
+        self.moves = moves  # The SAN moves of the main line
+        self.result = result  # Game termination marker ('1-0', '0-1', '1/2-1/2', '*') or None
+        self.plies = plies  # Number of moves replayed successfully
+        self.error = error
+        self.error_ply = error_ply  # 1-based ply of the first move that failed to replay
+        self.final_fen = final_fen
+
+    @property
+    def valid(self):
+        return self.error is None
+
+    @property
+    def error_move(self):
+        return self.moves[self.error_ply - 1] if self.error_ply else None
+
+    def __str__(self) -> str:
+        if self.valid:
+            return f"game {self.number}: {self.plies} plies ok"
+        return f"game {self.number}: ply {self.error_ply} ({self.error_move}): {self.error}"
+
+
+def iter_game_spans(buffer, start=0, end=None):
+    """
+    Yields the (start, end) byte span of every game in a PGN buffer (bytes or mmap) without copying it.
+    :param start: Offset to start scanning from; it should be the start of a game.
+    :param end: Offset to stop at (defaults to the end of the buffer).
+    """
+    end = len(buffer) if end is None else end
+    game_start = start
+    for boundary in GAME_BOUNDARY_RE.finditer(buffer, start, end):
+        if buffer[game_start:boundary.start()].strip():
+            yield game_start, boundary.start()
+        game_start = boundary.end()
+    if buffer[game_start:end].strip():
+        yield game_start, end
+
+
+def parse_game(text):
+    """
+    Splits the text of one game into its tag pairs, main-line moves and result.
+    Comments, NAGs, move numbers and variations are dropped.
+    :return: (headers dict, list of SAN moves, result marker or None)
+    """
+    headers = dict(TAG_RE.findall(text))
+    movetext_start = 0
+    for match in TAG_RE.finditer(text):
+        movetext_start = match.end()
+
+    moves = []
+    result = None
+    depth = 0
+    for token in TOKEN_RE.finditer(text, movetext_start):
+        kind = token.lastgroup
+        if kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth = max(0, depth - 1)
+        elif depth:
+            continue  # Inside a variation
+        elif kind == "move":
+            moves.append(token.group().replace("0-0", "O-O"))
+        elif kind == "result":
+            result = token.group()
+    return headers, moves, result
+
+
+def replay(moves, board):
+    """
+    Plays SAN moves on a board through evaluate_move, alternating colors from the side to move.
+    :return: (plies played, error message or None, 1-based ply of the failing move or None)
+    """
+    for ply, move in enumerate(moves, start=1):
+        success, message = evaluate_move(board, move, board.turn)
+        if not success:
+            return ply - 1, message, ply
+    return len(moves), None, None
+
+
+def replay_game(text, number=0, offset=0, board_class=BitboardBoard):
+    """
+    Parses and replays the text of one game.
+    :return: GameResult
+    """
+    headers, moves, result = parse_game(text)
+    try:
+        board = board_class.from_fen(headers["FEN"]) if "FEN" in headers else board_class()
+    except ValueError as error:
+        return GameResult(number, offset, headers, moves, result, 0, str(error), 0)
+    plies, error, error_ply = replay(moves, board)
+    return GameResult(number, offset, headers, moves, result, plies, error, error_ply, board.to_fen())
+
+
+def read_games(path, board_class=BitboardBoard, start=0, end=None, first_number=0):
+    """
+    Streams the games of a PGN file, replaying each one.
+    :param path: PGN file to read. It is memory-mapped, so its size does not affect memory use.
+    :param start: Byte offset to start at (the start of a game), for reading a slice of the file.
+    :param end: Byte offset to stop at.
+    :param first_number: Number given to the first game read.
+    :return: A generator of GameResult, in file order.
+    """
+    with open(path, "rb") as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # Empty file: nothing to map
+        with buffer:
+            for number, (game_start, game_end) in enumerate(iter_game_spans(buffer, start, end), first_number):
+                text = buffer[game_start:game_end].decode("utf-8", "replace")
+                yield replay_game(text, number, game_start, board_class)
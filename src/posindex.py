@@ -0,0 +1,322 @@
+"""
+Position index over a game database.
+
+Every position of every game (after each ply, starting position included) is keyed by its Zobrist hash, which
+covers the pieces, side to move, castling rights and, when a capture is possible, the en passant file, so
+transposed move orders and FEN queries find the same positions. The index maps keys to (game id, ply) and is
+stored as segment files in a directory, each one three sorted columns:
+
+    preamble   magic, version, entry count, first game and number of games covered
+    keys       uint64[entries], sorted
+    games      uint32[entries]
+    plies      uint16[entries]
+
+Segments are memory-mapped and searched with a binary search on the key column, so a lookup reads a few
+pages per segment whatever the size of the archive. Indexing more games writes new segments next to the old
+ones; compact() merges them back into one. Segments of an older version (built with another key scheme) are
+discarded when the index is opened, and the next update() indexes the games again. Keys are 64-bit hashes, so
+in theory a hit can be a different position with the same key; replaying the game to the ply tells them apart.
+
+Usage:
+    python -m src.posindex games.chdb --index games.idx --workers 8     # build, or index the new games
+    python -m src.posindex games.chdb --index games.idx --moves e4 c5 Nf3
+    python -m src.posindex games.chdb --index games.idx --fen "<FEN>"
+"""
+import argparse
+import heapq
+import mmap
+import multiprocessing
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from src.bitboard import BitboardBoard
+from src.gamedb import GameDatabase
+from src.legality import Position
+from src.movegen import Move
+
+MAGIC = b"CHPI"
+VERSION = 2  # 2: en passant file hashed only when a capture is possible
+PREAMBLE = struct.Struct("<4sHHQQQ")  # Magic, version, reserved, entries, first game, games
+SEGMENT_GAMES = 20000  # Games per segment written by a build; a segment is sorted in memory
+SEGMENT_SUFFIX = ".seg"
+MAX_PLY = 0xFFFF
+
+
+def _padding(offset):
+    return -offset % 8
+
+
+def index_games(database_path, first, last):
+    """
+    Replays games [first, last) of a database and collects the key of every position. Runs in a pool process.
+    :return: Sorted list of entries packed as key << 48 | game << 16 | ply.
+    """
+    entries = []
+    with GameDatabase(database_path) as database:
+        for game in range(first, last):
+            board = database.start_board(game)
+            entries.append(board.zobrist << 48 | game << 16)
+            for ply, code in enumerate(database.codes(game)[:MAX_PLY], 1):
+                board.make_move(Move.decode(code))
+                entries.append(board.zobrist << 48 | game << 16 | ply)
+    # Packing into one int sorts by key, then game, then ply with a single comparison per pair
+    entries.sort()
+    return entries
+
+
+def write_segment(path, entries, first_game, games, chunk=65536):
+    """
+    Writes sorted packed entries (any iterable) as a segment, `chunk` entries at a time: keys go straight to
+    the file, the other two columns to temporary files appended at the end. The file appears under its name
+    only once complete.
+    """
+    temporary = path + ".tmp"
+    entries = iter(entries)
+    count = 0
+    with open(temporary, "wb") as file, tempfile.TemporaryFile() as ids, tempfile.TemporaryFile() as plies:
+        file.write(bytes(PREAMBLE.size))
+        while True:
+            block = list(islice(entries, chunk))
+            if not block:
+                break
+            count += len(block)
+            file.write(array("Q", [entry >> 48 for entry in block]).tobytes())
+            ids.write(array("I", [entry >> 16 & 0xFFFFFFFF for entry in block]).tobytes())
+            plies.write(array("H", [entry & 0xFFFF for entry in block]).tobytes())
+        for column in (ids, plies):
+            column.seek(0)
+            shutil.copyfileobj(column, file)
+            file.write(bytes(_padding(file.tell())))
+        file.seek(0)
+        file.write(PREAMBLE.pack(MAGIC, VERSION, 0, count, first_game, games))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class Segment:
+    """
+    One memory-mapped segment file.
+    """
+    def __init__(self, path) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, _, entries, self.first_game, self.games = PREAMBLE.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} position index segment")
+        self._view = view
+        offset = PREAMBLE.size
+        self.keys = view[offset:offset + 8 * entries].cast("Q")
+        offset += 8 * entries
+        self.ids = view[offset:offset + 4 * entries].cast("I")
+        offset += 4 * entries + _padding(4 * entries)
+        self.plies = view[offset:offset + 2 * entries].cast("H")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, key):
+        low = bisect_left(self.keys, key)
+        high = bisect_right(self.keys, key, low)
+        return [(self.ids[index], self.plies[index]) for index in range(low, high)]
+
+    def entries(self):
+        """
+        The segment's entries, packed and sorted as index_games returns them.
+        """
+        for key, game, ply in zip(self.keys, self.ids, self.plies):
+            yield key << 48 | game << 16 | ply
+
+    def close(self):
+        for view in (self.keys, self.ids, self.plies, self._view):
+            view.release()
+        self._mmap.close()
+
+
+class PositionIndex:
+    """
+    The segments of an index directory, queried together.
+    """
+    def __init__(self, directory) -> None:
+        _check_byte_order()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                 if name.endswith(SEGMENT_SUFFIX)]
+        if any(_is_outdated(path) for path in paths):
+            # Keys from another scheme cannot be mixed with new ones: start over from game 0
+            for path in paths:
+                os.remove(path)
+            paths = []
+        self.segments = [Segment(path) for path in paths]
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    @property
+    def games_indexed(self):
+        """
+        Games [0, games_indexed) of the database are in the index.
+        """
+        return max((segment.first_game + segment.games for segment in self.segments), default=0)
+
+    def lookup(self, key):
+        """
+        :return: (game id, ply) of every indexed position with this Zobrist key, by game then ply.
+        """
+        hits = []
+        for segment in self.segments:
+            hits.extend(segment.lookup(key))
+        return sorted(hits)
+
+    def find(self, board):
+        return self.lookup(board.zobrist)
+
+    def update(self, database_path, workers=None, segment_games=SEGMENT_GAMES):
+        """
+        Indexes the games of the database that are not indexed yet, in parallel, one new segment per
+        `segment_games` games. Game ids are database positions, so the database may only grow at the end
+        (e.g. rebuilt from a PGN archive that was appended to).
+        :return: Number of games added.
+        """
+        with GameDatabase(database_path) as database:
+            total = len(database)
+        first = self.games_indexed
+        tasks = [(database_path, start, min(start + segment_games, total))
+                 for start in range(first, total, segment_games)]
+        workers = workers or multiprocessing.cpu_count()
+        if workers == 1 or len(tasks) <= 1:
+            outcomes = (index_games(*task) for task in tasks)
+            self._write_segments(tasks, outcomes)
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                self._write_segments(tasks, pool.imap(_index_task, tasks))
+        return total - first
+
+    def _write_segments(self, tasks, outcomes):
+        for (_, start, end), entries in zip(tasks, outcomes):
+            path = os.path.join(self.directory, f"{start:010d}-{end:010d}{SEGMENT_SUFFIX}")
+            write_segment(path, entries, start, end - start)
+            self.segments.append(Segment(path))
+
+    def compact(self):
+        """
+        Merges all segments into one, streaming them through a k-way merge. The old segments are removed
+        only once the merged one is written.
+        """
+        if len(self.segments) <= 1:
+            return
+        first = min(segment.first_game for segment in self.segments)
+        games = self.games_indexed - first
+        path = os.path.join(self.directory, f"{first:010d}-{first + games:010d}{SEGMENT_SUFFIX}")
+        write_segment(path, heapq.merge(*(segment.entries() for segment in self.segments)), first, games)
+        for segment in self.segments:
+            segment.close()
+            if segment.path != path:
+                os.remove(segment.path)
+        self.segments = [Segment(path)]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _index_task(task):
+    return index_games(*task)
+
+
+def _check_byte_order():
+    # Columns are read as native arrays, like the game database's
+    if sys.byteorder != "little":
+        raise RuntimeError("Position indexes can only be used on little-endian machines")
+
+
+def _is_outdated(path):
+    """
+    True for a segment written by an older version of the index.
+    """
+    with open(path, "rb") as file:
+        header = file.read(PREAMBLE.size)
+    if len(header) < PREAMBLE.size:
+        return False
+    magic, version = PREAMBLE.unpack(header)[:2]
+    return magic == MAGIC and version < VERSION
+
+
+def benchmark(index, database_path, samples=1000, report=print):
+    """
+    Times lookups of positions taken from random games at random plies.
+    """
+    rng = random.Random(0)
+    keys = []
+    with GameDatabase(database_path) as database:
+        for _ in range(samples):
+            game = rng.randrange(len(database))
+            board = database.start_board(game)
+            for code in database.codes(game)[:rng.randrange(database.plies(game) + 1)]:
+                board.make_move(Move.decode(code))
+            keys.append(board.zobrist)
+    start = time.perf_counter()
+    hits = sum(len(index.lookup(key)) for key in keys)
+    elapsed = time.perf_counter() - start
+    report(f"{samples} lookups in {len(index.segments)} segment(s) of {len(index)} positions: "
+           f"{elapsed / samples * 1e6:.1f} us per lookup, {hits} hits")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query a position index of a game database.")
+    parser.add_argument("database", help="Game database (see src.gamedb).")
+    parser.add_argument("--index", required=True, help="Index directory; created or brought up to date.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--compact", action="store_true", help="Merge the index segments into one.")
+    parser.add_argument("--fen", help="Find the games reaching this position.")
+    parser.add_argument("--moves", nargs="+", help="Find the games reaching the position after these moves.")
+    parser.add_argument("--benchmark", action="store_true", help="Time random lookups.")
+    args = parser.parse_args(argv)
+
+    with PositionIndex(args.index) as index:
+        start = time.perf_counter()
+        added = index.update(args.database, args.workers)
+        if added:
+            print(f"Indexed {added} games in {time.perf_counter() - start:.2f}s")
+        if args.compact:
+            start = time.perf_counter()
+            index.compact()
+            print(f"Compacted into one segment in {time.perf_counter() - start:.2f}s")
+
+        if args.fen or args.moves:
+            board = BitboardBoard.from_fen(args.fen) if args.fen else BitboardBoard()
+            position = Position(board)
+            for move in args.moves or []:
+                position.play(move)
+            hits = index.find(board)
+            games = sorted({game for game, _ in hits})
+            print(f"{board.to_fen()}: {len(hits)} occurrences in {len(games)} games")
+            for game, ply in hits[:20]:
+                print(f"  game {game}, ply {ply}")
+        if args.benchmark:
+            benchmark(index, args.database)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,196 @@
+"""
+Framed move protocol.
+
+Every message is a frame: a 9-byte header (payload length, message type, sequence number; network byte order)
+followed by a UTF-8 payload, so several messages can share one TCP segment and one message can span several.
+
+Moves, resignations and draw messages are numbered from 1 by the sender and kept until the peer acknowledges
+them. Acknowledgements are cumulative (one ACK carries the highest number received in order) and are sent
+once per batch of received data, so moves are pipelined instead of waiting a round trip each. A frame
+whose number was already received is dropped, which makes replaying unacknowledged frames after a
+reconnect safe. Clock and spectator messages are not numbered: a stale clock reading is never worth replaying.
+
+The Session class holds that state without doing any I/O, so the same code serves blocking sockets,
+threads and asyncio streams.
+"""
+import struct
+
+HEADER = struct.Struct("!IBI")  # Payload length, message type, sequence number
+MAX_PAYLOAD = 64 * 1024
+MAX_UNACKED = 1024  # Numbered messages kept for replay; a peer that acknowledges none of them is given up on
+
+# Message types
+MOVE = 1
+ACK = 2
+RESIGN = 3
+DRAW_OFFER = 4
+DRAW_ACCEPT = 5
+CLOCK = 6
+START = 7  # Sent by the game server when a match begins; payload "<color> <game id>"
+ERROR = 8  # A rejected message; payload is the reason
+JOIN = 9  # Asks the game server for an opponent
+SUBSCRIBE = 10  # Asks the game server to watch a game; payload is the game id
+SNAPSHOT = 11  # Sent to a new spectator; payload "<FEN>\n<moves so far, space separated>"
+DELTA = 12  # A move of a watched game; payload "<ply> <SAN>[ <white seconds> <black seconds>]"
+RESULT = 13  # A watched game ended; payload is the result ('1-0', '0-1' or '1/2-1/2')
+
+MESSAGE_NAMES = {MOVE: "move", ACK: "ack", RESIGN: "resign", DRAW_OFFER: "draw offer", DRAW_ACCEPT: "draw accept",
+                 CLOCK: "clock", START: "start", ERROR: "error", JOIN: "join", SUBSCRIBE: "subscribe",
+                 SNAPSHOT: "snapshot", DELTA: "delta", RESULT: "result"}
+# Spectator messages are unnumbered so one encoded frame can be written to every subscriber; a spectator that
+# loses its connection subscribes again and gets a fresh snapshot instead of a replay
+UNSEQUENCED = {ACK, CLOCK, SNAPSHOT, DELTA, RESULT}
+
+
+class ProtocolError(Exception):
+    """
+    Raised when the peer sends bytes that cannot be framed.
+    """
+
+
+class Message:
+    __slots__ = ("kind", "seq", "payload")
+
+    def __init__(self, kind, seq, payload="") -> None:
+        self.kind = kind
+        self.seq = seq
+        self.payload = payload
+
+    @property
+    def out_of_band(self):
+        """
+        True for everything that is not a move (resign, draw offers, clock sync).
+        """
+        return self.kind not in (MOVE, ACK)
+
+    def __repr__(self):
+        return f"Message({MESSAGE_NAMES.get(self.kind, self.kind)}, {self.seq}, {self.payload!r})"
+
+
+def encode_frame(kind, seq, payload=""):
+    data = payload.encode()
+    if len(data) > MAX_PAYLOAD:
+        raise ProtocolError(f"Payload of {len(data)} bytes is too large")
+    return HEADER.pack(len(data), kind, seq) + data
+
+
+def clock_payload(white_seconds, black_seconds):
+    """
+    Formats the remaining time of both players for a CLOCK message.
+    """
+    return f"{white_seconds:.3f} {black_seconds:.3f}"
+
+
+def parse_clock(payload):
+    white, black = payload.split()
+    return float(white), float(black)
+
+
+class FrameDecoder:
+    """
+    Reassembles frames from a byte stream received in arbitrary pieces.
+    """
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds received bytes and returns the Messages completed by them.
+        """
+        self._buffer += data
+        messages = []
+        offset = 0
+        while len(self._buffer) - offset >= HEADER.size:
+            length, kind, seq = HEADER.unpack_from(self._buffer, offset)
+            if length > MAX_PAYLOAD or kind not in MESSAGE_NAMES:
+                raise ProtocolError(f"Malformed frame header (length {length}, type {kind})")
+            end = offset + HEADER.size + length
+            if end > len(self._buffer):
+                break
+            try:
+                payload = self._buffer[offset + HEADER.size:end].decode()
+            except UnicodeDecodeError as error:
+                raise ProtocolError(f"Payload is not valid UTF-8 ({error.reason})") from error
+            messages.append(Message(kind, seq, payload))
+            offset = end
+        del self._buffer[:offset]
+        return messages
+
+
+class Session:
+    """
+    Sequencing and acknowledgement state of one side of a connection.
+    """
+    def __init__(self) -> None:
+        self.next_seq = 1
+        self.received = 0  # Highest sequence number received in order
+        self.unacked = {}  # Sequence number -> frame bytes, in sending order
+        self.decoder = FrameDecoder()
+
+    def message(self, kind, payload=""):
+        """
+        Frames an outgoing message, numbering and keeping it for replay unless it is unsequenced.
+        :return: The bytes to write.
+        :raises ProtocolError: If MAX_UNACKED messages are already waiting for the peer's acknowledgement.
+        """
+        if kind in UNSEQUENCED:
+            return encode_frame(kind, 0, payload)
+        if len(self.unacked) >= MAX_UNACKED:
+            raise ProtocolError(f"The peer has not acknowledged {len(self.unacked)} messages")
+        frame = encode_frame(kind, self.next_seq, payload)
+        self.unacked[self.next_seq] = frame
+        self.next_seq += 1
+        return frame
+
+    def move(self, move):
+        return self.message(MOVE, move)
+
+    def receive(self, data):
+        """
+        Processes received bytes.
+        :return: (new Messages in order, bytes to write back: a cumulative ACK, or b"" if none is due)
+        """
+        delivered = []
+        must_ack = False
+        for message in self.decoder.feed(data):
+            if message.kind == ACK:
+                for seq in [seq for seq in self.unacked if seq <= message.seq]:
+                    del self.unacked[seq]
+            elif message.kind in UNSEQUENCED:
+                delivered.append(message)
+            else:
+                must_ack = True
+                if message.seq == self.received + 1:
+                    self.received = message.seq
+                    delivered.append(message)
+                # Anything else is a replayed duplicate (or a gap the sender will fill by replaying)
+        reply = encode_frame(ACK, self.received) if must_ack else b""
+        return delivered, reply
+
+    def pending(self):
+        """
+        Frames the peer has not acknowledged yet, to be written again after reconnecting.
+        """
+        return b"".join(self.unacked.values())
+
+    def reconnect(self):
+        """
+        Carries the session over to a new connection after the old one dropped: a frame cut off by the drop is
+        discarded, and the unacknowledged frames are returned to be written before anything else.
+        """
+        self.decoder = FrameDecoder()
+        return self.pending()
+
+
+def receive_messages(sock, session, size=4096):
+    """
+    Blocking helper for plain sockets: reads once, acknowledges, and returns the new messages.
+    :raises ConnectionError: If the peer closed the connection.
+    """
+    data = sock.recv(size)
+    if not data:
+        raise ConnectionError("Connection closed by peer")
+    messages, reply = session.receive(data)
+    if reply:
+        sock.sendall(reply)
+    return messages
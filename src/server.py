@@ -1,5 +1,6 @@
 import socket
 import time
+from src.protocol import Session, MOVE, MESSAGE_NAMES, receive_messages
 
 # Configuration
 HOST = '0.0.0.0'  # Listen on all available interfaces
@@ -14,24 +15,22 @@ print("Waiting for a connection...")
 conn, addr = server_socket.accept()
 print(f"Connected by {addr}")
 
-def send_move(move, retries=3, timeout=1):
-    for attempt in range(retries):
-        try:
-            conn.sendall(move.encode())
-            conn.settimeout(timeout)
-            ack = conn.recv(1024).decode()
-            if ack == 'ACK':
-                print("Move confirmed by opponent.")
-                return True
-        except socket.timeout:
-            print(f"Timeout, retrying ({attempt + 1}/{retries})...")
-    print("Move not confirmed. Connection issue.")
-    return False
+session = Session()
+inbox = []  # Moves received but not read yet: several can arrive in one segment
+
+def send_move(move):
+    # Pipelined: the acknowledgement is processed whenever data is next read
+    conn.sendall(session.move(move))
+    return True
 
 def receive_move():
-    move = conn.recv(1024).decode()
-    conn.sendall("ACK".encode())  # Send confirmation
-    return move
+    while not inbox:
+        for message in receive_messages(conn, session):
+            if message.kind == MOVE:
+                inbox.append(message.payload)
+            else:
+                print(f"Received {MESSAGE_NAMES[message.kind]} {message.payload}".rstrip())
+    return inbox.pop(0)
 
 try:
     while True:
@@ -0,0 +1,33 @@
+from src.constants import board_size, letters
+
+# Square indices run rank by rank from a1 (0) to h8 (63), matching Board's row/col layout
+SQUARES = [(letters[index % board_size], index // board_size + 1) for index in range(board_size * board_size)]
+SQUARE_INDEX = {square: index for index, square in enumerate(SQUARES)}
+SQUARE_NAMES = [f"{file}{rank}" for file, rank in SQUARES]  # 'a1' ... 'h8'
+
+COLORS = ["w", "b"]
+PIECE_TYPES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+
+
+def opponent(color):
+    """
+    Returns the color of the other side.
+    """
+    return "b" if color == "w" else "w"
+
+
+def iter_bits(mask):
+    """
+    Yields the square indices of the set bits in a mask, lowest first.
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def mask_to_squares(mask):
+    """
+    Converts a mask into a list of squares in chess notation, e.g. [('e', 4), ('d', 5)].
+    """
+    return [SQUARES[index] for index in iter_bits(mask)]
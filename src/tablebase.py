@@ -0,0 +1,777 @@
+"""
+Endgame tablebases for three and four pieces.
+
+A table covers one material balance (e.g. KQvK, KRvKN, KPvKP) and stores one byte per position:
+0 for a draw, 1-127 for a win of the side to move with mate in that many moves, 128 + n for a loss with
+mate in n moves (128 is checkmate), and 255 for impossible positions. Positions are indexed by the squares of
+the pieces in a fixed order (white king, white pieces, black king, black pieces) plus the side to move.
+Symmetry reduces the tables: without pawns the white king is mapped into the a1-d1-d4 triangle (8 board
+symmetries), with pawns into files a-d (left-right mirror only), and pawns only take the 48 squares of
+ranks 2-7. Tables are stored with the stronger side as white; the other orientation is probed by mirroring
+the board and swapping colors. En passant and castling are not part of tablebase positions.
+
+Generation is retrograde analysis. A first pass generates the moves of every position once: checkmates and
+stalemates are resolved, captures and promotions are looked up in the smaller tables built before, and the
+remaining moves are counted. Then, ply by ply, every position resolved at the current distance walks its
+predecessors (un-moves of the other side): a predecessor of a loss is a win one ply further, and a
+predecessor whose moves all lead to wins for the opponent is a loss. Both passes run in worker processes
+over slices of the table; the main process only updates the counters. What is never resolved is a draw.
+
+Usage:
+    python -m src.tablebase --pieces 3 --directory tables --workers 4
+    python -m src.tablebase KQvKR --directory tables
+    python -m src.tablebase --pieces 3 --directory tables --benchmark --workers 1 2 4
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import time
+from array import array
+from itertools import combinations_with_replacement
+
+from src.attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks
+from src.squares import iter_bits
+
+MAGIC = b"CHTB"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHHQ")  # Magic, version, piece count, positions
+
+DRAW = 0
+LOSS = 128  # Byte of a checkmated position; 128 + n is mated in n moves
+INVALID = 255
+MAX_MOVES = 126  # Distances are capped so they fit in the byte
+
+# Piece types other than kings, strongest first, with the letters used in table names
+PIECE_ORDER = ["queen", "rook", "bishop", "knight", "pawn"]
+PIECE_LETTERS = {"queen": "Q", "rook": "R", "bishop": "B", "knight": "N", "pawn": "P"}
+LETTER_PIECES = {letter: piece_type for piece_type, letter in PIECE_LETTERS.items()}
+PIECE_VALUES = {"queen": 9, "rook": 5, "bishop": 3, "knight": 3, "pawn": 1}
+PROMOTIONS = ["queen", "rook", "bishop", "knight"]
+COLORS = ["w", "b"]
+
+# Generation-time state of a position
+UNRESOLVED, WON, LOST, DRAWN, IMPOSSIBLE, DUPLICATE = range(6)
+INIT_CHUNK = 4096
+PREDECESSOR_CHUNK = 2048
+
+
+def _transform(square, flip_file, flip_rank, swap):
+    file, rank = square % 8, square // 8
+    if flip_file:
+        file = 7 - file
+    if flip_rank:
+        rank = 7 - rank
+    if swap:
+        file, rank = rank, file
+    return rank * 8 + file
+
+
+# The 8 symmetries of the board as square maps; 0 is the identity and 4 the left-right mirror
+SYMMETRIES = [[_transform(square, flip_file, flip_rank, swap) for square in range(64)]
+              for flip_file in (0, 1) for flip_rank in (0, 1) for swap in (0, 1)]
+MIRROR = 4
+TRIANGLE = [square for square in range(64) if square % 8 <= 3 and square // 8 <= square % 8]
+HALF_BOARD = [square for square in range(64) if square % 8 <= 3]
+
+
+def _king_symmetries(region, symmetries):
+    """
+    For every square, the symmetries that bring a king standing there into `region`.
+    """
+    region = set(region)
+    return [[symmetry for symmetry in symmetries if SYMMETRIES[symmetry][square] in region] for square in range(64)]
+
+
+PAWNLESS_SYMMETRIES = _king_symmetries(TRIANGLE, range(8))
+PAWN_SYMMETRIES = _king_symmetries(HALF_BOARD, (0, MIRROR))
+
+
+def _strength(piece_types):
+    return sum(PIECE_VALUES[piece_type] for piece_type in piece_types), [-PIECE_ORDER.index(t) for t in piece_types]
+
+
+class Material:
+    """
+    A material balance and the position indexing of its table.
+    """
+    def __init__(self, white, black) -> None:
+        """
+        :param white: Piece types of white besides the king, e.g. ['queen'].
+        :param black: Piece types of black besides the king.
+        """
+        self.white = sorted(white, key=PIECE_ORDER.index)
+        self.black = sorted(black, key=PIECE_ORDER.index)
+        self.name = ("K" + "".join(PIECE_LETTERS[t] for t in self.white) + "vK"
+                     + "".join(PIECE_LETTERS[t] for t in self.black))
+        # Pieces in index order: (color, type)
+        self.pieces = ([("w", "king")] + [("w", t) for t in self.white]
+                       + [("b", "king")] + [("b", t) for t in self.black])
+        self.colors = [0 if color == "w" else 1 for color, _ in self.pieces]
+        self.types = [piece_type for _, piece_type in self.pieces]
+        self.has_pawns = "pawn" in self.types
+        self.king_squares = HALF_BOARD if self.has_pawns else TRIANGLE
+        self.king_symmetries = PAWN_SYMMETRIES if self.has_pawns else PAWNLESS_SYMMETRIES
+        self.king_slots = [None] * 64
+        for slot, square in enumerate(self.king_squares):
+            self.king_slots[square] = slot
+        # Pawns only use ranks 2-7: their slot is square - 8 out of 48
+        self.offsets = [8 if piece_type == "pawn" else 0 for piece_type in self.types]
+        self.radices = [len(self.king_squares)] + [48 if t == "pawn" else 64 for t in self.types[1:]]
+        self.half = 1
+        for radix in self.radices:
+            self.half *= radix
+        self.size = 2 * self.half
+
+    @classmethod
+    def from_name(cls, name):
+        """
+        Parses a name like 'KQvKR'.
+        """
+        try:
+            white, black = name.upper().split("V")
+            if not (white.startswith("K") and black.startswith("K")):
+                raise ValueError
+            return cls([LETTER_PIECES[letter] for letter in white[1:]], [LETTER_PIECES[letter] for letter in black[1:]])
+        except (ValueError, KeyError):
+            raise ValueError(f"Invalid material name: {name!r}") from None
+
+    @staticmethod
+    def normalize(white, black):
+        """
+        :return: (Material with the stronger side as white, True if the colors had to be swapped)
+        """
+        if _strength(black) > _strength(white):
+            return Material(black, white), True
+        return Material(white, black), False
+
+    def __len__(self):
+        return len(self.pieces)
+
+    def index(self, squares, side):
+        index = self.king_slots[squares[0]]
+        for square, offset, radix in zip(squares[1:], self.offsets[1:], self.radices[1:]):
+            index = index * radix + square - offset
+        return side * self.half + index
+
+    def decode(self, index):
+        """
+        :return: (list of squares in piece order, side to move)
+        """
+        side, index = divmod(index, self.half)
+        squares = []
+        for offset, radix in zip(reversed(self.offsets[1:]), reversed(self.radices[1:])):
+            index, slot = divmod(index, radix)
+            squares.append(slot + offset)
+        squares.append(self.king_squares[index])
+        squares.reverse()
+        return squares, side
+
+    def canonical_index(self, squares, side):
+        """
+        The smallest index among the symmetric images of a position whose white king lands in the reduced region.
+        """
+        best = None
+        for symmetry in self.king_symmetries[squares[0]]:
+            table = SYMMETRIES[symmetry]
+            index = self.index([table[square] for square in squares], side)
+            if best is None or index < best:
+                best = index
+        return best
+
+    def dependencies(self):
+        """
+        Names of the tables reached by captures and promotions (bare kings are left out).
+        """
+        names = set()
+        sides = [self.white, self.black]
+        for mover in (0, 1):
+            own, other = sides[mover], sides[1 - mover]
+            captures = [other[:position] + other[position + 1:] for position in range(len(other))]
+            promotions = [own[:position] + [promotion] + own[position + 1:]
+                          for position, piece_type in enumerate(own) if piece_type == "pawn" for promotion in PROMOTIONS]
+            # A capture, a promotion, or a pawn capturing and promoting in one move
+            changes = [(own, after) for after in captures] + [(after, other) for after in promotions]
+            changes += [(own_after, other_after) for own_after in promotions for other_after in captures]
+            for own_after, other_after in changes:
+                white, black = (own_after, other_after) if mover == 0 else (other_after, own_after)
+                if white or black:
+                    names.add(Material.normalize(white, black)[0].name)
+        names.discard(self.name)
+        return sorted(names)
+
+
+def all_materials(pieces):
+    """
+    Every material balance with exactly `pieces` pieces, kings included.
+    """
+    names = set()
+    extra = pieces - 2
+    for white_count in range(extra + 1):
+        for white in combinations_with_replacement(PIECE_ORDER, white_count):
+            for black in combinations_with_replacement(PIECE_ORDER, extra - white_count):
+                names.add(Material.normalize(list(white), list(black))[0].name)
+    return sorted(names)
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Move generation on bare piece lists. A position is a list of squares aligned with Material.pieces.
+
+def _attacks(piece_type, color, square, occupied):
+    if piece_type == "king":
+        return KING_ATTACKS[square]
+    if piece_type == "knight":
+        return KNIGHT_ATTACKS[square]
+    if piece_type == "pawn":
+        return PAWN_ATTACKS[COLORS[color]][square]
+    if piece_type == "rook":
+        return rook_attacks(square, occupied)
+    if piece_type == "bishop":
+        return bishop_attacks(square, occupied)
+    return rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+
+
+def _is_attacked(target, by_color, squares, types, colors, occupied):
+    bit = 1 << target
+    for square, piece_type, color in zip(squares, types, colors):
+        if color == by_color and square is not None and _attacks(piece_type, color, square, occupied) & bit:
+            return True
+    return False
+
+
+def _occupancy(squares):
+    occupied = 0
+    for square in squares:
+        if square is not None:
+            occupied |= 1 << square
+    return occupied
+
+
+def is_valid(material, squares, side):
+    """
+    True if no two pieces share a square and the side that just moved is not in check.
+    """
+    if len(set(squares)) != len(squares):
+        return False
+    king = squares[material.colors.index(1 - side)]
+    return not _is_attacked(king, side, squares, material.types, material.colors, _occupancy(squares))
+
+
+def successors(material, squares, side):
+    """
+    Yields the positions after every legal move of the side to move:
+    (True, squares) for moves that keep the material, (False, [(color, type, square), ...]) for captures and
+    promotions, which lead to another table.
+    """
+    types, colors = material.types, material.colors
+    occupied = _occupancy(squares)
+    own = 0
+    for square, color in zip(squares, colors):
+        if color == side:
+            own |= 1 << square
+    king_index = colors.index(side)
+    forward = 8 if side == 0 else -8
+
+    for mover, (square, piece_type, color) in enumerate(zip(squares, types, colors)):
+        if color != side:
+            continue
+        if piece_type == "pawn":
+            targets = []
+            one = square + forward
+            if not occupied >> one & 1:
+                targets.append(one)
+                two = one + forward
+                if (8 <= square < 16 if side == 0 else 48 <= square < 56) and not occupied >> two & 1:
+                    targets.append(two)
+            targets += [target for target in iter_bits(PAWN_ATTACKS[COLORS[color]][square] & occupied & ~own)]
+        else:
+            targets = iter_bits(_attacks(piece_type, color, square, occupied) & ~own)
+
+        for target in targets:
+            captured = squares.index(target) if occupied >> target & 1 else None
+            after = list(squares)
+            after[mover] = target
+            if captured is not None:
+                after[captured] = None
+            moved_occupied = (occupied & ~(1 << square)) | 1 << target
+            if _is_attacked(after[king_index], 1 - side, after, types, colors, moved_occupied):
+                continue
+            promotes = piece_type == "pawn" and (target >= 56 or target < 8)
+            if captured is None and not promotes:
+                yield True, after
+                continue
+            pieces = [(COLORS[c], t, s) for s, t, c in zip(after, types, colors) if s is not None]
+            if not promotes:
+                yield False, pieces
+                continue
+            for promotion in PROMOTIONS:
+                yield False, [(c, promotion if s == target else t, s) for c, t, s in pieces]
+
+
+def predecessors(material, squares, side):
+    """
+    Yields the positions (as square lists, the other side to move) from which the last move could have been
+    a non-capturing, non-promoting move reaching this one.
+    """
+    types, colors = material.types, material.colors
+    mover_side = 1 - side
+    occupied = _occupancy(squares)
+    backward = -8 if mover_side == 0 else 8
+    king = squares[colors.index(side)]
+
+    for mover, (square, piece_type, color) in enumerate(zip(squares, types, colors)):
+        if color != mover_side:
+            continue
+        if piece_type == "pawn":
+            origins = []
+            one = square + backward
+            if 8 <= one < 56 and not occupied >> one & 1:
+                origins.append(one)
+                two = one + backward
+                if (24 <= square < 32 if mover_side == 0 else 32 <= square < 40) and not occupied >> two & 1:
+                    origins.append(two)
+        else:
+            origins = iter_bits(_attacks(piece_type, color, square, occupied) & ~occupied)
+        for origin in origins:
+            before = list(squares)
+            before[mover] = origin
+            before_occupied = (occupied & ~(1 << square)) | 1 << origin
+            # The side now to move must not have been in check while the other side was to move
+            if not _is_attacked(king, mover_side, before, types, colors, before_occupied):
+                yield before
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Probing
+
+class TablebaseResult:
+    def __init__(self, value) -> None:
+        self.value = value  # The stored byte
+
+    @property
+    def wdl(self):
+        """
+        1 if the side to move wins, 0 for a draw, -1 if it loses.
+        """
+        if self.value == DRAW:
+            return 0
+        return 1 if self.value < LOSS else -1
+
+    @property
+    def moves_to_mate(self):
+        """
+        Moves until mate (by either side), or None for a draw.
+        """
+        if self.value == DRAW:
+            return None
+        return self.value if self.value < LOSS else self.value - LOSS
+
+    def __repr__(self):
+        if self.value == DRAW:
+            return "TablebaseResult(draw)"
+        return f"TablebaseResult({'win' if self.wdl > 0 else 'loss'} in {self.moves_to_mate})"
+
+
+def _to_plies(value):
+    # Win in n moves is 2n - 1 plies, loss in n moves 2n plies
+    return 2 * value - 1 if value < LOSS else 2 * (value - LOSS)
+
+
+def _to_value(won, plies):
+    if won:
+        return min((plies + 1) // 2, MAX_MOVES)
+    return LOSS + min(plies // 2, MAX_MOVES)
+
+
+class Tablebase:
+    """
+    The tables of a directory, memory-mapped on first use.
+    """
+    def __init__(self, directory) -> None:
+        self.directory = directory
+        self._tables = {}  # Name -> mmap, or None if the file does not exist
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.tb")
+
+    def table(self, name):
+        if name not in self._tables:
+            path = self.path(name)
+            table = None
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, _, _ = PREAMBLE.unpack_from(table)
+                if magic != MAGIC or version != VERSION:
+                    table.close()
+                    raise ValueError(f"{path} is not a version {VERSION} tablebase")
+            self._tables[name] = table
+        return self._tables[name]
+
+    def probe_value(self, pieces, side):
+        """
+        :param pieces: [(color, type, square index), ...] including both kings.
+        :param side: 0 if white is to move, 1 if black is.
+        :return: The stored byte, or None if there is no table for the material.
+        """
+        white = [t for color, t, _ in pieces if color == "w" and t != "king"]
+        black = [t for color, t, _ in pieces if color == "b" and t != "king"]
+        if not white and not black:
+            return DRAW
+        material, swapped = Material.normalize(white, black)
+        table = self.table(material.name)
+        if table is None:
+            return None
+        if swapped:
+            pieces = [("b" if color == "w" else "w", t, square ^ 56) for color, t, square in pieces]
+            side = 1 - side
+        # Lay the squares out in the table's piece order; identical pieces can come in either order
+        remaining = list(pieces)
+        squares = []
+        for color, piece_type in material.pieces:
+            for position, (other_color, other_type, square) in enumerate(remaining):
+                if other_color == color and other_type == piece_type:
+                    squares.append(square)
+                    del remaining[position]
+                    break
+        symmetry = SYMMETRIES[material.king_symmetries[squares[0]][0]]
+        return table[PREAMBLE.size + material.index([symmetry[square] for square in squares], side)]
+
+    def probe(self, board):
+        """
+        Looks up a board position.
+        :return: TablebaseResult, or None if the material is not covered or castling is still possible.
+        """
+        if board.castling_rights():
+            return None
+        bitboards, _ = board.masks()
+        pieces = [(color, piece_type, square) for (color, piece_type), mask in bitboards.items()
+                  for square in iter_bits(mask)]
+        value = self.probe_value(pieces, 0 if board.turn == "w" else 1)
+        if value is None or value == INVALID:
+            return None
+        return TablebaseResult(value)
+
+    def best_move(self, board):
+        """
+        Picks the move that keeps the tablebase result: the fastest mate when winning, the slowest when losing,
+        a drawing move when drawn.
+        :return: A Move, or None if the position is not covered or has no legal move.
+        """
+        result = self.probe(board)
+        if result is None:
+            return None
+        best, best_key = None, None
+        for move in board.generate_legal():
+            board.make_move(move)
+            child = self.probe(board)
+            board.unmake_move()
+            if child is None:
+                continue
+            value = child.value
+            # Rank moves for the mover: a loss for the child is a win for us, sooner is better
+            if value == DRAW:
+                key = (1, 0)
+            elif value >= LOSS:
+                key = (2, -(value - LOSS))
+            else:
+                key = (0, value)
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+    def close(self):
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables = {}
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Generation
+
+_worker_tablebase = None
+
+
+def _worker_init(directory):
+    global _worker_tablebase
+    _worker_tablebase = Tablebase(directory)
+
+
+def _child_outcome(tablebase, pieces, side):
+    value = tablebase.probe_value(pieces, side)
+    if value is None:
+        raise FileNotFoundError(f"Missing sub-table for {pieces}")
+    return value
+
+
+def initial_pass(name, directory, start, end):
+    """
+    First pass over positions [start, end) of a table. Runs in a pool process.
+    :return: (status bytes, counters, exit wins, exit draws, exit losses, canonical index of duplicates), one
+        entry per position. Exit distances are in plies from the position; 0 means none.
+    """
+    material = Material.from_name(name)
+    tablebase = _worker_tablebase
+    count = end - start
+    status = bytearray(count)
+    counters = array("B", bytes(count))
+    exit_wins = array("H", bytes(2 * count))
+    exit_draws = bytearray(count)
+    exit_losses = array("H", bytes(2 * count))
+    duplicates = array("I", bytes(4 * count))
+    types, colors = material.types, material.colors
+
+    for offset in range(count):
+        index = start + offset
+        squares, side = material.decode(index)
+        if not is_valid(material, squares, side):
+            status[offset] = IMPOSSIBLE
+            continue
+        canonical = material.canonical_index(squares, side)
+        if canonical != index:
+            status[offset] = DUPLICATE
+            duplicates[offset] = canonical
+            continue
+        children = set()
+        moved = False
+        for internal, child in successors(material, squares, side):
+            moved = True
+            if internal:
+                children.add(material.canonical_index(child, 1 - side))
+                continue
+            value = _child_outcome(tablebase, child, 1 - side)
+            if value == DRAW:
+                exit_draws[offset] = 1
+            elif value >= LOSS:  # The opponent is lost after this move: a win for us
+                plies = _to_plies(value) + 1
+                if not exit_wins[offset] or plies < exit_wins[offset]:
+                    exit_wins[offset] = plies
+            else:
+                exit_losses[offset] = max(exit_losses[offset], _to_plies(value) + 1)
+        if not moved:
+            king = squares[colors.index(side)]
+            in_check = _is_attacked(king, 1 - side, squares, types, colors, _occupancy(squares))
+            status[offset] = LOST if in_check else DRAWN
+            continue
+        counters[offset] = len(children)
+    return status, counters, exit_wins, exit_draws, exit_losses, duplicates
+
+
+def predecessor_indices(name, indices):
+    """
+    The distinct canonical predecessors of each position. Runs in a pool process.
+    :return: List of array('I'), one per index.
+    """
+    material = Material.from_name(name)
+    result = []
+    for index in indices:
+        squares, side = material.decode(index)
+        found = {material.canonical_index(before, 1 - side) for before in predecessors(material, squares, side)}
+        result.append(array("I", found))
+    return result
+
+
+def _initial_task(task):
+    return initial_pass(*task)
+
+
+def _predecessor_task(task):
+    return predecessor_indices(*task)
+
+
+def generate_table(name, directory, workers=1, report=None):
+    """
+    Generates one table, assuming the tables it depends on exist in the directory.
+    :return: Seconds spent.
+    """
+    started = time.perf_counter()
+    material = Material.from_name(name)
+    size = material.size
+    _worker_init(directory)  # Fresh handles: tables generated since the last one must be visible
+    pool = multiprocessing.Pool(workers, _worker_init, (directory,)) if workers > 1 else None
+    run = pool.imap if pool else map
+    try:
+        status = bytearray(size)
+        plies = array("H", bytes(2 * size))
+        counters = array("B", bytes(size))
+        exit_wins = array("H", bytes(2 * size))
+        exit_draws = bytearray(size)
+        exit_losses = array("H", bytes(2 * size))
+        duplicates = {}
+        tasks = [(name, directory, start, min(start + INIT_CHUNK, size)) for start in range(0, size, INIT_CHUNK)]
+        for (_, _, start, end), columns in zip(tasks, run(_initial_task, tasks)):
+            status[start:end], counters[start:end] = columns[0], columns[1]
+            exit_wins[start:end], exit_draws[start:end], exit_losses[start:end] = columns[2:5]
+            for offset, canonical in enumerate(columns[5]):
+                if columns[0][offset] == DUPLICATE:
+                    duplicates[start + offset] = canonical
+
+        buckets = {}  # Ply -> positions resolved at that distance, still to propagate
+        exit_buckets = {}  # Ply -> positions winning through a capture or promotion at that distance
+        for index in range(size):
+            state = status[index]
+            if state == LOST:
+                buckets.setdefault(0, []).append(index)  # Checkmate
+            elif state != UNRESOLVED:
+                continue
+            elif exit_wins[index]:
+                exit_buckets.setdefault(exit_wins[index], []).append(index)
+            elif not counters[index]:
+                # Every move leaves the table
+                if exit_draws[index]:
+                    status[index] = DRAWN
+                else:
+                    status[index] = LOST
+                    plies[index] = exit_losses[index]
+                    buckets.setdefault(exit_losses[index], []).append(index)
+
+        level = 0
+        while buckets or exit_buckets:
+            for index in exit_buckets.pop(level, []):
+                if status[index] == UNRESOLVED:
+                    status[index] = WON
+                    plies[index] = level
+                    buckets.setdefault(level, []).append(index)
+            current = buckets.pop(level, [])
+            chunks = [current[start:start + PREDECESSOR_CHUNK] for start in range(0, len(current), PREDECESSOR_CHUNK)]
+            for chunk, found in zip(chunks, run(_predecessor_task, [(name, chunk) for chunk in chunks])):
+                for index, parents in zip(chunk, found):
+                    if status[index] == LOST:
+                        for parent in parents:
+                            if status[parent] == UNRESOLVED:
+                                status[parent] = WON
+                                plies[parent] = level + 1
+                                buckets.setdefault(level + 1, []).append(parent)
+                        continue
+                    for parent in parents:
+                        if status[parent] != UNRESOLVED:
+                            continue
+                        counters[parent] -= 1
+                        if counters[parent] or exit_wins[parent]:
+                            continue
+                        if exit_draws[parent]:
+                            status[parent] = DRAWN
+                        else:
+                            distance = max(level + 1, exit_losses[parent])
+                            status[parent] = LOST
+                            plies[parent] = distance
+                            buckets.setdefault(distance, []).append(parent)
+            level += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    values = bytearray(size)
+    for index in range(size):
+        state = status[index]
+        if state == WON:
+            values[index] = _to_value(True, plies[index])
+        elif state == LOST:
+            values[index] = _to_value(False, plies[index])
+        elif state == IMPOSSIBLE:
+            values[index] = INVALID
+    for index, canonical in duplicates.items():
+        values[index] = values[canonical]
+
+    path = os.path.join(directory, f"{name}.tb")
+    with open(path + ".tmp", "wb") as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, len(material), size))
+        file.write(values)
+    os.replace(path + ".tmp", path)
+    elapsed = time.perf_counter() - started
+    if report:
+        report(summary(name, values, elapsed))
+    return elapsed
+
+
+def summary(name, values, elapsed):
+    wins = sum(1 for value in values if 0 < value < LOSS)
+    losses = sum(1 for value in values if LOSS <= value < INVALID)
+    draws = values.count(DRAW)
+    longest = max((value for value in values if 0 < value < LOSS), default=0)
+    return (f"{name}: {len(values)} positions, {wins} wins, {draws} draws, {losses} losses, "
+            f"longest mate {longest} moves, {elapsed:.2f}s")
+
+
+def generate(names, directory, workers=1, report=print):
+    """
+    Generates tables and, first, the smaller tables they depend on; tables already on disk are kept.
+    :return: {name: seconds} for the tables generated.
+    """
+    os.makedirs(directory, exist_ok=True)
+    timings = {}
+
+    def build(name):
+        if name in timings or os.path.exists(os.path.join(directory, f"{name}.tb")):
+            return
+        for dependency in Material.from_name(name).dependencies():
+            build(dependency)
+        timings[name] = generate_table(name, directory, workers, report)
+
+    for name in names:
+        build(Material.from_name(name).name)
+    return timings
+
+
+def random_position(material, rng):
+    """
+    A random legal position of a material balance, as (pieces, side).
+    """
+    while True:
+        squares = [rng.randrange(8, 56) if t == "pawn" else rng.randrange(64) for t in material.types]
+        side = rng.randrange(2)
+        if is_valid(material, squares, side):
+            return [(COLORS[c], t, s) for c, t, s in zip(material.colors, material.types, squares)], side
+
+
+def benchmark_probes(tablebase, names, probes=20000, report=print):
+    rng = random.Random(0)
+    positions = []
+    for name in names:
+        material = Material.from_name(name)
+        positions += [random_position(material, rng) for _ in range(probes // len(names))]
+    start = time.perf_counter()
+    for pieces, side in positions:
+        tablebase.probe_value(pieces, side)
+    elapsed = time.perf_counter() - start
+    report(f"{len(positions)} probes: {elapsed / len(positions) * 1e6:.1f} us per probe")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis.")
+    parser.add_argument("names", nargs="*", help="Tables to generate, e.g. KQvK KRvKN.")
+    parser.add_argument("--pieces", type=int, choices=(3, 4), help="Generate every table with this many pieces.")
+    parser.add_argument("--directory", default="tablebases")
+    parser.add_argument("--workers", type=int, nargs="+", default=[multiprocessing.cpu_count()])
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Regenerate from scratch for each worker count and time probes.")
+    args = parser.parse_args(argv)
+
+    names = list(args.names)
+    if args.pieces:
+        names += [name for pieces in range(3, args.pieces + 1) for name in all_materials(pieces)]
+    if not names:
+        parser.error("give table names or --pieces")
+
+    for workers in args.workers:
+        if args.benchmark:
+            for name in os.listdir(args.directory) if os.path.isdir(args.directory) else []:
+                if name.endswith(".tb"):
+                    os.remove(os.path.join(args.directory, name))
+        start = time.perf_counter()
+        timings = generate(names, args.directory, workers)
+        if timings:
+            print(f"{len(timings)} tables with {workers} worker(s) in {time.perf_counter() - start:.2f}s")
+    if args.benchmark:
+        tablebase = Tablebase(args.directory)
+        benchmark_probes(tablebase, names)
+        tablebase.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
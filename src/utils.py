@@ -1,6 +1,7 @@
-from src.constants import board_size, font, tile_size, letters, numbers, pieces, piece_creator, inverse_pieces, margin
+from src.constants import board_size, get_font, tile_size, letters, numbers, pieces, piece_creator, inverse_pieces, margin
 
 def display(screen):
+    font = get_font()
     for col in range(board_size):
         letter = font.render(letters[col], True, 'black')  # Render in black color
         x_pos = col * tile_size + tile_size // 2
@@ -0,0 +1,172 @@
+"""
+Bulk PGN validator.
+
+The file is cut into shards at game boundaries (byte offsets found by scanning forward from evenly spaced
+points), each shard is replayed in a worker process and the reports are merged back in file order.
+Workers only import the rules code, never pygame.
+
+Usage:
+    python -m src.validate games.pgn --workers 8
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import time
+
+from src.bitboard import BitboardBoard
+from src.pgn import GAME_BOUNDARY_RE, read_games
+from src.squares import SQUARES, opponent
+
+# Shards per worker: more, smaller shards balance uneven games better at a small scheduling cost
+SHARDS_PER_WORKER = 4
+
+
+class GameReport:
+    """
+    What the validator keeps of one game: small enough to send back from a worker cheaply.
+    """
+    def __init__(self, number, offset, plies, error, error_ply, error_move, final_fen, result, result_issue) -> None:
+        self.number = number
+        self.offset = offset
+        self.plies = plies
+        self.error = error
+        self.error_ply = error_ply
+        self.error_move = error_move
+        self.final_fen = final_fen
+        self.result = result
+        self.result_issue = result_issue  # Why the recorded result contradicts the game, or None
+
+    @property
+    def legal(self):
+        return self.error is None
+
+    def __str__(self) -> str:
+        if not self.legal:
+            return f"game {self.number} (byte {self.offset}): illegal at ply {self.error_ply} ({self.error_move}): {self.error}"
+        if self.result_issue:
+            return f"game {self.number} (byte {self.offset}): {self.result_issue}"
+        return f"game {self.number}: {self.plies} plies, {self.result or '?'}, {self.final_fen}"
+
+
+def find_shards(buffer, count):
+    """
+    Splits a PGN buffer into at most `count` (start, end) byte ranges that each begin at a game boundary.
+    """
+    size = len(buffer)
+    starts = [0]
+    for part in range(1, count):
+        boundary = GAME_BOUNDARY_RE.search(buffer, max(size * part // count, starts[-1]))
+        if boundary is None:
+            break
+        if boundary.end() > starts[-1]:
+            starts.append(boundary.end())
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def result_issue(game, board_class=BitboardBoard):
+    """
+    Checks the recorded result against the tag pair and, for finished games, the final position.
+    :return: A description of the inconsistency, or None.
+    """
+    tag = game.headers.get("Result")
+    if tag and game.result and tag != game.result:
+        return f"Result tag {tag} does not match movetext result {game.result}"
+    result = game.result or tag
+    if not game.valid or result is None:
+        return None
+
+    board = board_class.from_fen(game.final_fen)
+    if board.generate_legal():
+        return None
+    color = board.turn
+    king = board.masks()[0][(color, "king")]
+    in_check = bool(king) and board.attackers_of(SQUARES[king.bit_length() - 1], opponent(color)) != 0
+    if in_check:
+        expected = "1-0" if color == "b" else "0-1"
+        if result != expected:
+            return f"Game ends in checkmate but is recorded as {result}"
+    elif result != "1/2-1/2":
+        return f"Game ends in stalemate but is recorded as {result}"
+    return None
+
+
+def validate_shard(path, start, end):
+    """
+    Replays the games of one shard. Runs in a pool process.
+    :return: List of GameReport, numbered from 0 within the shard.
+    """
+    reports = []
+    for game in read_games(path, start=start, end=end):
+        reports.append(GameReport(game.number, game.offset, game.plies, game.error, game.error_ply, game.error_move,
+                                  game.final_fen, game.result or game.headers.get("Result"), result_issue(game)))
+    return reports
+
+
+def validate(path, workers=None, shards_per_worker=SHARDS_PER_WORKER):
+    """
+    Validates every game of a PGN file in parallel.
+    :param workers: Number of processes (defaults to the number of CPUs); 1 validates in this process.
+    :return: A generator of GameReport in file order, numbered across the whole file.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            shards = find_shards(buffer, workers * shards_per_worker)
+
+    tasks = [(path, start, end) for start, end in shards]
+    number = 0
+    if workers == 1:
+        outcomes = (validate_shard(*task) for task in tasks)
+        for reports in outcomes:
+            for report in reports:
+                report.number = number
+                number += 1
+                yield report
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        # imap keeps shard order, so reports come back in file order
+        for reports in pool.imap(_validate_task, tasks):
+            for report in reports:
+                report.number = number
+                number += 1
+                yield report
+
+
+def _validate_task(task):
+    return validate_shard(*task)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay every game of a PGN file and report illegal moves.")
+    parser.add_argument("path", help="PGN file to validate.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--shards-per-worker", type=int, default=SHARDS_PER_WORKER)
+    parser.add_argument("--verbose", action="store_true", help="Print every game, not only the failing ones.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    games = plies = illegal = inconsistent = 0
+    for report in validate(args.path, args.workers, args.shards_per_worker):
+        games += 1
+        plies += report.plies
+        if not report.legal:
+            illegal += 1
+        elif report.result_issue:
+            inconsistent += 1
+        if args.verbose or not report.legal or report.result_issue:
+            print(report)
+    elapsed = time.perf_counter() - start
+
+    workers = args.workers or multiprocessing.cpu_count()
+    print(f"{games} games, {illegal} illegal, {inconsistent} with an inconsistent result")
+    print(f"{plies} plies in {elapsed:.2f}s with {workers} worker(s): "
+          f"{games / elapsed if elapsed else 0:.1f} games/s, {plies / elapsed if elapsed else 0:.0f} plies/s")
+    return 1 if illegal or inconsistent else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
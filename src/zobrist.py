@@ -0,0 +1,59 @@
+import random
+
+from src.constants import board_size, letters
+from src.squares import SQUARE_INDEX, COLORS, PIECE_TYPES
+
+# Fixed seed so hashes are stable across processes and runs (they are stored in caches and indexes)
+_random = random.Random(0x5EED_C0DE)
+
+PIECE_KEYS = {
+    (color, piece_type): [_random.getrandbits(64) for _ in range(board_size * board_size)]
+    for color in COLORS for piece_type in PIECE_TYPES
+}
+CASTLING_KEYS = {right: _random.getrandbits(64) for right in "KQkq"}
+EN_PASSANT_KEYS = {file: _random.getrandbits(64) for file in letters}
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+
+# Squares beside each square on the same rank, where a pawn could capture en passant
+ADJACENT_SQUARES = [(1 << (index - 1) if index % board_size else 0)
+                    | (1 << (index + 1) if index % board_size < board_size - 1 else 0)
+                    for index in range(board_size * board_size)]
+
+
+def castling_key(rights):
+    """
+    Returns the combined key of a castling rights string such as 'KQk'.
+    """
+    key = 0
+    for right in rights:
+        key ^= CASTLING_KEYS[right]
+    return key
+
+
+def en_passant_key(board):
+    """
+    Returns the key of the en passant file, or 0. As in Polyglot, the file only counts when a pawn of the side
+    to move stands next to the pawn that just advanced two squares, so a position has the same key whether it
+    was reached by a double push, by single pushes or loaded from a FEN with '-'.
+    """
+    square = board.last_pawn_move
+    if square is None:
+        return 0
+    if board.masks()[0][(board.turn, "pawn")] & ADJACENT_SQUARES[SQUARE_INDEX[square]]:
+        return EN_PASSANT_KEYS[square[0]]
+    return 0
+
+
+def compute_hash(board):
+    """
+    Computes the Zobrist key of a position from scratch. Board.zobrist maintains the same value incrementally.
+    """
+    key = 0
+    for index in range(board_size * board_size):
+        piece = board.piece_at(index)
+        if piece is not None:
+            key ^= PIECE_KEYS[(piece.color, piece.type)][index]
+    key ^= en_passant_key(board)
+    if board.turn == "b":
+        key ^= BLACK_TO_MOVE_KEY
+    return key ^ castling_key(board.castling_rights())
@@ -0,0 +1,29 @@
+from src.bitboard import BitboardBoard
+from src.engine.book import OpeningBook, collect, write_book
+from src.movegen import Move
+
+FRENCH = "rnbqkbnr/pppp1ppp/4p3/8/3PP3/8/PPP2PPP/RNBQKBNR b KQkq - 0 2"
+
+
+def test_transposed_lines_share_statistics(tmp_path):
+    games = [(BitboardBoard(), ["e4", "e6", "d4", "d5"], "1-0"), (BitboardBoard(), ["d4", "e6", "e4", "d5"], "0-1")]
+    positions, count = collect(games)
+    path = str(tmp_path / "book.bin")
+    write_book(path, positions, max_ply=20)
+    with OpeningBook(path) as book:
+        moves = book.probe(BitboardBoard.from_fen(FRENCH))
+        assert [(move.move.uci(), move.count, move.white, move.black) for move in moves] == [("d7d5", 2, 1, 1)]
+        assert book.hints(BitboardBoard.from_fen(FRENCH)) == ["d5 (2 games, 50%)"]
+
+
+def test_illegal_book_moves_are_skipped(tmp_path):
+    board = BitboardBoard()
+    positions, _ = collect([(BitboardBoard(), ["e4"], "1-0")])
+    # What a key collision would look like: a move from another position stored under this one
+    positions[board.zobrist][Move.decode(12 | 44 << 6).encode()] = [100, 0, 0, 0]  # e2e6
+    path = str(tmp_path / "book.bin")
+    write_book(path, positions, max_ply=20)
+    with OpeningBook(path) as book:
+        assert len(book.probe(board)) == 2
+        assert {book.choose(board).uci() for _ in range(20)} == {"e2e4"}
+        assert book.hints(board) == ["e4 (1 games, 100%)"]
@@ -0,0 +1,115 @@
+import asyncio
+
+from src.game_server import GameServer
+from src.protocol import Session, MOVE, START, ERROR, JOIN, SUBSCRIBE, SNAPSHOT, RESULT
+
+# Sam Loyd's ten-move stalemate
+STALEMATE = ["e3", "a5", "Qh5", "Ra6", "Qxa5", "h5", "h4", "Rah6", "Qxc7", "f6", "Qxd7+", "Kf7", "Qxb7", "Qd3",
+             "Qxb8", "Qh7", "Qxc8", "Kg6", "Qe6"]
+
+
+class Client:
+    def __init__(self, reader, writer) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.session = Session()
+        self.inbox = []
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    def send(self, kind, payload=""):
+        self.writer.write(self.session.message(kind, payload))
+
+    async def expect(self, kind):
+        while True:
+            for index, message in enumerate(self.inbox):
+                if message.kind == kind:
+                    return self.inbox.pop(index)
+            data = await asyncio.wait_for(self.reader.read(4096), 5)
+            assert data, "connection closed"
+            messages, reply = self.session.receive(data)
+            if reply:
+                self.writer.write(reply)
+            self.inbox.extend(messages)
+
+
+async def play_to_stalemate():
+    server = await GameServer("127.0.0.1", 0).start()
+    try:
+        white, black = await Client.connect(server.port), await Client.connect(server.port)
+        white.send(JOIN)
+        await asyncio.sleep(0.05)
+        black.send(JOIN)
+        start = await white.expect(START)
+        await black.expect(START)
+        spectator = await Client.connect(server.port)
+        spectator.send(SUBSCRIBE, start.payload.split()[1])
+        await asyncio.sleep(0.05)
+
+        players = [white, black]
+        for ply, san in enumerate(STALEMATE):
+            players[ply % 2].send(MOVE, san)
+            await players[(ply + 1) % 2].expect(MOVE)
+        result = await spectator.expect(RESULT)
+
+        black.send(MOVE, "Kh5")
+        error = await black.expect(ERROR)
+        running = len(server.matches)
+
+        # Both players can start another game
+        white.send(JOIN)
+        await asyncio.sleep(0.05)
+        black.send(JOIN)
+        rematch = await black.expect(START)
+        return result.payload, error.payload, running, rematch.payload
+    finally:
+        await server.close()
+
+
+def test_stalemate_ends_the_match():
+    result, error, running, rematch = asyncio.run(play_to_stalemate())
+    assert result == "1/2-1/2"
+    assert "over" in error
+    assert running == 0
+    assert rematch == "b 1"
+
+
+async def resume_after_restart(journal_dir):
+    server = await GameServer("127.0.0.1", 0, journal_dir=journal_dir).start()
+    white, black = await Client.connect(server.port), await Client.connect(server.port)
+    white.send(JOIN)
+    await asyncio.sleep(0.05)
+    black.send(JOIN)
+    await white.expect(START)
+    await black.expect(START)
+    for ply, san in enumerate(["e4", "e5", "Nf3"]):
+        [white, black][ply % 2].send(MOVE, san)
+        await [white, black][(ply + 1) % 2].expect(MOVE)
+    await server.close()  # The match never finished: as if the server had crashed
+
+    server = GameServer("127.0.0.1", 0, journal_dir=journal_dir)
+    resumed, next_id = server.resume(), server.games_started
+    await server.start()
+    try:
+        white, black = await Client.connect(server.port), await Client.connect(server.port)
+        white.send(JOIN, "0 w")
+        black.send(JOIN, "0 b")
+        start = await black.expect(START)
+        snapshot = await black.expect(SNAPSHOT)
+        await white.expect(START)
+        black.send(MOVE, "Nc6")
+        move = await white.expect(MOVE)
+        return resumed, next_id, start.payload, snapshot.payload, move.payload
+    finally:
+        await server.close()
+
+
+def test_server_resumes_journaled_matches(tmp_path):
+    resumed, next_id, start, snapshot, move = asyncio.run(resume_after_restart(str(tmp_path)))
+    assert resumed == 1
+    assert next_id == 1  # New games do not reuse the journal of game 0
+    assert start == "b 0"
+    assert snapshot.split("\n") == ["rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2", "e4 e5 Nf3"]
+    assert move == "Nc6"
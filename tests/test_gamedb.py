@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from src.bitboard import BitboardBoard
+from src.codec import encode_game
+from src.gamedb import GameDatabaseWriter, GameDatabase
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "games.chdb")
+    moves = ["e4", "e5", "Nf3", "Nc6", "Bb5"]
+    with GameDatabaseWriter(path) as writer:
+        writer.add({"White": "A", "Black": "B"}, encode_game(moves, BitboardBoard()), "1-0")
+        writer.add({}, [], None)
+    with GameDatabase(path) as database:
+        assert len(database) == 2
+        assert database.san(0) == moves
+        assert database.headers(0) == {"White": "A", "Black": "B"}
+        assert database.result(0) == "1-0"
+        assert database.plies(1) == 0 and database.result(1) == "*"
+
+
+def test_failed_write_leaves_no_database(tmp_path):
+    path = str(tmp_path / "games.chdb")
+    with pytest.raises(RuntimeError):
+        with GameDatabaseWriter(path) as writer:
+            writer.add({"White": "A"}, encode_game(["d4"], BitboardBoard()), "*")
+            raise RuntimeError("conversion failed")
+    assert not os.path.exists(path)
@@ -0,0 +1,74 @@
+import socket
+import time
+
+import pytest
+
+from src.network import Connection
+from src.protocol import Session, ProtocolError, HEADER, MAX_UNACKED, MOVE
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def collect(connection, count, timeout=5.0):
+    received = []
+
+    def done():
+        received.extend(message.payload for message in connection.poll() if message.kind == MOVE)
+        return len(received) >= count
+    wait_for(done, timeout)
+    return received
+
+
+def test_replayed_frames_are_delivered_once():
+    sender, receiver = Session(), Session()
+    first = sender.move("e4")
+    sender.move("Nf3")  # Lost with the connection
+    messages, _ = receiver.receive(first + b"\0\0")  # Followed by a torn header
+    assert [message.payload for message in messages] == ["e4"]
+
+    receiver.reconnect()
+    messages, reply = receiver.receive(sender.reconnect())
+    assert [message.payload for message in messages] == ["Nf3"]
+    sender.receive(reply)
+    assert sender.pending() == b""
+
+
+def test_invalid_utf8_is_a_protocol_error():
+    with pytest.raises(ProtocolError):
+        Session().receive(HEADER.pack(2, MOVE, 1) + b"\xc3\x28")
+
+
+def test_unacknowledged_messages_are_capped():
+    session = Session()
+    for _ in range(MAX_UNACKED):
+        session.move("e4")
+    with pytest.raises(ProtocolError):
+        session.move("e4")
+
+
+def test_connection_survives_a_drop():
+    server = Connection(True, "127.0.0.1", 0, reconnect_timeout=5)
+    server.start()
+    wait_for(lambda: server.port != 0)
+    client = Connection(False, "127.0.0.1", server.port, reconnect_timeout=5)
+    client.start()
+    try:
+        client.send("e4")
+        assert collect(server, 1) == ["e4"]
+
+        client._socket.shutdown(socket.SHUT_RDWR)  # The network goes away under both sides
+        client.send("Nf3")
+        server.send("e5")
+        assert collect(server, 1) == ["Nf3"]
+        assert collect(client, 1) == ["e5"]
+        assert client.reconnects == 1 and server.reconnects == 1
+        wait_for(lambda: client.unacknowledged == 0 and server.unacknowledged == 0)
+        assert not client.closed.is_set() and not server.closed.is_set()
+    finally:
+        client.close()
+        server.close()
@@ -0,0 +1,30 @@
+import time
+
+from src.bitboard import BitboardBoard
+from src.engine.parallel import ParallelSearch
+from src.movegen import Move
+
+E4, D4, NF3 = (Move.decode(code) for code in (12 | 28 << 6, 11 | 27 << 6, 6 | 21 << 6))
+
+
+def test_merge_compares_the_deepest_common_iteration():
+    result = ParallelSearch._merge([[(1, 30, E4.encode()), (2, 10, E4.encode())], [(1, 20, D4.encode())]], NF3)
+    assert (result.move, result.score, result.depth) == (E4, 30, 1)
+
+
+def test_merge_keeps_the_moves_of_a_worker_without_iterations():
+    result = ParallelSearch._merge([[(1, 30, E4.encode()), (2, 10, E4.encode())], []], NF3)
+    assert (result.move, result.depth) == (NF3, 0)
+
+
+def test_search_stays_within_the_time_limit():
+    search = ParallelSearch(time_limit=0.5, workers=2)
+    try:
+        board = BitboardBoard()
+        start = time.perf_counter()
+        result = search.search(board)
+        elapsed = time.perf_counter() - start
+    finally:
+        search.close()
+    assert result.move in board.generate_legal()
+    assert elapsed < 0.5 + 0.1  # Some slack for a loaded machine
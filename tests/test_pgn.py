@@ -0,0 +1,22 @@
+import pytest
+
+from src.bitboard import BitboardBoard
+from src.board import Board
+from src.pgn import replay_game
+
+PROMOTION = '[FEN "8/4P3/8/8/8/8/k7/4K3 w - - 0 1"]\n\n'
+
+
+@pytest.mark.parametrize("board_class", [Board, BitboardBoard])
+def test_illegal_promotions_are_rejected(board_class):
+    pushed = replay_game('[Event "x"]\n\n1. e4=Q e5 *', board_class=board_class)
+    assert (pushed.plies, pushed.error_ply) == (0, 1)
+    unpromoted = replay_game(PROMOTION + "1. e8 *", board_class=board_class)
+    assert (unpromoted.plies, unpromoted.error_ply) == (0, 1)
+
+
+@pytest.mark.parametrize("board_class", [Board, BitboardBoard])
+def test_promotion_picks_the_requested_piece(board_class):
+    game = replay_game(PROMOTION + "1. e8=N *", board_class=board_class)
+    assert game.error is None
+    assert game.final_fen.startswith("4N3/")
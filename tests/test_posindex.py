@@ -0,0 +1,46 @@
+import os
+import struct
+
+from src.bitboard import BitboardBoard
+from src.codec import encode_game
+from src.gamedb import GameDatabaseWriter
+from src.legality import Position
+from src.posindex import PositionIndex
+
+GAMES = [["e4", "e6", "d4", "d5"], ["d4", "e6", "e4", "d5"], ["e4", "e5", "d4"]]
+FRENCH = "rnbqkbnr/pppp1ppp/4p3/8/3PP3/8/PPP2PPP/RNBQKBNR b KQkq - 0 2"
+
+
+def build(tmp_path):
+    database = str(tmp_path / "games.chdb")
+    with GameDatabaseWriter(database) as writer:
+        for moves in GAMES:
+            writer.add({}, encode_game(moves, BitboardBoard()), "*")
+    directory = str(tmp_path / "games.idx")
+    with PositionIndex(directory) as index:
+        index.update(database, workers=1)
+    return database, directory
+
+
+def test_transpositions_find_the_same_games(tmp_path):
+    _, directory = build(tmp_path)
+    first, second = BitboardBoard(), BitboardBoard()
+    for board, moves in ((first, ["e4", "e6", "d4"]), (second, ["d4", "e6", "e4"])):
+        position = Position(board)
+        for move in moves:
+            position.play(move)
+    with PositionIndex(directory) as index:
+        assert index.find(first) == index.find(second) == [(0, 3), (1, 3)]
+        assert index.find(BitboardBoard.from_fen(FRENCH)) == [(0, 3), (1, 3)]
+
+
+def test_outdated_segments_are_rebuilt(tmp_path):
+    database, directory = build(tmp_path)
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), "r+b") as file:
+            file.seek(struct.calcsize("<4s"))
+            file.write(struct.pack("<H", 1))  # Pretend an older version wrote it
+    with PositionIndex(directory) as index:
+        assert len(index.segments) == 0
+        assert index.update(database, workers=1) == len(GAMES)
+        assert index.find(BitboardBoard.from_fen(FRENCH)) == [(0, 3), (1, 3)]
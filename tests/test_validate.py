@@ -0,0 +1,26 @@
+import pytest
+
+from src.validate import validate
+
+PGN = """[Event "legal"]
+
+1. e4 e5 2. Nf3 Nc6 *
+
+[Event "pawn promoted on e4"]
+
+1. e4=Q e5 *
+
+[Event "pawn left on the last rank"]
+[FEN "8/4P3/8/8/8/8/k7/4K3 w - - 0 1"]
+
+1. Kd2 Kb2 2. e8 Kb3 *
+"""
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_illegal_promotions_are_reported(tmp_path, workers):
+    path = tmp_path / "games.pgn"
+    path.write_text(PGN)
+    reports = list(validate(str(path), workers=workers))
+    assert [report.legal for report in reports] == [True, False, False]
+    assert [(report.error_ply, report.error_move) for report in reports[1:]] == [(1, "e4=Q"), (3, "e8")]
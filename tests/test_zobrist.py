@@ -0,0 +1,54 @@
+import pytest
+
+from src.bitboard import BitboardBoard
+from src.board import Board
+from src.legality import Position
+from src.zobrist import compute_hash
+
+BOARD_CLASSES = [Board, BitboardBoard]
+
+
+def play(board_class, moves, fen=None):
+    board = board_class.from_fen(fen) if fen else board_class()
+    position = Position(board)
+    for move in moves:
+        position.play(move)
+    return board
+
+
+@pytest.mark.parametrize("board_class", BOARD_CLASSES)
+def test_transposed_double_pushes_have_the_same_key(board_class):
+    first = play(board_class, ["e4", "e6", "d4"])
+    second = play(board_class, ["d4", "e6", "e4"])
+    assert first.to_fen().split()[:3] == second.to_fen().split()[:3]
+    assert first.zobrist == second.zobrist
+    assert compute_hash(first) == first.zobrist
+    assert compute_hash(second) == second.zobrist
+
+
+@pytest.mark.parametrize("board_class", BOARD_CLASSES)
+def test_fen_without_en_passant_square_matches_replay(board_class):
+    board = play(board_class, ["e4"])
+    assert board.last_pawn_move == ("e", 4)
+    fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    assert board_class.from_fen(fen).zobrist == board.zobrist
+
+
+@pytest.mark.parametrize("board_class", BOARD_CLASSES)
+def test_capturable_double_push_is_hashed(board_class):
+    board = play(board_class, ["e4", "d5", "e5", "f5"])
+    without = board_class.from_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 3")
+    assert board.zobrist != without.zobrist
+    assert board_class.from_fen(board.to_fen()).zobrist == board.zobrist
+    assert compute_hash(board) == board.zobrist
+
+
+@pytest.mark.parametrize("board_class", BOARD_CLASSES)
+def test_unmake_restores_the_key(board_class):
+    board = play(board_class, ["e4", "d5", "e5"])
+    key = board.zobrist
+    for move in ["f5", "exf6"]:
+        Position(board).play(move)
+    board.unmake_move()
+    board.unmake_move()
+    assert board.zobrist == key